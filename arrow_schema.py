@@ -0,0 +1,111 @@
+# arrow_schema.py
+# Arrow column types for Parquet output, derived from a topic's field definitions instead of
+# inferred from the generated Python objects. Date and datetime strings become date32/timestamp
+# columns, choice columns are dictionary-encoded, and int columns are narrowed to int32 when their
+# configured range (with any by_<field> multipliers) allows it. Float columns stay float64, so the
+# rounded values read back exactly as they appear in CSV/JSON output.
+import pyarrow as pa
+
+import samples_run
+
+INT32_MAX = 2 ** 31 - 1
+# strftime directives carrying a time of day
+TIME_DIRECTIVES = ('%H', '%I', '%M', '%S', '%p', '%f', '%T', '%X', '%c')
+
+
+def is_date_only(fmt):
+    return not any(directive in fmt for directive in TIME_DIRECTIVES)
+
+
+def int_type(lo, hi):
+    return pa.int32() if -INT32_MAX <= lo and hi <= INT32_MAX else pa.int64()
+
+
+def numeric_bounds(field, context):
+    # (lowest, highest) value an int/float field can take, multipliers included
+    min_v = field.get('min', 0)
+    max_v = field.get('max', 100)
+    bounds = [(min_v, max_v, 1.0)]
+    conditional = samples_run.conditional_ranges(field, context, min_v, max_v)
+    if conditional:
+        _, table, default = conditional
+        bounds += list(table.values()) + [default]
+    values = [v * multiplier for lo, hi, multiplier in bounds for v in (lo, hi)]
+    return min(values), max(values)
+
+
+def nested_type(values):
+    # (Arrow type, False) for choices of lists or mappings, or None
+    try:
+        arrow_type = pa.array(values).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    if pa.types.is_list(arrow_type) and pa.types.is_null(arrow_type.value_type):
+        arrow_type = pa.list_(pa.string())
+    if not pa.types.is_nested(arrow_type) or arrow_type.num_fields == 0:
+        return None
+    return arrow_type, False
+
+
+def choice_type(field):
+    """(Arrow type, stringify) for a choice field from every value it can take, or None.
+
+    String choices are dictionary-encoded (except resource_id, which is mostly distinct). Mixed
+    string/number choices become strings, so stringify is True for them. Choices of lists or
+    mappings get the nested type of all of them together (empty lists count as lists of strings),
+    or None when they have none in common and keep their inferred type.
+    """
+    values = list(field.get('values') or [])
+    conditional = samples_run.conditional_choices(field)
+    if conditional:
+        _, table, fallback, default = conditional
+        for entry_values, _ in [*table.values(), fallback, default]:
+            values += entry_values or []
+    values = [v for v in values if v is not None]
+    if field.get('name') == 'service':
+        values = list(samples_run.aws_service_mappings.SERVICE_CATALOG['regions'])
+    if not all(isinstance(v, (str, int, float)) for v in values):
+        return nested_type(values)
+    if values and all(type(v) is bool for v in values):
+        return pa.bool_(), False
+    if values and all(type(v) is int for v in values):
+        return int_type(min(values), max(values)), False
+    if values and all(type(v) in (int, float) for v in values):
+        return pa.float64(), False
+    stringify = not all(isinstance(v, str) for v in values)
+    if field.get('name') == 'resource_id':
+        return pa.string(), stringify
+    return pa.dictionary(pa.int32(), pa.string()), stringify
+
+
+def column_types(fields, context=None):
+    """{column: (Arrow type, time format or None, stringify)} for the fields whose type is known.
+
+    Fields left out (faker, reference and plain formula fields, and the drift/spike series) keep
+    the type Arrow infers from their values. stringify marks object columns whose non-string
+    values must be written as text.
+    """
+    date_formats = samples_run.formula_date_fields(fields)
+    types = {}
+    for field in samples_run.field_order(fields, context):
+        name = field['name']
+        ftype = field['type']
+        if name.endswith('_faker') or name in samples_run.CONTINUITY_VALUE_FIELDS:
+            continue
+        if name in date_formats:
+            fmt = date_formats[name]
+            types[name] = (pa.date32() if is_date_only(fmt) else pa.timestamp('s'), fmt, False)
+        elif ftype == 'choice':
+            choice = choice_type(field)
+            if choice is not None:
+                types[name] = (choice[0], None, choice[1])
+        elif ftype == 'multi_choice':
+            types[name] = (pa.list_(pa.string()), None, False)
+        elif ftype == 'int':
+            types[name] = (int_type(*numeric_bounds(field, context)), None, False)
+        elif ftype == 'float':
+            types[name] = (pa.float64(), None, False)
+        elif ftype == 'string' and 'pattern' in field:
+            types[name] = (pa.string(), None, False)
+    # In definition order, the order of the output columns
+    return {field['name']: types[field['name']] for field in fields if field['name'] in types}
@@ -1,4 +1,10 @@
+import csv
+import os
 import random
+from types import MappingProxyType
+
+import yaml
+
 # --- Per-service usage multipliers for realistic spend simulation ---
 # Based on industry AWS spend breakdowns (FinOps Foundation, AWS Cost Explorer, public benchmarks):
 # - EC2: largest (30–40% typical), S3: 15–20%, RDS: 10–15%, Lambda: 5–10%,
@@ -75,42 +81,83 @@ SERVICE_REGION_MAP = {
     'CostExplorer': ['us-east-1'],
 }
 
-RESOURCE_ID_PATTERNS = {
-    'EC2': lambda: f"i-{random.getrandbits(48):012x}",
-    'S3': lambda: f"bucket-{random.randint(1000,9999)}",
-    'Lambda': lambda: f"lambda-func-{random.randint(10000,99999)}",
-    'RDS': lambda: f"db-{random.getrandbits(48):012x}",
-    'DynamoDB': lambda: f"table-{random.randint(1000,9999)}",
-    'Redshift': lambda: f"cluster-{random.randint(1000,9999)}",
-    'CloudFront': lambda: f"E{random.getrandbits(32):08x}",
-    'EKS': lambda: f"eks-cluster-{random.randint(1000,9999)}",
-    'ECS': lambda: f"ecs-cluster-{random.randint(1000,9999)}",
-    'Aurora': lambda: f"aurora-db-{random.randint(1000,9999)}",
-    'ElastiCache': lambda: f"cache-cluster-{random.randint(1000,9999)}",
-    'SageMaker': lambda: f"sagemaker-job-{random.randint(1000,9999)}",
-    'Glue': lambda: f"glue-job-{random.randint(1000,9999)}",
-    'Athena': lambda: f"athena-query-{random.randint(100000,999999)}",
-    'Kinesis': lambda: f"kinesis-stream-{random.randint(1000,9999)}",
-    'WAF': lambda: f"waf-{random.randint(1000,9999)}",
-    'GuardDuty': lambda: f"gd-detector-{random.randint(1000,9999)}",
-    'Macie': lambda: f"macie-session-{random.randint(1000,9999)}",
-    'StepFunctions': lambda: f"stepfn-{random.randint(1000,9999)}",
-    'SNS': lambda: f"sns-topic-{random.randint(1000,9999)}",
-    'SQS': lambda: f"sqs-queue-{random.randint(1000,9999)}",
-    'CloudWatch': lambda: f"cw-alarm-{random.randint(1000,9999)}",
-    'Bedrock': lambda: f"bedrock-model-{random.randint(1000,9999)}",
-    'EMR': lambda: f"j-{random.randint(100000,999999)}",
-    'FSx': lambda: f"fsx-{random.randint(1000,9999)}",
-    'Backup': lambda: f"backup-vault-{random.randint(1000,9999)}",
-    'AppSync': lambda: f"appsync-api-{random.randint(1000,9999)}",
-    'QuickSight': lambda: f"qs-dashboard-{random.randint(1000,9999)}",
-    'DirectConnect': lambda: f"dxcon-{random.randint(1000,9999)}",
-    'TransitGateway': lambda: f"tgw-{random.randint(1000,9999)}",
-    'VPC': lambda: f"vpc-{random.randint(1000,9999)}",
-    'IAM': lambda: f"iam-role-{random.randint(1000,9999)}",
-    'CostExplorer': lambda: f"ce-report-{random.randint(1000,9999)}",
+# Resource id formats: (prefix, 'hex', digits) or (prefix, 'int', (min, max)) for the suffix
+RESOURCE_ID_FORMATS = {
+    'EC2': ('i-', 'hex', 12),
+    'S3': ('bucket-', 'int', (1000, 9999)),
+    'Lambda': ('lambda-func-', 'int', (10000, 99999)),
+    'RDS': ('db-', 'hex', 12),
+    'DynamoDB': ('table-', 'int', (1000, 9999)),
+    'Redshift': ('cluster-', 'int', (1000, 9999)),
+    'CloudFront': ('E', 'hex', 8),
+    'EKS': ('eks-cluster-', 'int', (1000, 9999)),
+    'ECS': ('ecs-cluster-', 'int', (1000, 9999)),
+    'Aurora': ('aurora-db-', 'int', (1000, 9999)),
+    'ElastiCache': ('cache-cluster-', 'int', (1000, 9999)),
+    'SageMaker': ('sagemaker-job-', 'int', (1000, 9999)),
+    'Glue': ('glue-job-', 'int', (1000, 9999)),
+    'Athena': ('athena-query-', 'int', (100000, 999999)),
+    'Kinesis': ('kinesis-stream-', 'int', (1000, 9999)),
+    'WAF': ('waf-', 'int', (1000, 9999)),
+    'GuardDuty': ('gd-detector-', 'int', (1000, 9999)),
+    'Macie': ('macie-session-', 'int', (1000, 9999)),
+    'StepFunctions': ('stepfn-', 'int', (1000, 9999)),
+    'SNS': ('sns-topic-', 'int', (1000, 9999)),
+    'SQS': ('sqs-queue-', 'int', (1000, 9999)),
+    'CloudWatch': ('cw-alarm-', 'int', (1000, 9999)),
+    'Bedrock': ('bedrock-model-', 'int', (1000, 9999)),
+    'EMR': ('j-', 'int', (100000, 999999)),
+    'FSx': ('fsx-', 'int', (1000, 9999)),
+    'Backup': ('backup-vault-', 'int', (1000, 9999)),
+    'AppSync': ('appsync-api-', 'int', (1000, 9999)),
+    'QuickSight': ('qs-dashboard-', 'int', (1000, 9999)),
+    'DirectConnect': ('dxcon-', 'int', (1000, 9999)),
+    'TransitGateway': ('tgw-', 'int', (1000, 9999)),
+    'VPC': ('vpc-', 'int', (1000, 9999)),
+    'IAM': ('iam-role-', 'int', (1000, 9999)),
+    'CostExplorer': ('ce-report-', 'int', (1000, 9999)),
 }
 
+
+def resource_id_pattern(prefix, kind, arg):
+    # Single-id generator; pass a seeded random.Random as rng for reproducible ids
+    if kind == 'hex':
+        bits = arg * 4
+        return lambda rng=random: f"{prefix}{rng.getrandbits(bits):0{arg}x}"
+    lo, hi = arg
+    return lambda rng=random: f"{prefix}{rng.randint(lo, hi)}"
+
+
+RESOURCE_ID_PATTERNS = {service: resource_id_pattern(*spec) for service, spec in RESOURCE_ID_FORMATS.items()}
+
+
+def generate_resource_ids(service, n, rng=random):
+    """Generate n resource ids for service in one batch, or None if the service has no format.
+
+    Hex suffixes are sliced out of a single random byte buffer and numeric suffixes come from
+    one bulk integer draw. rng is a random.Random (or the random module) or a NumPy Generator.
+    """
+    spec = RESOURCE_ID_FORMATS.get(service)
+    if spec is None:
+        return None
+    prefix, kind, arg = spec
+    if kind == 'hex':
+        randbytes = getattr(rng, 'randbytes', None) or rng.bytes
+        digits = randbytes(n * arg // 2).hex()
+        return [prefix + digits[i:i + arg] for i in range(0, n * arg, arg)]
+    lo, hi = arg
+    if hasattr(rng, 'integers'):
+        suffixes = rng.integers(lo, hi + 1, size=n).tolist()
+    else:
+        suffixes = rng.choices(range(lo, hi + 1), k=n)
+    return [f"{prefix}{v}" for v in suffixes]
+
+
+def resource_fleet(account_id, service, size, fleet_seed=0):
+    # Fixed set of ids per (account, service): the same for every run, shard and engine
+    rng = random.Random(f"{fleet_seed}:{account_id}:{service}")
+    return generate_resource_ids(service, size, rng)
+
 USAGE_TYPE_MAP = {
     'EC2': ['BoxUsage', 'CPUCredits'],
     'S3': ['TimedStorage-ByteHrs', 'Requests-Tier1'],
@@ -148,73 +195,142 @@ USAGE_TYPE_MAP = {
 }
 
 
+# --- Per-unit rates by (service, usage_type); unknown pairs fall back to DEFAULT_RATE ---
+DEFAULT_RATE = 0.01
+SERVICE_RATES = MappingProxyType({
+    ('EC2', 'BoxUsage'): 0.12,
+    ('EC2', 'CPUCredits'): 0.09,
+    ('S3', 'TimedStorage-ByteHrs'): 0.023/730,
+    ('S3', 'Requests-Tier1'): 0.0004,
+    ('Lambda', 'Duration'): 0.00001667,
+    ('Lambda', 'Requests'): 0.0000002,
+    ('RDS', 'InstanceUsage'): 0.25,
+    ('RDS', 'Storage'): 0.10/730,
+    ('DynamoDB', 'ReadCapacityUnit'): 0.00013,
+    ('DynamoDB', 'WriteCapacityUnit'): 0.00065,
+    ('Redshift', 'NodeUsage'): 0.25,
+    ('Redshift', 'BackupStorage'): 0.024/730,
+    ('CloudFront', 'Requests'): 0.000001,
+    ('CloudFront', 'DataTransfer-Out-Bytes'): 0.00008,
+    ('EKS', 'ClusterHours'): 0.10,
+    ('EKS', 'FargatePodSeconds'): 0.000011244,
+    ('ECS', 'ClusterHours'): 0.09,
+    ('ECS', 'TaskHours'): 0.05,
+    ('Aurora', 'InstanceUsage'): 0.30,
+    ('Aurora', 'IORequests'): 0.0002,
+    ('ElastiCache', 'NodeUsage'): 0.20,
+    ('ElastiCache', 'BackupStorage'): 0.025/730,
+    ('SageMaker', 'MLComputeTime'): 0.42,
+    ('SageMaker', 'InferenceRequests'): 0.0002,
+    ('Glue', 'DPU-Hours'): 0.44,
+    ('Glue', 'CrawledObjects'): 0.0001,
+    ('Athena', 'Query'): 0.002,
+    ('Athena', 'DataScannedInBytes'): 0.000000005,
+    ('Kinesis', 'PUTPayloadUnits'): 0.014,
+    ('Kinesis', 'GetRecords'): 0.0000004,
+    ('WAF', 'WebACLUsage'): 0.60,
+    ('WAF', 'RuleEvaluations'): 0.000001,
+    ('GuardDuty', 'Finding'): 0.80,
+    ('GuardDuty', 'AnalyzedBytes'): 0.000000001,
+    ('Macie', 'ClassificationJobs'): 1.25,
+    ('Macie', 'AnalyzedBytes'): 0.000000001,
+    ('StepFunctions', 'StateTransitions'): 0.000025,
+    ('StepFunctions', 'ExecutionTime'): 0.00001667,
+    ('SNS', 'Notification'): 0.0000005,
+    ('SNS', 'PublishRequests'): 0.0000005,
+    ('SQS', 'Request'): 0.0000004,
+    ('SQS', 'MessageTransfer'): 0.0000002,
+    ('CloudWatch', 'Metrics'): 0.30,
+    ('CloudWatch', 'LogsIngested'): 0.0000005,
+    ('Bedrock', 'Inference'): 0.002,
+    ('Bedrock', 'Training'): 0.01,
+    ('EMR', 'InstanceHours'): 0.27,
+    ('EMR', 'Storage'): 0.025/730,
+    ('FSx', 'Storage'): 0.13/730,
+    ('FSx', 'ThroughputCapacity'): 0.05,
+    ('Backup', 'BackupStorage'): 0.05/730,
+    ('Backup', 'RestoreRequests'): 0.0005,
+    ('AppSync', 'Query'): 0.0004,
+    ('AppSync', 'Mutation'): 0.0004,
+    ('QuickSight', 'Session'): 0.30,
+    ('QuickSight', 'SPICECapacity'): 0.25,
+    ('DirectConnect', 'ConnectionHours'): 0.08,
+    ('DirectConnect', 'DataTransfer'): 0.00002,
+    ('TransitGateway', 'AttachmentHours'): 0.06,
+    ('TransitGateway', 'DataTransfer'): 0.00002,
+    ('VPC', 'VPCPeering'): 0.01,
+    ('VPC', 'NATGatewayHours'): 0.045,
+    ('IAM', 'APIRequest'): 0.000001,
+    ('IAM', 'UserCount'): 0.0,
+    ('CostExplorer', 'APIRequest'): 0.00001,
+    ('CostExplorer', 'ReportGeneration'): 0.0001,
+})
+
+
+def build_service_catalog(rates, region_map, usage_type_map, usage_multipliers):
+    """Index every per-service table by interned service/usage-type ids.
+
+    Returns an immutable dict: 'services'/'usage_types' tuples (position = id), their
+    '*_ids' reverse maps, the 'rates', 'regions', 'usage_type_map' and 'usage_multipliers'
+    lookups, and 'rate_matrix' with rate_matrix[service_id][usage_type_id] for array lookups.
+    """
+    services = tuple(dict.fromkeys([*region_map, *usage_type_map, *usage_multipliers, *(s for s, _ in rates)]))
+    usage_types = tuple(dict.fromkeys(
+        [u for types in usage_type_map.values() for u in types] + [u for _, u in rates]
+    ))
+    return MappingProxyType({
+        'services': services,
+        'service_ids': MappingProxyType({s: i for i, s in enumerate(services)}),
+        'usage_types': usage_types,
+        'usage_type_ids': MappingProxyType({u: i for i, u in enumerate(usage_types)}),
+        'rates': MappingProxyType(dict(rates)),
+        'rate_matrix': tuple(tuple(rates.get((s, u), DEFAULT_RATE) for u in usage_types) for s in services),
+        'regions': MappingProxyType({s: tuple(r) for s, r in region_map.items()}),
+        'usage_type_map': MappingProxyType({s: tuple(u) for s, u in usage_type_map.items()}),
+        'usage_multipliers': MappingProxyType(dict(usage_multipliers)),
+    })
+
+
+SERVICE_CATALOG = build_service_catalog(SERVICE_RATES, SERVICE_REGION_MAP, USAGE_TYPE_MAP, SERVICE_USAGE_MULTIPLIER)
+
+
+def load_rate_card(path):
+    """Build a catalog from a custom rate card layered over the default tables.
+
+    YAML/JSON cards may set 'rates' ({service: {usage_type: rate}}), 'regions' and
+    'usage_types' ({service: [...]}) and 'usage_multipliers' ({service: multiplier}).
+    CSV cards have service,usage_type,rate columns.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Rate card not found: {path}")
+    rates = dict(SERVICE_RATES)
+    region_map = dict(SERVICE_REGION_MAP)
+    usage_type_map = dict(USAGE_TYPE_MAP)
+    usage_multipliers = dict(SERVICE_USAGE_MULTIPLIER)
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                rates[(row['service'], row['usage_type'])] = float(row['rate'])
+    else:
+        with open(path, 'r') as f:
+            card = yaml.safe_load(f) or {}
+        for service, service_rates in (card.get('rates') or {}).items():
+            for usage_type, rate in service_rates.items():
+                rates[(service, usage_type)] = float(rate)
+        region_map.update(card.get('regions') or {})
+        usage_type_map.update(card.get('usage_types') or {})
+        usage_multipliers.update(card.get('usage_multipliers') or {})
+    return build_service_catalog(rates, region_map, usage_type_map, usage_multipliers)
+
+
+def use_rate_card(path):
+    # Install a custom rate card as the catalog used by get_rate_for_service and the generators
+    global SERVICE_CATALOG
+    SERVICE_CATALOG = load_rate_card(path) if path else build_service_catalog(
+        SERVICE_RATES, SERVICE_REGION_MAP, USAGE_TYPE_MAP, SERVICE_USAGE_MULTIPLIER
+    )
+    return SERVICE_CATALOG
+
+
 def get_rate_for_service(service, usage_type):
-    rates = {
-        ('EC2', 'BoxUsage'): 0.12,
-        ('EC2', 'CPUCredits'): 0.09,
-        ('S3', 'TimedStorage-ByteHrs'): 0.023/730,
-        ('S3', 'Requests-Tier1'): 0.0004,
-        ('Lambda', 'Duration'): 0.00001667,
-        ('Lambda', 'Requests'): 0.0000002,
-        ('RDS', 'InstanceUsage'): 0.25,
-        ('RDS', 'Storage'): 0.10/730,
-        ('DynamoDB', 'ReadCapacityUnit'): 0.00013,
-        ('DynamoDB', 'WriteCapacityUnit'): 0.00065,
-        ('Redshift', 'NodeUsage'): 0.25,
-        ('Redshift', 'BackupStorage'): 0.024/730,
-        ('CloudFront', 'Requests'): 0.000001,
-        ('CloudFront', 'DataTransfer-Out-Bytes'): 0.00008,
-        ('EKS', 'ClusterHours'): 0.10,
-        ('EKS', 'FargatePodSeconds'): 0.000011244,
-        ('ECS', 'ClusterHours'): 0.09,
-        ('ECS', 'TaskHours'): 0.05,
-        ('Aurora', 'InstanceUsage'): 0.30,
-        ('Aurora', 'IORequests'): 0.0002,
-        ('ElastiCache', 'NodeUsage'): 0.20,
-        ('ElastiCache', 'BackupStorage'): 0.025/730,
-        ('SageMaker', 'MLComputeTime'): 0.42,
-        ('SageMaker', 'InferenceRequests'): 0.0002,
-        ('Glue', 'DPU-Hours'): 0.44,
-        ('Glue', 'CrawledObjects'): 0.0001,
-        ('Athena', 'Query'): 0.002,
-        ('Athena', 'DataScannedInBytes'): 0.000000005,
-        ('Kinesis', 'PUTPayloadUnits'): 0.014,
-        ('Kinesis', 'GetRecords'): 0.0000004,
-        ('WAF', 'WebACLUsage'): 0.60,
-        ('WAF', 'RuleEvaluations'): 0.000001,
-        ('GuardDuty', 'Finding'): 0.80,
-        ('GuardDuty', 'AnalyzedBytes'): 0.000000001,
-        ('Macie', 'ClassificationJobs'): 1.25,
-        ('Macie', 'AnalyzedBytes'): 0.000000001,
-        ('StepFunctions', 'StateTransitions'): 0.000025,
-        ('StepFunctions', 'ExecutionTime'): 0.00001667,
-        ('SNS', 'Notification'): 0.0000005,
-        ('SNS', 'PublishRequests'): 0.0000005,
-        ('SQS', 'Request'): 0.0000004,
-        ('SQS', 'MessageTransfer'): 0.0000002,
-        ('CloudWatch', 'Metrics'): 0.30,
-        ('CloudWatch', 'LogsIngested'): 0.0000005,
-        ('Bedrock', 'Inference'): 0.002,
-        ('Bedrock', 'Training'): 0.01,
-        ('EMR', 'InstanceHours'): 0.27,
-        ('EMR', 'Storage'): 0.025/730,
-        ('FSx', 'Storage'): 0.13/730,
-        ('FSx', 'ThroughputCapacity'): 0.05,
-        ('Backup', 'BackupStorage'): 0.05/730,
-        ('Backup', 'RestoreRequests'): 0.0005,
-        ('AppSync', 'Query'): 0.0004,
-        ('AppSync', 'Mutation'): 0.0004,
-        ('QuickSight', 'Session'): 0.30,
-        ('QuickSight', 'SPICECapacity'): 0.25,
-        ('DirectConnect', 'ConnectionHours'): 0.08,
-        ('DirectConnect', 'DataTransfer'): 0.00002,
-        ('TransitGateway', 'AttachmentHours'): 0.06,
-        ('TransitGateway', 'DataTransfer'): 0.00002,
-        ('VPC', 'VPCPeering'): 0.01,
-        ('VPC', 'NATGatewayHours'): 0.045,
-        ('IAM', 'APIRequest'): 0.000001,
-        ('IAM', 'UserCount'): 0.0,
-        ('CostExplorer', 'APIRequest'): 0.00001,
-        ('CostExplorer', 'ReportGeneration'): 0.0001,
-    }
-    return rates.get((service, usage_type), 0.01)
+    return SERVICE_CATALOG['rates'].get((service, usage_type), DEFAULT_RATE)
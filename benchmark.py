@@ -0,0 +1,300 @@
+# benchmark.py
+# Generation benchmark across the topic configs.
+# Every (config, record count, engine) case reports generation records/sec, peak RSS, time per
+# field type and the throughput and peak RSS of each output writer. Generation and every writer run
+# in a fresh process each, on batches streamed as samples_run streams them. Results are
+# saved as JSON (benchmarks/<commit>.json by default); --compare reports records/sec regressions
+# against an earlier results file.
+import argparse
+import glob
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from multiprocessing import get_context
+
+import output_writers
+import samples_run
+
+CONFIG_GLOB = 'configs/topics/*.yaml'
+COUNTS = (1000, 10000, 100000)
+OUTPUT_TYPES = tuple(output_writers.WRITERS)
+# Modules the writers import on first use, imported before any writer is timed
+WRITER_MODULES = ('pandas', 'pyarrow', 'pyarrow.parquet', 'pyarrow.compute', 'sqlite3', 'duckdb', 'orjson', 'msgspec')
+RESULTS_DIR = 'benchmarks'
+# Records generated field by field (with a timer around every field) for the per-type breakdown
+PROFILE_RECORDS = 2000
+# A records/sec drop beyond this fraction of the baseline counts as a regression
+REGRESSION_THRESHOLD = 0.1
+
+
+def peak_rss_mb():
+    # Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    # Commit of the generator code being benchmarked, '-dirty' with uncommitted changes
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def topic_name(config_path):
+    return os.path.splitext(os.path.basename(config_path))[0]
+
+
+def generate(config, count, engine, seed):
+    """The generated data as a stream of write batches, as samples_run produces it for output."""
+    if engine == 'columnar':
+        import numpy as np
+        import columnar_engine
+        return columnar_engine.iter_column_batches(
+            config, num_records=count, rng=np.random.default_rng(seed), py_rng=random.Random(seed),
+            faker=samples_run.make_faker(seed)
+        )
+    return samples_run.iter_record_batches(
+        config, num_records=count, rng=random.Random(seed), faker=samples_run.make_faker(seed)
+    )
+
+
+def timed(batches, spent):
+    # batches, adding the time spent producing them to spent[0]
+    batches = iter(batches)
+    while True:
+        start = time.perf_counter()
+        batch = next(batches, None)
+        spent[0] += time.perf_counter() - start
+        if batch is None:
+            return
+        yield batch
+
+
+def field_type_times(config, count, engine, seed):
+    """{field type: {'fields', 'seconds', 'us_per_value'}} from generating count records one field at a time.
+
+    Continuity, partition paths and output conversion are left out, so the totals are lower than the
+    end-to-end generation time.
+    """
+    fields = samples_run.field_order(config['fields'], config.get('context', {}))
+    types = {field['name']: field['type'] for field in fields}
+    seconds = dict.fromkeys(types.values(), 0.0)
+    clock = time.perf_counter
+    if engine == 'columnar':
+        import numpy as np
+        import columnar_engine
+        plan = columnar_engine.compile_columns(config, py_rng=random.Random(seed), faker=samples_run.make_faker(seed))
+        rng = np.random.default_rng(seed)
+        cols = {}
+        formats = {}
+        for fname, gen in plan:
+            start = clock()
+            cols[fname], formats[fname] = gen(count, cols, formats, rng)
+            seconds[types[fname]] += clock() - start
+    else:
+        plan = [(fname, gen, types[fname]) for fname, gen in samples_run.compile_fields(config, rng=random.Random(seed), faker=samples_run.make_faker(seed))]
+        for _ in range(count):
+            record = {}
+            for fname, gen, ftype in plan:
+                start = clock()
+                record[fname] = gen(record)
+                seconds[ftype] += clock() - start
+    times = {}
+    for ftype, total in sorted(seconds.items(), key=lambda item: -item[1]):
+        n_fields = sum(1 for t in types.values() if t == ftype)
+        times[ftype] = {
+            'fields': n_fields,
+            'seconds': round(total, 4),
+            'us_per_value': round(total / (count * n_fields) * 1e6, 3),
+        }
+    return times
+
+
+def run_writer(case, output_type):
+    """Throughput of output_writers.write_batches for one case, streaming from generation as samples_run does.
+
+    Runs in its own process, so peak RSS is what generating and writing this output type takes
+    (start RSS: with the writer modules imported); the time spent generating batches is left out
+    of seconds.
+    """
+    config_path, count, engine, seed = case[:4]
+    # Modules the writer imports on first use are loaded before the clock starts
+    for module in WRITER_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    config = samples_run.load_config(config_path)
+    start_rss_mb = peak_rss_mb()
+    generating = [0.0]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"out.{output_type}")
+        try:
+            start = time.perf_counter()
+            output_writers.write_batches(timed(generate(config, count, engine, seed), generating), output_type, path)
+            seconds = time.perf_counter() - start - generating[0]
+        except Exception as e:
+            # Missing optional dependency, or data the format cannot hold
+            return {'error': f"{type(e).__name__}: {e}"}
+        return {
+            'seconds': round(seconds, 4),
+            'records_per_sec': round(count / seconds, 1) if seconds > 0 else None,
+            'bytes': os.path.getsize(path),
+            'start_rss_mb': start_rss_mb,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+
+def run_case(case):
+    """Benchmark generating one (config, count, engine) case; runs in its own process so peak RSS is its own."""
+    config_path, count, engine, seed, output_types, profile_records = case
+    result = {'topic': topic_name(config_path), 'config': config_path, 'records': count, 'engine': engine}
+    try:
+        config = samples_run.load_config(config_path)
+        result['start_rss_mb'] = peak_rss_mb()
+        start = time.perf_counter()
+        generated = sum(output_writers.batch_len(batch) for batch in generate(config, count, engine, seed))
+        seconds = time.perf_counter() - start
+        result['generate'] = {
+            'seconds': round(seconds, 4),
+            'records_per_sec': round(generated / seconds, 1) if seconds else None,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        if profile_records:
+            result['field_types'] = field_type_times(config, min(count, profile_records), engine, seed)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def run_task(task):
+    # A case's generation, or one of its writers
+    case, output_type = task
+    return run_case(case) if output_type is None else run_writer(case, output_type)
+
+
+def case_key(result):
+    return (result['topic'], result['records'], result['engine'])
+
+
+def compare(baseline, results, threshold=REGRESSION_THRESHOLD):
+    """Print records/sec changes against a baseline results file; returns the regressed cases."""
+    previous = {case_key(r): r for r in baseline['results'] if 'error' not in r}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')}):")
+    for result in results['results']:
+        old = previous.get(case_key(result))
+        if old is None or 'error' in result:
+            continue
+        stages = [('generate', old['generate'], result['generate'])]
+        stages += [
+            (f"write {t}", old['writers'][t], new) for t, new in result['writers'].items()
+            if 'error' not in new and 'error' not in old['writers'].get(t, {'error': None})
+        ]
+        for stage, before, after in stages:
+            if not before['records_per_sec'] or not after['records_per_sec']:
+                continue
+            ratio = after['records_per_sec'] / before['records_per_sec']
+            regressed = ratio < 1 - threshold
+            if regressed:
+                regressions.append((case_key(result), stage, ratio))
+            print(f"  {'REGRESSION ' if regressed else ''}{result['topic']} {result['records']} {result['engine']} {stage}: "
+                  f"{before['records_per_sec']:.0f} -> {after['records_per_sec']:.0f} records/sec ({ratio - 1:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generation and output writers across topic configs.")
+    parser.add_argument("--configs", type=str, default=CONFIG_GLOB, help=f"Glob of topic configs to run (default: {CONFIG_GLOB})")
+    parser.add_argument("--topics", type=str, default="", help="Comma-separated topic names to run (default: every config matched by --configs)")
+    parser.add_argument("--counts", type=str, default=",".join(map(str, COUNTS)), help=f"Comma-separated record counts (default: {','.join(map(str, COUNTS))})")
+    parser.add_argument("--engines", type=str, default="row", help="Comma-separated engines: row, columnar (default: row)")
+    parser.add_argument("--writers", type=str, default=",".join(OUTPUT_TYPES), help=f"Comma-separated output types to time, '' for none (default: {','.join(OUTPUT_TYPES)})")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for every case (default: 0)")
+    parser.add_argument("--profile-records", type=int, default=PROFILE_RECORDS, help=f"Records timed field by field for the per-type breakdown, 0 to skip (default: {PROFILE_RECORDS})")
+    parser.add_argument("--output", type=str, default=None, help=f"Results JSON file (default: {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--results", type=str, default=None, help="Compare this results file with --compare instead of running the benchmark")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline results file; regressions beyond --threshold exit with status 1")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help=f"Records/sec drop counted as a regression (default: {REGRESSION_THRESHOLD})")
+    args = parser.parse_args()
+    if args.results and not args.compare:
+        parser.error("--results needs --compare")
+
+    if args.results:
+        with open(args.results, 'r') as f:
+            results = json.load(f)
+    else:
+        topics = {t.strip() for t in args.topics.split(",") if t.strip()}
+        configs = [c for c in sorted(glob.glob(args.configs)) if not topics or topic_name(c) in topics]
+        if not configs:
+            parser.error(f"No topic configs match {args.configs}" + (f" and --topics {args.topics}" if topics else ""))
+        counts = [int(c) for c in args.counts.split(",") if c.strip()]
+        engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+        output_types = [t.strip() for t in args.writers.split(",") if t.strip()]
+        unknown = [e for e in engines if e not in ('row', 'columnar')] + [t for t in output_types if t not in OUTPUT_TYPES]
+        if unknown:
+            parser.error(f"Unknown engines/writers: {', '.join(unknown)}")
+        cases = [
+            (config, count, engine, args.seed, output_types, args.profile_records)
+            for config in configs for count in counts for engine in engines
+        ]
+        commit = git_commit()
+        results = {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'results': [],
+        }
+        # One process for each case's generation and for each of its writers: peak RSS is their own
+        # and nothing is shared between them
+        tasks = [(case, output_type) for case in cases for output_type in [None, *case[4]]]
+        with get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+            done = pool.imap(run_task, tasks)
+            for case in cases:
+                result = next(done)
+                result['writers'] = {output_type: next(done) for output_type in case[4]}
+                if 'error' in result:
+                    result.pop('writers')
+                results['results'].append(result)
+                if 'error' in result:
+                    print(f"{result['topic']} {result['records']} {result['engine']}: {result['error']}")
+                    continue
+                gen = result['generate']
+                writers = ", ".join(
+                    f"{t} {w['records_per_sec']:.0f}/s" if 'error' not in w else f"{t} n/a"
+                    for t, w in result['writers'].items()
+                )
+                print(f"{result['topic']} {result['records']} {result['engine']}: {gen['records_per_sec']:.0f} records/sec, "
+                      f"peak RSS {gen['peak_rss_mb']} MB" + (f"; write {writers}" if writers else ""))
+        output = args.output or os.path.join(RESULTS_DIR, f"{commit or datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved {len(results['results'])} results to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,625 @@
+# columnar_engine.py
+# Vectorized, column-at-a-time generation for topic configs.
+# Produces dicts of NumPy arrays (pandas/Arrow-ready) in batches instead of a list of dicts.
+# Only faker fields, pattern strings with format specs and non-arithmetic formulas fall back to Python.
+import ast
+import random
+import string
+from array import array
+
+import numpy as np
+
+import aws_service_mappings
+from aws_service_mappings import (
+    DEFAULT_RATE,
+    RESOURCE_ID_FORMATS,
+    generate_resource_ids,
+    resource_fleet
+)
+import reference_data
+import samples_run
+from continuity_state import NAN, ContinuityState
+
+ISO_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+ISO_DATE_FORMAT = '%Y-%m-%d'
+ARITHMETIC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+)
+BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+
+
+def object_array(values):
+    # Element-wise fill so list/dict values are kept as objects instead of becoming extra dimensions
+    arr = np.empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        arr[i] = v
+    return arr
+
+
+def is_datetime_column(arr):
+    return np.issubdtype(arr.dtype, np.datetime64)
+
+
+def format_datetimes(arr, fmt):
+    if fmt == ISO_DATETIME_FORMAT:
+        return np.datetime_as_string(arr.astype('datetime64[s]'), unit='s').astype(object)
+    if fmt == ISO_DATE_FORMAT:
+        return np.datetime_as_string(arr.astype('datetime64[D]'), unit='D').astype(object)
+    import pandas as pd
+    return pd.DatetimeIndex(arr).strftime(fmt).to_numpy(dtype=object)
+
+
+def factorize(arr):
+    # (codes, uniques) for any column, including unhashable-free object columns
+    if arr.dtype != object:
+        uniques, codes = np.unique(arr, return_inverse=True)
+        return codes, list(uniques.tolist())
+    index = {}
+    codes = np.empty(len(arr), dtype=np.int64)
+    for i, v in enumerate(arr.tolist()):
+        code = index.get(v)
+        if code is None:
+            code = index[v] = len(index)
+        codes[i] = code
+    return codes, list(index)
+
+
+def choose(rng, values, n, cum_weights=None):
+    if cum_weights:
+        idx = np.searchsorted(cum_weights, rng.random(n) * cum_weights[-1], side='right')
+        np.minimum(idx, len(values) - 1, out=idx)
+    else:
+        idx = rng.integers(0, len(values), size=n)
+    return values[idx]
+
+
+def column_array(column):
+    # Reference pool column as an array: typed arrays are wrapped without copying
+    if isinstance(column, array):
+        return np.frombuffer(column, dtype=np.int64 if column.typecode == 'q' else np.float64)
+    return object_array(column)
+
+
+def compile_reference_rows(field, reference_pools, py_rng=None):
+    """rows_for(n, cols, rng) -> pool row indices for a batch, shared by the fields of a reference group.
+
+    As in the row engine, fields with the same file, reference_group and uniqueness read one row per
+    record; the draw is made once per batch (cols) and reused by the other fields of the group.
+    """
+    key = ('column_sampler',) + reference_data.group_key(field)
+    if key in reference_pools:
+        return reference_pools[key]
+    ref_file = field['reference_file']
+    size = len(samples_run.load_reference_pool(field, reference_pools))
+    rows = reference_data.unique_rows(field, reference_pools, py_rng or random) if field.get('unique', False) else None
+    last = [None, None]
+
+    def rows_for(n, cols, rng):
+        if cols is last[0]:
+            return last[1]
+        if rows is None:
+            drawn = rng.integers(0, size, size=n)
+        else:
+            if len(rows) < n:
+                raise ValueError(f"No more unique values available in {ref_file} for {field['reference_field']}")
+            # Same order as popping from the end one record at a time
+            drawn = np.array(rows[len(rows) - n:][::-1], dtype=np.int64)
+            del rows[len(rows) - n:]
+        last[0], last[1] = cols, drawn
+        return drawn
+    reference_pools[key] = rows_for
+    return rows_for
+
+
+def choose_by_group(rng, parent, table, default, n):
+    # Draw from table[parent_value] (or default), each a (values, cum_weights) pair, for each row;
+    # one vectorized draw per distinct parent value
+    out = np.empty(n, dtype=object)
+    codes, uniques = factorize(parent)
+    for code, value in enumerate(uniques):
+        mask = codes == code
+        options, cum_weights = table.get(value, default)
+        out[mask] = choose(rng, options, int(mask.sum()), cum_weights)
+    return out
+
+
+def multi_choice(rng, values, lo, hi, n):
+    """Object array of n random subsets of values (sizes lo..hi), each in values order.
+
+    Every row ranks one uniform key per value and keeps the values ranked below its subset size.
+    The kept values are packed into a bitmask per row, so each distinct subset is built as a list
+    only once.
+    """
+    m = len(values)
+    sizes = rng.integers(lo, hi + 1, size=n)
+    ranks = rng.random((n, m)).argsort(axis=1).argsort(axis=1)
+    mask = ranks < sizes[:, None]
+    out = np.empty(n, dtype=object)
+    if m > 62:
+        out[:] = [[values[i] for i in np.flatnonzero(row)] for row in mask]
+        return out
+    codes = mask.astype(np.int64) @ (np.int64(1) << np.arange(m, dtype=np.int64))
+    uniques, inverse = np.unique(codes, return_inverse=True)
+    subsets = np.empty(len(uniques), dtype=object)
+    subsets[:] = [[values[i] for i in range(m) if code >> i & 1] for code in uniques.tolist()]
+    out[:] = subsets[inverse]
+    return out
+
+
+def lookup(parent, table, default, dtype=np.float64):
+    # Map each parent value through table, vectorized via factorize + take
+    codes, uniques = factorize(parent)
+    mapped = np.array([table.get(v, default) for v in uniques], dtype=dtype)
+    return mapped[codes] if len(uniques) else np.empty(0, dtype=dtype)
+
+
+def resource_id_column(rng, cols, values, n, fleet_size=None, fleet_seed=0, fleets=None):
+    # One batched id draw per service, or per (account, service) fleet when fleet_size is set
+    out = choose(rng, values, n) if values is not None else np.full(n, None, dtype=object)
+    if fleet_size:
+        accounts = cols['account_id'].tolist() if 'account_id' in cols else [None] * n
+        codes, uniques = factorize(object_array(list(zip(accounts, cols['service'].tolist()))))
+    else:
+        codes, uniques = factorize(cols['service'])
+    for code, key in enumerate(uniques):
+        service = key[1] if fleet_size else key
+        if service not in RESOURCE_ID_FORMATS:
+            continue
+        mask = codes == code
+        count = int(mask.sum())
+        if fleet_size:
+            fleet = fleets.get(key)
+            if fleet is None:
+                fleet = fleets[key] = object_array(resource_fleet(key[0], service, fleet_size, fleet_seed))
+            out[mask] = choose(rng, fleet, count)
+        else:
+            out[mask] = object_array(generate_resource_ids(service, count, rng))
+    return out
+
+
+def catalog_ids(column, ids):
+    # Interned catalog id per row; values missing from the catalog map to -1
+    codes, uniques = factorize(column)
+    mapped = np.array([ids.get(v, -1) for v in uniques], dtype=np.int64)
+    return mapped[codes] if len(uniques) else np.empty(0, dtype=np.int64)
+
+
+def rate_matrix(catalog):
+    # rate_matrix[service_id, usage_type_id]; the extra last row/column holds DEFAULT_RATE for id -1
+    matrix = np.full((len(catalog['services']) + 1, len(catalog['usage_types']) + 1), DEFAULT_RATE)
+    if catalog['rate_matrix']:
+        matrix[:-1, :-1] = catalog['rate_matrix']
+    return matrix
+
+
+def formula_names(formula):
+    try:
+        tree = ast.parse(formula, mode='eval')
+    except SyntaxError:
+        return set()
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+
+def is_arithmetic(formula):
+    try:
+        tree = ast.parse(formula, mode='eval')
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if not isinstance(node, ARITHMETIC_NODES):
+            return False
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            return False
+    return True
+
+
+def eval_arithmetic(node, cols):
+    if isinstance(node, ast.Expression):
+        return eval_arithmetic(node.body, cols)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        return cols[node.id]
+    if isinstance(node, ast.UnaryOp):
+        operand = eval_arithmetic(node.operand, cols)
+        return -operand if isinstance(node.op, ast.USub) else operand
+    return BINARY_OPS[type(node.op)](eval_arithmetic(node.left, cols), eval_arithmetic(node.right, cols))
+
+
+def compile_formula_column(field, context):
+    """Vectorize formula fields made of arithmetic over numeric columns (plus date + int days).
+
+    Returns gen(n, cols) -> (array, is_datetime), or None when the row engine has to evaluate it.
+    """
+    formula = field.get('formula', '')
+    if field.get('by_service') or not formula:
+        return None
+    # Mirror the row engine: a single '+' splits the formula into two independently evaluated sides
+    parts = None
+    if '+' in formula:
+        split = formula.split('+')
+        if len(split) == 2:
+            parts = [p.strip() for p in split]
+            if not all(is_arithmetic(p) for p in parts):
+                return None
+    if not is_arithmetic(formula):
+        return None
+    names = formula_names(formula)
+    trees = [ast.parse(p, mode='eval') for p in parts] if parts else None
+    tree = ast.parse(formula, mode='eval')
+    precision = 4 if field.get('name') == 'variance_pct' else 2
+
+    def gen_formula(n, cols):
+        if not names.issubset(cols) or any(cols[name].dtype == object for name in names):
+            return None
+        date_names = {name for name in names if is_datetime_column(cols[name])}
+        with np.errstate(all='ignore'):
+            if not date_names:
+                result = np.asarray(eval_arithmetic(tree, cols))
+            elif trees and len(date_names) == 1:
+                # date + int days, the only date math the row engine supports
+                left, right = (np.asarray(eval_arithmetic(t, cols)) for t in trees)
+                if is_datetime_column(left) and np.issubdtype(right.dtype, np.integer):
+                    result = left + right.astype('timedelta64[D]')
+                elif is_datetime_column(right) and np.issubdtype(left.dtype, np.integer):
+                    result = right + left.astype('timedelta64[D]')
+                else:
+                    return None
+            else:
+                return None
+        if result.shape != (n,):
+            result = np.broadcast_to(result, (n,)).copy()
+        if is_datetime_column(result):
+            return result, True
+        if np.issubdtype(result.dtype, np.floating):
+            result = np.round(result, precision)
+            finite = np.isfinite(result)
+            if not finite.all():
+                # ZeroDivisionError rows are None in the row engine
+                result = result.astype(object)
+                result[~finite] = None
+        return result, False
+    return gen_formula
+
+
+def compile_pattern_column(field, context, reference_pools, date_fields=None, py_rng=None, faker=None):
+    pattern = field['pattern']
+    components = {
+        cname: compile_column(cdef, context, reference_pools, date_fields, py_rng, faker)
+        for cname, cdef in field['components'].items()
+    }
+    pieces = list(string.Formatter().parse(pattern))
+    simple = all(not spec and not conv for _, fname, spec, conv in pieces)
+    if simple and not all(fname in components for _, fname, _, _ in pieces if fname is not None):
+        simple = False
+
+    def gen_pattern(n, cols, formats, rng):
+        values = {cname: output_values(gen(n, cols, formats, rng)) for cname, gen in components.items()}
+        if simple:
+            # Plain '{name}' substitutions: concatenate whole string columns
+            out = np.full(n, '', dtype=object)
+            for literal, fname, _, _ in pieces:
+                if literal:
+                    out = out + literal
+                if fname is not None:
+                    out = out + np.array([str(v) for v in values[fname].tolist()], dtype=object)
+            return out, None
+        rows = [dict(zip(values, row)) for row in zip(*(v.tolist() for v in values.values()))]
+        out = np.empty(n, dtype=object)
+        for i, row in enumerate(rows):
+            try:
+                out[i] = pattern.format(**row)
+            except Exception:
+                out[i] = None
+        return out, None
+    return gen_pattern
+
+
+def output_values(generated):
+    # Column values as the row engine would emit them (dates formatted, everything else as-is)
+    arr, fmt = generated
+    if fmt is not None:
+        return format_datetimes(arr, fmt)
+    return arr
+
+
+def compile_column(field, context, reference_pools, date_fields=None, py_rng=None, faker=None):
+    """Compile a field definition into gen(n, cols, formats, rng) -> (array, datetime_format_or_None).
+
+    cols holds the typed columns generated so far in the batch (dates as datetime64) and
+    formats the output format of each datetime column. py_rng (a random.Random) and faker
+    drive the row-engine fallbacks.
+    """
+    ftype = field['type']
+    fname = field.get('name')
+    if ftype == 'datetime':
+        min_dt, max_dt = samples_run.parse_datetime_bounds(field)
+        start = np.datetime64(min_dt, 's')
+        span = int((max_dt - min_dt).total_seconds())
+        return lambda n, cols, formats, rng: (start + rng.integers(0, span + 1, size=n).astype('timedelta64[s]'), ISO_DATETIME_FORMAT)
+    if ftype == 'date':
+        start_dt, end_dt = samples_run.parse_date_bounds(field)
+        start = np.datetime64(start_dt, 's')
+        delta = (end_dt - start_dt).days
+        time_format = field.get('time_format')
+
+        def gen_date(n, cols, formats, rng):
+            seconds = rng.integers(0, delta + 1, size=n) * 86400
+            if time_format:
+                seconds += rng.integers(0, 86400, size=n)
+            return start + seconds.astype('timedelta64[s]'), time_format or ISO_DATE_FORMAT
+        return gen_date
+    if ftype == 'reference':
+        values = column_array(samples_run.load_reference_pool(field, reference_pools).column(field['reference_field']))
+        rows_for = compile_reference_rows(field, reference_pools, py_rng)
+        return lambda n, cols, formats, rng: (values[rows_for(n, cols, rng)], None)
+    if ftype == 'faker':
+        gen_row = samples_run.compile_field(field, context, reference_pools, date_fields, py_rng, faker)
+        pool = samples_run.faker_field_pool(field)
+        if pool is not None:
+            values = object_array(pool)
+            return lambda n, cols, formats, rng: (choose(rng, values, n), None)
+        return lambda n, cols, formats, rng: (object_array([gen_row(None) for _ in range(n)]), None)
+    if ftype == 'string' and 'pattern' in field and 'components' in field:
+        return compile_pattern_column(field, context, reference_pools, date_fields, py_rng, faker)
+    if ftype == 'choice':
+        if fname == 'service':
+            services = object_array(list(aws_service_mappings.SERVICE_CATALOG['regions']))
+            return lambda n, cols, formats, rng: (choose(rng, services, n), None)
+        values = object_array(field['values']) if 'values' in field else None
+        cum_weights = samples_run.cumulative_weights(field['weights']) if field.get('weights') else None
+        conditional = samples_run.conditional_choices(field)
+        if conditional:
+            parent, table, fallback, default = conditional
+            table = {k: (object_array(v), w) for k, (v, w) in table.items()}
+            fallback = (object_array(fallback[0]), fallback[1])
+            default = (object_array(default[0]), default[1])
+
+            def gen_conditional_choice(n, cols, formats, rng):
+                if parent in cols:
+                    return choose_by_group(rng, cols[parent], table, fallback, n), None
+                return choose(rng, default[0], n, default[1]), None
+            return gen_conditional_choice
+
+        fleet_size = field.get('fleet_size') if fname == 'resource_id' else None
+        fleet_seed = field.get('fleet_seed', 0)
+        fleets = {}
+
+        def gen_choice(n, cols, formats, rng):
+            if fname == 'resource_id' and 'service' in cols:
+                return resource_id_column(rng, cols, values, n, fleet_size, fleet_seed, fleets), None
+            return choose(rng, values, n, cum_weights), None
+        return gen_choice
+    if ftype == 'multi_choice':
+        values = list(field['values'])
+        lo, hi = samples_run.multi_choice_bounds(field)
+        return lambda n, cols, formats, rng: (multi_choice(rng, values, lo, hi, n), None)
+    if ftype in ['int', 'float']:
+        min_v = field.get('min', 0)
+        max_v = field.get('max', 100)
+        conditional = samples_run.conditional_ranges(field, context, min_v, max_v)
+        if conditional:
+            # One lookup table per bound, keyed by the parent value
+            parent, table, default = conditional
+            bounds = [({k: v[i] for k, v in table.items()}, default[i]) for i in range(3)]
+
+        def gen_number(n, cols, formats, rng):
+            lo, hi, multiplier = min_v, max_v, None
+            if conditional and parent in cols:
+                lo, hi, multiplier = (lookup(cols[parent], bound, fallback) for bound, fallback in bounds)
+            if ftype == 'int':
+                values = rng.integers(np.asarray(lo, dtype=np.int64), np.asarray(hi, dtype=np.int64) + 1, size=n)
+                if multiplier is not None:
+                    values = (values * multiplier).astype(np.int64)
+                return values, None
+            values = rng.uniform(lo, hi, size=n)
+            if multiplier is not None:
+                values = values * multiplier
+            return np.round(values, 2), None
+        return gen_number
+    if ftype == 'formula':
+        gen_vectorized = compile_formula_column(field, context)
+        gen_row = samples_run.compile_formula(field, date_fields, py_rng)
+        names = formula_names(field.get('formula', ''))
+        if field.get('by_service'):
+            names.add('service')
+        datetime_format = field.get('output_format') or field.get('time_format') or ISO_DATETIME_FORMAT
+        catalog = aws_service_mappings.SERVICE_CATALOG
+        rates_by_id = rate_matrix(catalog) if fname == 'cost' else None
+
+        def gen_formula(n, cols, formats, rng):
+            if not cols:
+                return np.full(n, None, dtype=object), None
+            # Multi-field consistency: cost = usage_quantity * rate, as in the row engine
+            if fname == 'cost' and all(k in cols for k in ('usage_quantity', 'service', 'usage_type')):
+                service_ids = catalog_ids(cols['service'], catalog['service_ids'])
+                usage_type_ids = catalog_ids(cols['usage_type'], catalog['usage_type_ids'])
+                rates = rates_by_id[service_ids, usage_type_ids]
+                cols['rate'] = rates
+                return np.round(cols['usage_quantity'] * rates, 2), None
+            if gen_vectorized is not None:
+                result = gen_vectorized(n, cols)
+                if result is not None:
+                    values, is_datetime = result
+                    return values, datetime_format if is_datetime else None
+            # Python fallback: evaluate row by row on the emitted (formatted) values
+            referenced = [name for name in cols if name in names] or list(cols)
+            columns = [output_values((cols[name], formats.get(name))).tolist() for name in referenced]
+            out = np.empty(n, dtype=object)
+            for i, row in enumerate(zip(*columns)):
+                out[i] = gen_row(dict(zip(referenced, row)))
+            return out, None
+        return gen_formula
+    return lambda n, cols, formats, rng: (np.full(n, None, dtype=object), None)
+
+
+def apply_continuity(fname, values, slots, continuity_state, rng, upward_drift, spike_prob, spike_min, spike_max, spend_multiplier):
+    # Drift/spike for rows whose series already has a last value, in generation order (matches the row engine)
+    values = values.tolist()
+    n = len(values)
+    normals = rng.standard_normal(n).tolist()
+    spike_draws = rng.random(n).tolist()
+    spikes = rng.uniform(spike_min, spike_max, size=n).tolist()
+    last_values = continuity_state.last_values[fname]
+    for i, slot in enumerate(slots):
+        last = last_values[slot]
+        # NaN (unset) is the only value not equal to itself
+        if last == last:
+            sigma = 0.05 * last if last else 1.0
+            new_val = max(0, last + upward_drift * last + sigma * normals[i])
+            if spike_draws[i] < spike_prob:
+                new_val = last * spikes[i]
+            if fname == 'cost':
+                new_val = round(new_val * spend_multiplier, 2)
+            values[i] = new_val
+        elif fname == 'cost' and values[i] is not None:
+            values[i] = round(values[i] * spend_multiplier, 2)
+        last_values[slot] = NAN if values[i] is None else values[i]
+    if any(v is None for v in values):
+        return object_array(values)
+    return np.array(values)
+
+
+def s3_paths(s3_partition_fields, cols, formats, n):
+    # Partition path per row; date-typed partition fields split into year/month/day
+    parts = []
+    for pf in s3_partition_fields:
+        if pf not in cols:
+            continue
+        arr = cols[pf]
+        if is_datetime_column(arr) and formats.get(pf) in (ISO_DATETIME_FORMAT, ISO_DATE_FORMAT):
+            days = arr.astype('datetime64[D]')
+            codes, uniques = factorize(days)
+            labels = [
+                f"year={d.year}/month={d.month:02d}/day={d.day:02d}"
+                for d in (np.datetime64(u, 'D').astype(object) for u in uniques)
+            ]
+        else:
+            values = output_values((arr, formats.get(pf)))
+            codes, uniques = factorize(values)
+            labels = [None if v is None else f"{pf}={v}" for v in uniques]
+        parts.append((codes, labels))
+    if not parts:
+        return np.full(n, "", dtype=object)
+    # Build each distinct combination of segments once, then map rows onto it
+    combos, inverse = np.unique(np.stack([codes for codes, _ in parts], axis=1), axis=0, return_inverse=True)
+    paths = []
+    for combo in combos.tolist():
+        row = [labels[code] for code, (_, labels) in zip(combo, parts) if labels[code] is not None]
+        paths.append("/".join(row) + "/" if row else "")
+    return object_array(paths)[inverse.reshape(-1)]
+
+
+def series_key_columns(key_plan, series_count, rng):
+    # Distinct series keys as columns; duplicates (e.g. small fleets) are redrawn a bounded number of times
+    series = {}
+    names = [fname for fname, _ in key_plan]
+    for _ in range(10):
+        need = series_count - len(series)
+        if need <= 0:
+            break
+        cols = {}
+        for fname, gen in key_plan:
+            cols[fname], _ = gen(need, cols, {}, rng)
+        for row in zip(*(cols[fname].tolist() for fname in names)):
+            values = dict(zip(names, row))
+            series.setdefault(tuple(values.get(k) for k in samples_run.CONTINUITY_KEY_FIELDS), row)
+    rows = list(series.values())[:series_count]
+    return {fname: object_array([row[i] for row in rows]) for i, fname in enumerate(names)}
+
+
+def compile_columns(config, reference_pools=None, py_rng=None, faker=None, keep=()):
+    # Compiled plan: [(field_name, column generator)] in the row engine's dependency order (unused
+    # *_faker helpers are skipped)
+    context = config.get('context', {})
+    if reference_pools is None:
+        reference_pools = {}
+    date_fields = samples_run.formula_date_fields(config['fields'])
+    fields = samples_run.field_order(config['fields'], context, keep)
+    reference_data.preload_pools(fields, reference_pools)
+    return [(field['name'], compile_column(field, context, reference_pools, date_fields, py_rng, faker)) for field in fields]
+
+
+def iter_column_batches(config, num_records=10000, upward_drift=0.005, spike_prob=0.02, spike_min=2.0, spike_max=10.0, spend_multiplier=1.0, s3_partition_fields=None, batch_size=samples_run.DEFAULT_BATCH_SIZE, rng=None, reference_pools=None, continuity_state=None, cadence=None, series_count=None, time_field=None, py_rng=None, faker=None):
+    """Yield {column: array} batches covering num_records rows, in row-engine column order."""
+    if rng is None:
+        rng = np.random.default_rng()
+    fields = config['fields']
+    output_fields = samples_run.output_field_names(fields)
+    if s3_partition_fields is None:
+        s3_partition_fields = config.get('s3_partition_fields', [])
+    plan = compile_columns(config, reference_pools, py_rng, faker, s3_partition_fields)
+    key_plan, value_plan = samples_run.split_key_plan(plan)
+    if continuity_state is None:
+        continuity_state = ContinuityState(samples_run.CONTINUITY_VALUE_FIELDS)
+    remaining = num_records
+    if cadence:
+        # Time-ordered, as in the row engine: row r is series r % S at tick r // S
+        time_field, time_format, ticks = samples_run.time_series_ticks(config, cadence, time_field)
+        n_series = series_count or -(-num_records // len(ticks))
+        # Topics without key fields get n_series anonymous series
+        series_cols = series_key_columns(key_plan, n_series, rng)
+        if series_cols:
+            n_series = len(next(iter(series_cols.values())))
+        ticks = np.array(samples_run.series_tick_window(ticks, num_records, n_series), dtype='datetime64[s]')
+        samples_run.check_series_rows(num_records, n_series, len(ticks))
+        current = {}
+        key_plan = [
+            (fname, lambda n, cols, formats, rng, column=column: (column[current['series']], None))
+            for fname, column in series_cols.items()
+        ]
+        value_plan = [
+            (fname, (lambda n, cols, formats, rng: (current['ticks'], time_format)) if fname == time_field else gen)
+            for fname, gen in value_plan
+        ]
+    position = 0
+    while remaining > 0:
+        n = min(batch_size, remaining)
+        remaining -= n
+        if cadence:
+            rows = np.arange(position, position + n)
+            current['series'], current['ticks'] = rows % n_series, ticks[rows // n_series]
+        position += n
+        cols = {}
+        formats = {}
+        for fname, gen in key_plan:
+            cols[fname], formats[fname] = gen(n, cols, formats, rng)
+        slots = None
+        for fname, gen in value_plan:
+            values, fmt = gen(n, cols, formats, rng)
+            if fname in samples_run.CONTINUITY_VALUE_FIELDS:
+                if slots is None:
+                    slots = continuity_state.slots_for(zip(*(
+                        cols[k].tolist() if k in cols else [None] * n
+                        for k in samples_run.CONTINUITY_KEY_FIELDS
+                    )))
+                values = apply_continuity(fname, values, slots, continuity_state, rng, upward_drift, spike_prob, spike_min, spike_max, spend_multiplier)
+            cols[fname], formats[fname] = values, fmt
+        continuity_state.trim()
+        batch = {name: output_values((cols[name], formats.get(name))) for name in output_fields}
+        if s3_partition_fields:
+            batch['s3_path'] = s3_paths(s3_partition_fields, cols, formats, n)
+        yield batch
+
+
+def generate_columns_from_config(config, num_records=10000, **kwargs):
+    batches = list(iter_column_batches(config, num_records=num_records, **kwargs))
+    if not batches:
+        return {}
+    if len(batches) == 1:
+        return batches[0]
+    return {name: np.concatenate([b[name] for b in batches]) for name in batches[0]}
+
+
+def columns_to_records(columns):
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
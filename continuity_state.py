@@ -0,0 +1,101 @@
+# continuity_state.py
+# Compact last-value store for drift/spike series.
+# Each (account_id, service, resource_id) key is interned to a slot id, and last values live in
+# parallel float arrays (one per continuity field, NaN = no value yet) instead of a dict per key.
+# The store can be capped (least recently used series are dropped) and saved/loaded so that
+# incremental runs continue each series instead of restarting it.
+import gzip
+import json
+import os
+from array import array
+from collections import OrderedDict
+
+NAN = float('nan')
+
+
+class ContinuityState:
+    def __init__(self, fields, max_keys=None):
+        self.fields = tuple(fields)
+        self.max_keys = max_keys
+        self.slots = OrderedDict() if max_keys else {}
+        # Parallel arrays indexed by slot id: last_values[field][slot]
+        self.last_values = {fname: array('d') for fname in self.fields}
+        self.free_slots = []
+
+    def __len__(self):
+        return len(self.slots)
+
+    def slot(self, key):
+        # Slot id for key, allocating one for new keys; marks the key as recently used
+        slot = self.slots.get(key)
+        if slot is not None:
+            if self.max_keys:
+                self.slots.move_to_end(key)
+            return slot
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = len(self.slots)
+            for column in self.last_values.values():
+                column.append(NAN)
+        self.slots[key] = slot
+        return slot
+
+    def slots_for(self, keys):
+        # slot() for a batch of keys; without a cap new slots are allocated in bulk
+        if self.max_keys:
+            return [self.slot(key) for key in keys]
+        slots = self.slots
+        start = len(slots)
+        setdefault = slots.setdefault
+        ids = [setdefault(key, len(slots)) for key in keys]
+        added = len(slots) - start
+        if added:
+            for column in self.last_values.values():
+                column.extend(array('d', [NAN]) * added)
+        return ids
+
+    def last(self, slot, fname):
+        value = self.last_values[fname][slot]
+        return None if value != value else value
+
+    def update(self, slot, fname, value):
+        self.last_values[fname][slot] = NAN if value is None else value
+
+    def trim(self):
+        # Evict least recently used keys down to max_keys. Called between records/batches, never
+        # while a batch still holds slot ids, so a slot is not reused under a live row.
+        if not self.max_keys:
+            return
+        while len(self.slots) > self.max_keys:
+            _, slot = self.slots.popitem(last=False)
+            for column in self.last_values.values():
+                column[slot] = NAN
+            self.free_slots.append(slot)
+
+    def save(self, path):
+        series = [
+            [list(key), [self.last(slot, fname) for fname in self.fields]]
+            for key, slot in self.slots.items()
+        ]
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt') as f:
+            json.dump({'fields': list(self.fields), 'series': series}, f)
+
+    @classmethod
+    def load(cls, path, fields, max_keys=None):
+        # Missing file means a first run: start from an empty state
+        state = cls(fields, max_keys)
+        if not os.path.exists(path):
+            return state
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            saved = json.load(f)
+        saved_fields = saved.get('fields', [])
+        for key, values in saved.get('series', []):
+            slot = state.slot(tuple(key))
+            for fname, value in zip(saved_fields, values):
+                if fname in state.last_values:
+                    state.update(slot, fname, value)
+        state.trim()
+        return state
@@ -0,0 +1,136 @@
+# dataset_cache.py
+# Content-addressed cache of generated output files.
+# A run's key hashes everything its output depends on (topic config, referenced pool files, rate
+# card, generator code, the versions of the libraries producing values and bytes, seed and
+# parameters). A later run with the same key hardlinks (or copies) the cached file to its output
+# path instead of generating it again. Least recently used files, Faker pools in the faker_pools
+# subdirectory included, are evicted once the cache grows past its size limit.
+import hashlib
+import json
+import os
+import shutil
+from importlib import metadata
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'samples_run')
+DEFAULT_CACHE_SIZE_MB = 2048
+CACHE_VERSION = 2
+# Modules whose code determines the generated data; editing one invalidates the cache
+SOURCE_FILES = (
+    'samples_run.py', 'columnar_engine.py', 'parallel_generation.py', 'aws_service_mappings.py',
+    'saas_service_mappings.py', 'continuity_state.py', 'output_writers.py', 'arrow_schema.py',
+    'reference_data.py',
+)
+# Packages whose upgrades can change generated values or output bytes
+LIBRARIES = ('faker', 'numpy', 'pandas', 'pyarrow', 'PyYAML', 'orjson', 'msgspec', 'zstandard', 'duckdb')
+CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def referenced_files(value):
+    # reference_file entries anywhere in the field definitions (including pattern components)
+    if isinstance(value, dict):
+        if 'reference_file' in value:
+            yield value['reference_file']
+        for v in value.values():
+            yield from referenced_files(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from referenced_files(v)
+
+
+def library_versions():
+    # {package: installed version or None}
+    versions = {}
+    for name in LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def cache_key(config_path, config, params, extra_files=()):
+    """Hex digest identifying a run's output.
+
+    Files are hashed by content, so renaming or touching a config does not invalidate its entries.
+    params must be JSON-serializable (the seed, record count, generator options and anything
+    resolved at run time, such as dynamic date bounds).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = [config_path, *referenced_files(config['fields']), *extra_files]
+    files += [os.path.join(here, name) for name in SOURCE_FILES]
+    digests = [file_digest(path) if os.path.exists(path) else None for path in files]
+    payload = {'version': CACHE_VERSION, 'params': params, 'files': digests, 'libraries': library_versions()}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def entry_path(cache_dir, key, output_type):
+    return os.path.join(cache_dir, f"{key}.{output_type}")
+
+
+def place(src, dst):
+    # Hardlink src to dst (copy across filesystems), replacing dst atomically
+    dst_dir = os.path.dirname(dst)
+    if dst_dir:
+        os.makedirs(dst_dir, exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def unlink_shared(path):
+    # A hardlinked output shares its bytes with a cache entry; drop the link before the file is
+    # rewritten so the entry is not overwritten with different data
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def fetch(cache_dir, key, output_type, output_path):
+    """Place the cached output for key at output_path; False if there is none."""
+    entry = entry_path(cache_dir, key, output_type)
+    if not os.path.exists(entry):
+        return False
+    # mtime is the LRU clock
+    os.utime(entry)
+    place(entry, output_path)
+    return True
+
+
+def store(cache_dir, key, output_type, output_path, max_bytes):
+    os.makedirs(cache_dir, exist_ok=True)
+    place(output_path, entry_path(cache_dir, key, output_type))
+    evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir, max_bytes):
+    """Remove least recently used files, in subdirectories too, until the cache holds at most max_bytes."""
+    entries = []
+    for directory, _, names in os.walk(cache_dir):
+        for name in names:
+            if not name.endswith('.tmp'):
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+    return total
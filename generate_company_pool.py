@@ -1,21 +1,125 @@
-import json
+# generate_company_pool.py
+# Builds the company reference pool used by `reference` fields (data/company_pool.json by default).
+# Names are generated in batches from the locale's company name templates instead of one
+# fake.company() call per row, so pools of millions of companies take seconds; JSONL, CSV and Parquet
+# output is written batch by batch.
+import argparse
+import random
+import re
+
 from faker import Faker
 
+import output_writers
+from saas_service_mappings import INDUSTRY_REVENUE_MULTIPLIER
+
 NUM_COMPANIES = 100
+ID_START = 10000
 OUTPUT_FILE = 'data/company_pool.json'
+BATCH_SIZE = 100000
+# Values drawn per template token (last_name, company_suffix, ...); draws keep Faker's weighting
+TOKEN_POOL_SIZE = 10000
+# Optional per-company attributes: column -> (values, weights)
+ATTRIBUTES = {
+    'industry': (list(INDUSTRY_REVENUE_MULTIPLIER), None),
+    'company_size': (['1-10', '11-50', '51-200', '201-1000', '1001-5000', '5000+'], [0.3, 0.3, 0.2, 0.12, 0.05, 0.03]),
+    'region': (['North America', 'Europe', 'APAC', 'South America', 'Asia', 'Africa', 'Oceania'], [0.5, 0.2, 0.1, 0.1, 0.05, 0.025, 0.025]),
+}
+TOKEN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+def company_templates(fake):
+    """[(str.format template, token value pools)] for the locale's company name formats.
+
+    Falls back to a single '{}' template over fake.company() values if the locale's company
+    provider has no formats to expand.
+    """
+    provider = next((p for p in fake.providers if type(p).__module__.startswith('faker.providers.company')), None)
+    formats = getattr(provider, 'formats', None)
+    if not formats:
+        return [('{}', [[fake.company() for _ in range(TOKEN_POOL_SIZE)]])]
+    pools = {}
+    templates = []
+    for fmt in formats:
+        parts = TOKEN.split(fmt)
+        # Literal text at even positions, token names at odd ones
+        template = ''.join(
+            '{}' if i % 2 else part.replace('{', '{{').replace('}', '}}')
+            for i, part in enumerate(parts)
+        )
+        tokens = parts[1::2]
+        for token in tokens:
+            if token not in pools:
+                method = getattr(fake, token)
+                pools[token] = [method() for _ in range(TOKEN_POOL_SIZE)]
+        templates.append((template, [pools[token] for token in tokens]))
+    return templates
+
+
+def company_names(templates, n, rng):
+    # Template per row (uniform, like fake.company()), then every token drawn per template in bulk
+    picks = rng.choices(range(len(templates)), k=n)
+    names = [None] * n
+    for index, (template, pools) in enumerate(templates):
+        rows = [i for i, pick in enumerate(picks) if pick == index]
+        if not rows:
+            continue
+        values = zip(*(rng.choices(pool, k=len(rows)) for pool in pools))
+        fmt = template.format
+        for i, parts in zip(rows, values):
+            names[i] = fmt(*parts)
+    return names
+
+
+def iter_company_batches(count, id_start=ID_START, seed=None, attributes=(), locale=None, batch_size=BATCH_SIZE):
+    """Yield lists of company records (company_id, company_name and the chosen attributes)."""
+    rng = random.Random(seed)
+    fake = Faker(locale) if locale else Faker()
+    if seed is not None:
+        fake.seed_instance(seed)
+    templates = company_templates(fake)
+    for start in range(0, count, batch_size):
+        n = min(batch_size, count - start)
+        columns = {
+            'company_id': range(id_start + start, id_start + start + n),
+            'company_name': company_names(templates, n, rng),
+        }
+        for name in attributes:
+            values, weights = ATTRIBUTES[name]
+            columns[name] = rng.choices(values, weights, k=n)
+        names = list(columns)
+        yield [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def output_type_for(path):
+    # (output type, compression) from the file name; text formats take a .gz/.zst suffix
+    path, compression = output_writers.split_compression(path)
+    for ext in ('jsonl', 'csv', 'parquet'):
+        if path.endswith('.' + ext):
+            return ext, compression
+    return 'json', compression
 
-fake = Faker()
 
-company_pool = []
-for i in range(NUM_COMPANIES):
-    company_id = 10000 + i
-    company_name = fake.company()
-    company_pool.append({
-        'company_id': company_id,
-        'company_name': company_name
-    })
+def main():
+    parser = argparse.ArgumentParser(description="Generate the company reference pool.")
+    parser.add_argument("--count", type=int, default=NUM_COMPANIES, help=f"Number of companies (default: {NUM_COMPANIES})")
+    parser.add_argument("--id-start", type=int, default=ID_START, help=f"First company_id; ids are sequential (default: {ID_START})")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for a reproducible pool")
+    parser.add_argument("--attributes", type=str, default="", help=f"Comma-separated extra columns: {', '.join(ATTRIBUTES)}")
+    parser.add_argument("--locale", type=str, default=None, help="Faker locale for company names (default: Faker's)")
+    parser.add_argument("--output", type=str, default=OUTPUT_FILE, help=f"Output file; .json, .jsonl, .csv or .parquet, text formats optionally .gz/.zst (default: {OUTPUT_FILE})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Companies generated and written per batch (default: {BATCH_SIZE})")
+    args = parser.parse_args()
+    attributes = [a.strip() for a in args.attributes.split(",") if a.strip()]
+    unknown = [a for a in attributes if a not in ATTRIBUTES]
+    if unknown:
+        parser.error(f"Unknown attributes: {', '.join(unknown)} (choose from {', '.join(ATTRIBUTES)})")
+    output_type, compression = output_type_for(args.output)
+    if output_type == 'parquet' and compression:
+        parser.error("Parquet output is compressed per column; drop the .gz/.zst suffix")
+    batches = iter_company_batches(args.count, args.id_start, args.seed, attributes, args.locale, args.batch_size)
+    count = output_writers.write_batches(batches, output_type, args.output, compression=compression)
+    print(f"Generated {count} companies in {args.output}")
 
-with open(OUTPUT_FILE, 'w') as f:
-    json.dump(company_pool, f, indent=2)
 
-print(f"Generated {NUM_COMPANIES} companies in {OUTPUT_FILE}")
+if __name__ == "__main__":
+    main()
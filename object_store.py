@@ -0,0 +1,276 @@
+# object_store.py
+# Output sink for S3-compatible object stores, so generated files stream to a bucket instead of
+# being staged on local disk for a separate upload step.
+# Every object is written through a MultipartUpload: bytes are cut into part_size parts that upload
+# concurrently on the store's thread pool (one pooled connection per thread), and the upload is
+# completed when the object is closed, or aborted when the writer fails. LocalStore runs the same
+# protocol against a directory, as a stand-in for testing without a bucket.
+import io
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+# S3 rejects parts below 5 MiB (except an object's last part) and uploads of more than 10000 parts
+MIN_PART_SIZE = 5 << 20
+MAX_PARTS = 10000
+DEFAULT_PART_SIZE = 8 << 20
+DEFAULT_CONNECTIONS = 16
+
+
+class MultipartUpload(io.BufferedIOBase):
+    """Writable binary file object for one object of a store.
+
+    Every full part is submitted to the store's upload pool as soon as it is written; close() waits
+    for the parts and completes the upload. An object that never fills a part is uploaded with a
+    single put. abort() (also called when a with-block or close() fails, or when the object is
+    dropped unclosed) discards it, so a failed writer never publishes a truncated object.
+    """
+
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+        self.upload_id = None
+        self.parts = []
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError(f"Upload of {self.key} is already closed")
+        self.buffer += data
+        self.position += len(data)
+        part_size = self.store.part_size
+        while len(self.buffer) >= part_size:
+            self.send(bytes(self.buffer[:part_size]))
+            del self.buffer[:part_size]
+        return len(data)
+
+    def send(self, data):
+        if self.upload_id is None:
+            self.upload_id = self.store.start(self.key)
+        if len(self.parts) >= MAX_PARTS:
+            raise ValueError(f"{self.key} needs more than {MAX_PARTS} parts; use a larger part size")
+        self.parts.append(self.store.submit(self.store.upload_part, self.key, self.upload_id, len(self.parts) + 1, data))
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                self.store.put(self.key, bytes(self.buffer))
+            else:
+                if self.buffer:
+                    self.send(bytes(self.buffer))
+                self.store.complete(self.key, self.upload_id, [part.result() for part in self.parts])
+        except BaseException:
+            self.abort()
+            raise
+        self.buffer = bytearray()
+        super().close()
+
+    def abort(self):
+        # Discard the object: queued parts are cancelled and, once the running ones are done, the
+        # multipart upload is aborted so none of its parts are kept
+        if self.closed:
+            return
+        try:
+            if self.upload_id is not None:
+                for part in self.parts:
+                    part.cancel()
+                wait(self.parts)
+                self.store.abort(self.key, self.upload_id)
+        finally:
+            self.buffer = bytearray()
+            super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __del__(self):
+        # io objects close themselves when collected; an upload nobody closed is discarded instead
+        try:
+            self.abort()
+        except Exception:
+            pass
+
+
+class ObjectStore(ABC):
+    """Base for the stores: objects under prefix, parts uploaded on a shared pool of connections threads.
+
+    At most two parts per connection are queued or in flight across every open object, so memory
+    stays bounded by the part size no matter how many objects are written at once.
+    """
+
+    def __init__(self, prefix='', part_size=None, connections=None):
+        self.prefix = prefix.strip('/')
+        self.part_size = part_size or DEFAULT_PART_SIZE
+        if self.part_size < MIN_PART_SIZE:
+            raise ValueError(f"Part size must be at least {MIN_PART_SIZE >> 20} MiB")
+        connections = connections or DEFAULT_CONNECTIONS
+        self.pool = ThreadPoolExecutor(max_workers=connections)
+        self.slots = threading.BoundedSemaphore(connections * 2)
+
+    def object_key(self, path):
+        key = path.replace(os.sep, '/').lstrip('/')
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def open(self, path):
+        # Writable file object for the object at prefix/path
+        return MultipartUpload(self, self.object_key(path))
+
+    def submit(self, fn, *args):
+        self.slots.acquire()
+        try:
+            future = self.pool.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    @abstractmethod
+    def url(self, path=''):
+        # URL of the object at prefix/path
+        pass
+
+    @abstractmethod
+    def start(self, key):
+        # Upload id of a new multipart upload
+        pass
+
+    @abstractmethod
+    def upload_part(self, key, upload_id, number, data):
+        # Upload part number (from 1); returns what complete() needs to know about the part
+        pass
+
+    @abstractmethod
+    def complete(self, key, upload_id, parts):
+        # Publish the object from its parts, in order
+        pass
+
+    @abstractmethod
+    def abort(self, key, upload_id):
+        # Discard a multipart upload and its parts
+        pass
+
+    @abstractmethod
+    def put(self, key, data):
+        # Publish a small object in one request
+        pass
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class S3Store(ObjectStore):
+    """Objects in an S3 bucket, or any S3-compatible service (MinIO, R2, ...) given endpoint_url."""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, part_size=None, connections=None):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ImportError("S3 output requires the boto3 package. Run 'pip install boto3'.")
+        super().__init__(prefix, part_size, connections)
+        self.bucket = bucket
+        # One pooled HTTP connection per upload thread
+        config = Config(max_pool_connections=connections or DEFAULT_CONNECTIONS, retries={'mode': 'standard'})
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, config=config)
+
+    def url(self, path=''):
+        return f"s3://{self.bucket}/{self.object_key(path)}"
+
+    def start(self, key):
+        return self.client.create_multipart_upload(Bucket=self.bucket, Key=key)['UploadId']
+
+    def upload_part(self, key, upload_id, number, data):
+        response = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data)
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def complete(self, key, upload_id, parts):
+        self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+
+    def abort(self, key, upload_id):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def put(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+
+class LocalStore(ObjectStore):
+    """Stand-in store in a local directory, with objects at root/<key>.
+
+    Parts are written to root/.uploads/<upload id>/ by the upload threads and joined into the object
+    on completion, so an object only appears once its upload completes, as in S3.
+    """
+
+    def __init__(self, root, prefix='', part_size=None, connections=None):
+        super().__init__(prefix, part_size, connections)
+        self.root = os.path.abspath(root)
+
+    def url(self, path=''):
+        return 'file://' + os.path.join(self.root, self.object_key(path))
+
+    def staging(self, upload_id):
+        return os.path.join(self.root, '.uploads', upload_id)
+
+    def start(self, key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self.staging(upload_id))
+        return upload_id
+
+    def upload_part(self, key, upload_id, number, data):
+        with open(os.path.join(self.staging(upload_id), str(number)), 'wb') as f:
+            f.write(data)
+        return number
+
+    def complete(self, key, upload_id, parts):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.part', 'wb') as out:
+            for number in parts:
+                with open(os.path.join(self.staging(upload_id), str(number)), 'rb') as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(path + '.part', path)
+        self.abort(key, upload_id)
+
+    def abort(self, key, upload_id):
+        shutil.rmtree(self.staging(upload_id), ignore_errors=True)
+
+    def put(self, key, data):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.part', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.part', path)
+
+
+def open_store(url, endpoint_url=None, part_size=None, connections=None):
+    """Store for s3://bucket/prefix, or file:///directory for the local stand-in."""
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        if not parsed.netloc:
+            raise ValueError(f"No bucket in {url}")
+        return S3Store(parsed.netloc, parsed.path, endpoint_url, part_size, connections)
+    if parsed.scheme == 'file':
+        return LocalStore(parsed.netloc + parsed.path, part_size=part_size, connections=connections)
+    raise ValueError(f"Unsupported object store URL: {url} (use s3://bucket/prefix or file:///directory)")
@@ -0,0 +1,841 @@
+# output_writers.py
+# Incremental writers for generated data.
+# Every writer consumes an iterable of batches, where a batch is either a list of record dicts
+# (row engine) or a dict of column arrays (columnar engine), so memory stays bounded by one batch.
+# Text formats can be gzip/zstd compressed on the fly; Parquet files use the format's own codecs.
+# Given an object store (see object_store.py), output paths are object keys and files stream to it;
+# a writer that fails aborts its uploads instead of publishing truncated objects.
+import gzip
+import io
+import json
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+def batch_len(batch):
+    if isinstance(batch, dict):
+        return len(next(iter(batch.values()))) if batch else 0
+    return len(batch)
+
+
+def batch_records(batch):
+    if isinstance(batch, dict):
+        from columnar_engine import columns_to_records
+        return columns_to_records(batch)
+    return batch
+
+
+def batch_head(batch, n):
+    if isinstance(batch, dict):
+        return {name: values[:n] for name, values in batch.items()}
+    return batch[:n]
+
+
+def batch_to_frame(batch):
+    import pandas as pd
+    return pd.DataFrame(batch)
+
+
+def peek_records(batches, n=5):
+    # First n records from the stream, plus an iterator that still yields every batch
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        return [], iter(())
+    return batch_records(batch_head(first, n)), itertools.chain([first], batches)
+
+
+# Stream compression for JSON/JSONL/CSV output, by file suffix
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_COMPRESSION_LEVELS = {'gzip': 6, 'zstd': 3}
+# Parquet column codecs (pyarrow's default is snappy)
+PARQUET_CODECS = ('snappy', 'zstd', 'gzip', 'brotli', 'lz4', 'none')
+# Uncompressed bytes per gzip member compressed by one thread
+COMPRESS_CHUNK_SIZE = 4 << 20
+# Buffer for text output files; each batch is encoded and written in a single call
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def split_compression(path):
+    # (path without a .gz/.zst suffix, codec or None)
+    for codec, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return path[:-len(suffix)], codec
+    return path, None
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """Binary file wrapper that gzips COMPRESS_CHUNK_SIZE pieces on a thread pool.
+
+    Every piece becomes its own gzip member, written in order; concatenated members are a valid
+    .gz stream that gzip, zcat and every gzip reader decompress as one file. zlib releases the GIL,
+    so the threads compress in parallel.
+    """
+
+    def __init__(self, raw, level, threads):
+        self.raw = raw
+        self.level = level
+        self.pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        self.max_pending = threads * 2
+        self.pending = deque()
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def compress(self, data):
+        # mtime=0 keeps the output reproducible
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def submit(self, data):
+        if self.pool is None:
+            self.raw.write(self.compress(data))
+            return
+        self.pending.append(self.pool.submit(self.compress, data))
+        while len(self.pending) > self.max_pending:
+            self.raw.write(self.pending.popleft().result())
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= COMPRESS_CHUNK_SIZE:
+            view = memoryview(bytes(self.buffer))
+            full = len(view) - len(view) % COMPRESS_CHUNK_SIZE
+            for start in range(0, full, COMPRESS_CHUNK_SIZE):
+                self.submit(view[start:start + COMPRESS_CHUNK_SIZE])
+            self.buffer = bytearray(view[full:])
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.buffer:
+                self.submit(bytes(self.buffer))
+                self.buffer = bytearray()
+            while self.pending:
+                self.raw.write(self.pending.popleft().result())
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.raw.close()
+            super().close()
+
+
+def discard(f):
+    # Close a file whose output is incomplete: an object store upload is aborted, not published
+    abort = getattr(f, 'abort', None)
+    if abort is not None:
+        abort()
+    else:
+        f.close()
+
+
+def close_quietly(f):
+    # Release a writer whose underlying upload was already aborted
+    try:
+        f.close()
+    except Exception:
+        pass
+
+
+def open_output(path, compression=None, level=None, threads=None, append=False):
+    """Binary file for text output, compressed with compression (gzip or zstd) if given.
+
+    threads compress in parallel (default: one per CPU). Appending to a compressed file adds a new
+    gzip member / zstd frame, which readers decompress as a continuation of the file.
+    """
+    raw = open(path, "ab" if append else "wb", buffering=WRITE_BUFFER_SIZE)
+    return compress_output(raw, compression, level, threads)
+
+
+def compress_output(raw, compression=None, level=None, threads=None):
+    # raw (a binary file or object store upload) wrapped in a gzip/zstd compressor, see open_output
+    if compression is None:
+        return raw
+    if compression not in COMPRESSION_SUFFIXES:
+        discard(raw)
+        raise ValueError(f"Unsupported compression: {compression}")
+    if level is None:
+        level = DEFAULT_COMPRESSION_LEVELS[compression]
+    if threads is None:
+        threads = os.cpu_count() or 1
+    if compression == 'gzip':
+        return ParallelGzipWriter(raw, level, threads)
+    try:
+        import zstandard
+    except ImportError:
+        discard(raw)
+        raise ImportError("zstd compression requires the zstandard package. Run 'pip install zstandard'.")
+    # zstd splits the stream across its own worker threads
+    return zstandard.ZstdCompressor(level=level, threads=threads if threads > 1 else 0).stream_writer(raw)
+
+
+@contextmanager
+def output_stream(path, compression=None, level=None, threads=None, store=None, text=False):
+    """open_output as a with-block, wrapped in a UTF-8 text stream with text=True.
+
+    With a store, path is the key of an object uploaded as it is written; if the block raises, the
+    upload is aborted instead of completed.
+    """
+    raw = store.open(path) if store is not None else open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+    f = compress_output(raw, compression, level, threads)
+    if text:
+        f = io.TextIOWrapper(f, encoding="utf-8", newline="")
+    try:
+        yield f
+    except BaseException:
+        if store is not None:
+            raw.abort()
+            close_quietly(f)
+        else:
+            f.close()
+        raise
+    f.close()
+
+
+def orjson_encoder(indent):
+    import orjson
+    if indent not in (None, 2):
+        # orjson only indents by two spaces
+        return None
+    option = orjson.OPT_INDENT_2 if indent else 0
+    dumps = orjson.dumps
+    return lambda obj: dumps(obj, option=option)
+
+
+def msgspec_encoder(indent):
+    import msgspec
+    encode = msgspec.json.Encoder().encode
+    if indent:
+        fmt = msgspec.json.format
+        return lambda obj: fmt(encode(obj), indent=indent)
+    return encode
+
+
+def stdlib_encoder(indent):
+    encoder = json.JSONEncoder(ensure_ascii=False, indent=indent, separators=(',', ': ') if indent else (',', ':'))
+    return lambda obj: encoder.encode(obj).encode('utf-8')
+
+
+# JSON serializers in order of preference
+JSON_SERIALIZERS = {'orjson': orjson_encoder, 'msgspec': msgspec_encoder, 'json': stdlib_encoder}
+
+
+def json_encoder(serializer=None, indent=None):
+    """(serializer name, callable(obj) -> UTF-8 JSON bytes).
+
+    serializer None takes the first installed of orjson, msgspec and the stdlib json module; naming
+    one that is not installed raises ImportError. Output is compact unless indent is given, and
+    indents orjson cannot produce fall back to the stdlib.
+    """
+    for name in ([serializer] if serializer else JSON_SERIALIZERS):
+        try:
+            encode = JSON_SERIALIZERS[name](indent)
+        except ImportError:
+            if serializer:
+                raise
+            continue
+        if encode is not None:
+            return name, encode
+    return 'json', stdlib_encoder(indent)
+
+
+def write_json(batches, output_path, serializer=None, indent=None, compression=None, level=None, threads=None, store=None):
+    """Stream batches into a JSON array without holding every record at once.
+
+    Records are written one per line, or nested like json.dump(records, indent=indent) with an indent.
+    """
+    _, encode = json_encoder(serializer, indent)
+    if indent:
+        pad = b" " * indent
+        newline = b"\n" + pad
+        # Encoded JSON has no raw newlines inside strings, so every one of them is layout
+        encode_item = lambda rec: pad + encode(rec).replace(b"\n", newline)
+    else:
+        encode_item = encode
+    count = 0
+    with output_stream(output_path, compression, level, threads, store) as f:
+        f.write(b"[")
+        for batch in batches:
+            records = batch_records(batch)
+            if not records:
+                continue
+            f.write((b",\n" if count else b"\n") + b",\n".join(map(encode_item, records)))
+            count += len(records)
+        f.write(b"\n]\n" if count else b"]\n")
+    return count
+
+
+def write_jsonl(batches, output_path, serializer=None, compression=None, level=None, threads=None, store=None):
+    _, encode = json_encoder(serializer)
+    count = 0
+    with output_stream(output_path, compression, level, threads, store) as f:
+        for batch in batches:
+            records = batch_records(batch)
+            if records:
+                f.write(b"\n".join(map(encode, records)) + b"\n")
+            count += len(records)
+    return count
+
+
+def write_csv(batches, output_path, compression=None, level=None, threads=None, store=None):
+    count = 0
+    with output_stream(output_path, compression, level, threads, store, text=True) as f:
+        for batch in batches:
+            # Header only once, then append each batch
+            batch_to_frame(batch).to_csv(f, index=False, header=count == 0)
+            count += batch_len(batch)
+    return count
+
+
+def convert_column(column, arrow_type, time_format=None):
+    # One Arrow column in its declared type; date strings are parsed with their output format
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    if pa.types.is_null(column.type):
+        return pa.nulls(len(column), arrow_type)
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date32(arrow_type):
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            column = pc.strptime(column, format=time_format, unit='s', error_is_null=True)
+        return column.cast(arrow_type, safe=False)
+    if pa.types.is_dictionary(arrow_type):
+        if column.type != arrow_type:
+            column = column.cast(arrow_type.value_type).dictionary_encode()
+        return column
+    return column.cast(arrow_type, safe=not pa.types.is_floating(arrow_type))
+
+
+def frame_to_table(frame, column_types=None, schema=None):
+    """Arrow table for a batch frame.
+
+    column_types ({column: (Arrow type, time format, stringify)}, see arrow_schema.column_types)
+    converts the columns it declares; the rest keep their inferred types. schema (the first
+    batch's) fixes every column's type for later batches.
+    """
+    import pyarrow as pa
+    if not column_types:
+        return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+    for name, (_, _, stringify) in column_types.items():
+        if stringify and name in frame and frame[name].dtype == object:
+            frame[name] = frame[name].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        if name in column_types:
+            arrow_type, time_format, _ = column_types[name]
+            column = convert_column(column, arrow_type, time_format)
+        columns.append(column)
+    table = pa.Table.from_arrays(columns, names=table.column_names)
+    return table.cast(schema) if schema is not None else table
+
+
+def unsettled(arrow_type):
+    # Type inferred for a column a batch had no values for: null, or lists of null
+    import pyarrow as pa
+    return pa.types.is_null(arrow_type) or (pa.types.is_list(arrow_type) and pa.types.is_null(arrow_type.value_type))
+
+
+def settle_schema(schema):
+    # schema with the columns no batch gave values to typed as strings (or lists of strings)
+    import pyarrow as pa
+    for i, field in enumerate(schema):
+        if unsettled(field.type):
+            schema = schema.set(i, field.with_type(pa.list_(pa.string()) if pa.types.is_list(field.type) else pa.string()))
+    return schema
+
+
+def batch_table(frame, column_types=None, schema=None):
+    """(Arrow table, schema) for a batch frame, after the batches that fixed schema (None for the first).
+
+    Columns in schema that earlier batches had no values for (null, or lists of null) take this
+    batch's type for them, so the returned schema may be promoted; the rest are cast as in
+    frame_to_table.
+    """
+    if schema is not None and not any(unsettled(field.type) for field in schema):
+        return frame_to_table(frame, column_types, schema), schema
+    import pyarrow as pa
+    table = frame_to_table(frame, column_types)
+    if schema is None:
+        return table, table.schema
+    for i, field in enumerate(schema):
+        inferred = table.schema.field(field.name).type
+        if unsettled(field.type) and inferred != field.type and not pa.types.is_null(inferred):
+            schema = schema.set(i, field.with_type(inferred))
+    return table.cast(schema), schema
+
+
+def write_parquet(batches, output_path, compression=None, level=None, column_types=None, store=None):
+    # One row group per batch; the schema is fixed by the first batches, with the column_types they
+    # declare. While columns have no values yet, up to a row group of batches is held back so later
+    # ones can type them (see batch_table). compression is a Parquet codec (PARQUET_CODECS, default
+    # snappy) applied per column chunk
+    import pyarrow.parquet as pq
+    count = 0
+    writer = None
+    schema = None
+    held = []
+    sink = store.open(output_path) if store is not None else output_path
+
+    def write_held():
+        nonlocal writer, schema, count
+        if writer is None:
+            schema = settle_schema(schema)
+            writer = pq.ParquetWriter(sink, schema, compression=compression or 'snappy', compression_level=level)
+        for table in held:
+            writer.write_table(table.cast(schema))
+            count += table.num_rows
+        held.clear()
+
+    try:
+        for batch in batches:
+            table, schema = batch_table(batch_to_frame(batch), column_types, schema)
+            held.append(table)
+            if writer is not None or sum(t.num_rows for t in held) >= DEFAULT_ROW_GROUP_SIZE or not any(unsettled(f.type) for f in schema):
+                write_held()
+        if held:
+            write_held()
+    except BaseException:
+        if store is not None:
+            sink.abort()
+            if writer is not None:
+                close_quietly(writer)
+        elif writer is not None:
+            writer.close()
+        raise
+    if writer is not None:
+        writer.close()
+    # ParquetWriter leaves file objects open
+    if store is not None:
+        sink.close()
+    return count
+
+
+# Database output: file extensions, and what an existing table of the same name does
+DATABASE_EXTENSIONS = {'.db': 'sqlite', '.sqlite': 'sqlite', '.sqlite3': 'sqlite', '.duckdb': 'duckdb'}
+IF_EXISTS = ('replace', 'append', 'fail')
+
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_type(arrow_type, dialect):
+    """Column type for an Arrow type: DuckDB types, or SQLite storage classes (nested values as JSON TEXT)."""
+    import pyarrow as pa
+    t = arrow_type.value_type if pa.types.is_dictionary(arrow_type) else arrow_type
+    duckdb = dialect == 'duckdb'
+    if pa.types.is_boolean(t):
+        return 'BOOLEAN' if duckdb else 'INTEGER'
+    if pa.types.is_integer(t):
+        return {8: 'TINYINT', 16: 'SMALLINT', 32: 'INTEGER'}.get(t.bit_width, 'BIGINT') if duckdb else 'INTEGER'
+    if pa.types.is_floating(t):
+        return ('REAL' if t.bit_width == 32 else 'DOUBLE') if duckdb else 'REAL'
+    if not duckdb:
+        return 'TEXT'
+    if pa.types.is_timestamp(t):
+        return 'TIMESTAMP'
+    if pa.types.is_date(t):
+        return 'DATE'
+    if pa.types.is_list(t) or pa.types.is_large_list(t):
+        return sql_type(t.value_type, dialect) + '[]'
+    if pa.types.is_struct(t):
+        return 'STRUCT(' + ', '.join(f"{quote_identifier(f.name)} {sql_type(f.type, dialect)}" for f in t) + ')'
+    return 'VARCHAR'
+
+
+def table_exists(output_path, table, dialect):
+    # Whether a database file already holds the table
+    if not os.path.exists(output_path):
+        return False
+    if dialect == 'sqlite':
+        import sqlite3
+        conn = sqlite3.connect(output_path)
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+    else:
+        import duckdb
+        conn = duckdb.connect(output_path, read_only=True)
+        query = "SELECT 1 FROM information_schema.tables WHERE table_name = ?"
+    try:
+        return conn.execute(query, [table]).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def create_table(execute, table, schema, dialect, if_exists='replace'):
+    # DDL from the (typed) Arrow schema; with no columns known, a replaced table is only dropped
+    columns = ', '.join(f"{quote_identifier(f.name)} {sql_type(f.type, dialect)}" for f in schema)
+    if if_exists == 'replace':
+        execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+    if not columns:
+        return
+    exists_clause = 'IF NOT EXISTS ' if if_exists == 'append' else ''
+    execute(f"CREATE TABLE {exists_clause}{quote_identifier(table)} ({columns})")
+
+
+def table_schema(first, column_types=None):
+    # Schema of a loaded table: the first batch's columns, with the types column_types declares and
+    # the rest typed from the whole batch (still empty ones as text); with no batch, the declared columns
+    import pyarrow as pa
+    if first is None:
+        return pa.schema([(name, arrow_type) for name, (arrow_type, _, _) in (column_types or {}).items()])
+    return settle_schema(frame_to_table(batch_to_frame(first), column_types).schema)
+
+
+@contextmanager
+def transaction(conn, begin='BEGIN'):
+    # Commit the block's statements together, or roll them back if it raises
+    conn.execute(begin)
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def write_sqlite(batches, output_path, table, column_types=None, if_exists='replace'):
+    """Bulk-load batches into a table of a SQLite database file, one transaction per batch.
+
+    The table is created (or replaced) in the first batch's transaction, even with no batches, from
+    table_schema; lists and mappings are stored as JSON text. The file may hold other tables, so a
+    failed batch is rolled back, and WAL (which synchronous=NORMAL keeps consistent) is used for the
+    load only: the file's journal mode is restored afterwards.
+    """
+    import sqlite3
+    import pyarrow as pa
+    batches = iter(batches)
+    first = next(batches, None)
+    schema = table_schema(first, column_types)
+    names = schema.names
+    nested = {i for i, f in enumerate(schema) if pa.types.is_nested(f.type)}
+    insert = f"INSERT INTO {quote_identifier(table)} ({', '.join(map(quote_identifier, names))}) VALUES ({', '.join('?' * len(names))})"
+
+    def load(batch):
+        if isinstance(batch, dict):
+            rows = zip(*(batch[name].tolist() for name in names))
+        else:
+            rows = (tuple(rec.get(name) for name in names) for rec in batch)
+        if nested:
+            rows = ([json.dumps(v) if i in nested and v is not None else v for i, v in enumerate(row)] for row in rows)
+        conn.executemany(insert, rows)
+        return batch_len(batch)
+
+    count = 0
+    conn = sqlite3.connect(output_path, isolation_level=None)
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with transaction(conn):
+            create_table(conn.execute, table, schema, 'sqlite', if_exists)
+            if first is not None:
+                count += load(first)
+        for batch in batches:
+            with transaction(conn):
+                count += load(batch)
+    finally:
+        try:
+            conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        finally:
+            conn.close()
+    return count
+
+
+def write_duckdb(batches, output_path, table, column_types=None, if_exists='replace'):
+    """Bulk-load batches into a table of a DuckDB database file through Arrow, one transaction per batch.
+
+    The table is created (or replaced) in the first batch's transaction, even with no batches, from
+    table_schema, and a failed batch is rolled back.
+    """
+    import duckdb
+    batches = iter(batches)
+    first = next(batches, None)
+    schema = table_schema(first, column_types)
+
+    def load(batch):
+        data = frame_to_table(batch_to_frame(batch), column_types, schema)
+        conn.register('generated_batch', data)
+        conn.execute(f"INSERT INTO {quote_identifier(table)} BY NAME SELECT * FROM generated_batch")
+        conn.unregister('generated_batch')
+        return data.num_rows
+
+    count = 0
+    conn = duckdb.connect(output_path)
+    try:
+        with transaction(conn, 'BEGIN TRANSACTION'):
+            create_table(conn.execute, table, schema, 'duckdb', if_exists)
+            if first is not None:
+                count += load(first)
+        for batch in batches:
+            with transaction(conn, 'BEGIN TRANSACTION'):
+                count += load(batch)
+    finally:
+        conn.close()
+    return count
+
+
+# Partition files kept open by write_partitioned; the least recently written are closed beyond it
+MAX_OPEN_PARTITIONS = 256
+# Rows buffered per partition before they are written as one row group
+DEFAULT_ROW_GROUP_SIZE = 65536
+# Cap on rows buffered across all partitions; write_partitioned writes the largest buffers early to stay under it
+MAX_BUFFERED_ROWS = 1000000
+
+
+class PartitionFile:
+    """Rolling output for one partition directory: <base>.<ext>, <base>-1.<ext>, ...
+
+    Buffers Arrow tables (parquet) or DataFrames (csv) until a row group is ready. compression is
+    the Parquet codec, or gzip/zstd for CSV (<base>.csv.gz, ...). With a store, directory is a key
+    prefix and every file is an object uploaded as it is written.
+    """
+
+    def __init__(self, directory, base_name, output_type, schema=None, max_rows_per_file=None, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=None, compression_level=None, store=None):
+        self.directory = directory
+        self.store = store
+        self.sink = None
+        self.base_name = base_name
+        self.output_type = output_type
+        self.schema = schema
+        self.compression = compression
+        self.compression_level = compression_level
+        self.max_rows_per_file = max_rows_per_file
+        self.row_group_size = row_group_size
+        self.index = 0
+        self.rows_in_file = 0
+        self.rows = 0
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+
+    def path(self):
+        suffix = f"-{self.index}" if self.index else ""
+        ext = self.output_type if self.output_type == 'parquet' else self.output_type + COMPRESSION_SUFFIXES.get(self.compression, '')
+        return os.path.join(self.directory, f"{self.base_name}{suffix}.{ext}")
+
+    def add(self, part):
+        self.pending.append(part)
+        self.pending_rows += len(part)
+        self.rows += len(part)
+
+    def ready(self):
+        return self.pending_rows >= self.row_group_size
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.output_type == 'parquet':
+            import pyarrow as pa
+            data = pa.concat_tables(self.pending)
+        else:
+            import pandas as pd
+            data = pd.concat(self.pending, ignore_index=True)
+        self.pending = []
+        self.pending_rows = 0
+        while len(data):
+            if self.writer is None:
+                self.open()
+            room = self.max_rows_per_file - self.rows_in_file if self.max_rows_per_file else len(data)
+            if self.output_type == 'parquet':
+                part, data = data.slice(0, room), data.slice(room)
+                self.writer.write_table(part, row_group_size=self.row_group_size)
+            else:
+                part, data = data.iloc[:room], data.iloc[room:]
+                part.to_csv(self.writer, index=False, header=self.rows_in_file == 0)
+            self.rows_in_file += len(part)
+            if self.max_rows_per_file and self.rows_in_file >= self.max_rows_per_file:
+                self.close()
+
+    def promote(self, schema):
+        # Later rows typed columns that had no values so far (see batch_table): buffered rows are
+        # cast up, and an open file keeps its schema, so the partition continues in a new file
+        self.pending = [part.cast(schema) for part in self.pending]
+        self.schema = schema
+        self.close()
+
+    def finish(self):
+        self.flush()
+        self.close()
+
+    def open(self):
+        if self.store is None:
+            os.makedirs(self.directory, exist_ok=True)
+        if self.output_type == 'parquet':
+            import pyarrow.parquet as pq
+            self.sink = self.store.open(self.path()) if self.store is not None else None
+            self.writer = pq.ParquetWriter(self.sink or self.path(), self.schema, compression=self.compression or 'snappy', compression_level=self.compression_level)
+        else:
+            # A CSV closed to free its handle is reopened for appending, without a second header
+            # Partitions are already written in parallel, so each file compresses on its own thread
+            if self.store is not None:
+                self.sink = self.store.open(self.path())
+                raw = compress_output(self.sink, self.compression, self.compression_level, threads=1)
+            else:
+                raw = open_output(self.path(), self.compression, self.compression_level, threads=1, append=bool(self.rows_in_file))
+            self.writer = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+    def close(self):
+        if self.writer is None:
+            return
+        try:
+            self.writer.close()
+        finally:
+            self.writer = None
+            if self.sink is not None:
+                sink, self.sink = self.sink, None
+                sink.close()
+        # Parquet files and objects cannot be appended to, so a partition reopened later (or a
+        # full file) continues in the next file
+        if self.output_type == 'parquet' or self.store is not None or (self.max_rows_per_file and self.rows_in_file >= self.max_rows_per_file):
+            if self.rows_in_file:
+                self.index += 1
+                self.rows_in_file = 0
+
+    def abort(self):
+        # Close after a failure: an open object store upload is discarded, a local file kept as written
+        if self.writer is None:
+            return
+        writer, sink = self.writer, self.sink
+        self.writer = self.sink = None
+        if sink is None:
+            writer.close()
+            return
+        sink.abort()
+        close_quietly(writer)
+
+
+def split_partitions(frame, table=None):
+    """Split a batch frame by its s3_path column: yields (s3_path, rows) without s3_path.
+
+    Rows are reordered once with a stable sort, so each partition is a zero-copy slice of one
+    Arrow table (table, the frame without s3_path as converted by batch_table, when given) or
+    DataFrame, in generation order.
+    """
+    import numpy as np
+    import pandas as pd
+    codes, uniques = pd.factorize(frame['s3_path'].to_numpy(), sort=False)
+    frame = frame.drop(columns='s3_path')
+    order = np.argsort(codes, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(uniques)))]).tolist()
+    if table is not None:
+        data = table.take(order)
+        for i, s3_path in enumerate(uniques):
+            yield s3_path, data.slice(bounds[i], bounds[i + 1] - bounds[i])
+    else:
+        data = frame.take(order)
+        for i, s3_path in enumerate(uniques):
+            yield s3_path, data.iloc[bounds[i]:bounds[i + 1]]
+
+
+def write_partitioned(batches, output_type, output_dir, base_name, threads=None, max_rows_per_file=None, row_group_size=None, max_open_files=MAX_OPEN_PARTITIONS, compression=None, compression_level=None, column_types=None, store=None, max_buffered_rows=MAX_BUFFERED_ROWS):
+    """Stream batches into a Hive-style partitioned csv/parquet dataset under output_dir.
+
+    Rows go to output_dir/<s3_path>/<base_name>.<ext> by their s3_path column, which is dropped
+    from the files. Rows are buffered per partition until row_group_size rows are ready, and ready
+    partitions are written by a pool of threads. At most max_buffered_rows rows are buffered in
+    total (one batch's rows for a single partition can exceed it): before a batch's rows would go
+    past it, the largest buffers are written until half of it is free, as smaller row groups (and,
+    for partitions whose file was closed to stay within max_open_files, new rolling files). Rows in
+    every file keep generation order. compression is as for write_batches (CSV files get a
+    .gz/.zst suffix), and column_types types Parquet columns as in write_parquet. With a store
+    (see object_store.open_store), output_dir is a key prefix and every file is uploaded while it is
+    written. Returns {s3_path: rows written}.
+    """
+    from collections import OrderedDict
+    from concurrent.futures import ThreadPoolExecutor
+    row_group_size = row_group_size or DEFAULT_ROW_GROUP_SIZE
+    # Most recently written partition last
+    partitions = OrderedDict()
+    schema = None
+    buffered = 0
+
+    def largest(limit):
+        # The biggest buffers, open files first among equals, whose writing leaves at most limit rows
+        chosen = []
+        left = buffered
+        for partition in sorted(partitions.values(), key=lambda p: (-p.pending_rows, p.writer is None)):
+            if left <= limit or not partition.pending_rows:
+                break
+            chosen.append(partition)
+            left -= partition.pending_rows
+        return chosen
+
+    def write(pool, ready):
+        nonlocal buffered
+        if ready:
+            list(pool.map(PartitionFile.flush, ready))
+            buffered = sum(p.pending_rows for p in partitions.values())
+        open_files = [p for p in partitions.values() if p.writer is not None]
+        for partition in open_files[:max(len(open_files) - max_open_files, 0)]:
+            partition.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for batch in batches:
+                frame = batch_to_frame(batch)
+                table = None
+                if output_type == 'parquet':
+                    table, promoted = batch_table(frame.drop(columns='s3_path'), column_types, schema)
+                    if schema is not None and promoted != schema:
+                        for partition in partitions.values():
+                            partition.promote(promoted)
+                    schema = promoted
+                for s3_path, part in split_partitions(frame, table):
+                    if buffered + len(part) > max_buffered_rows:
+                        write(pool, largest(min(max_buffered_rows // 2, max_buffered_rows - len(part))))
+                    partition = partitions.get(s3_path)
+                    if partition is None:
+                        partition = partitions[s3_path] = PartitionFile(
+                            os.path.join(output_dir, s3_path), base_name, output_type, schema, max_rows_per_file, row_group_size,
+                            compression, compression_level, store
+                        )
+                    partitions.move_to_end(s3_path)
+                    partition.add(part)
+                    buffered += len(part)
+                write(pool, [p for p in partitions.values() if p.ready()])
+            list(pool.map(PartitionFile.finish, partitions.values()))
+    except BaseException:
+        # Files already closed are complete; the open ones are cut short
+        for partition in partitions.values():
+            partition.abort()
+        raise
+    return {s3_path: partition.rows for s3_path, partition in partitions.items()}
+
+
+WRITERS = {
+    'json': write_json,
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+    'parquet': write_parquet,
+    'sqlite': write_sqlite,
+    'duckdb': write_duckdb,
+}
+
+
+def write_batches(batches, output_type, output_path, serializer=None, indent=None, compression=None, compression_level=None, compression_threads=None, column_types=None, table=None, if_exists='replace', store=None):
+    """Write batches to output_path as output_type; returns the number of records.
+
+    serializer/indent apply to JSON output (see json_encoder; JSONL is never indented). compression
+    is gzip/zstd for the text formats (see open_output) and a Parquet codec for parquet.
+    column_types declares Parquet and database column types (see frame_to_table). sqlite/duckdb
+    output loads a table (default: the file's base name) of the database file. With a store,
+    output_path is the key of the uploaded object (not for database output).
+    """
+    writer = WRITERS.get(output_type)
+    if writer is None:
+        raise ValueError(f"Unsupported output type: {output_type}")
+    if output_type == 'json':
+        return writer(batches, output_path, serializer, indent, compression, compression_level, compression_threads, store)
+    if output_type == 'jsonl':
+        return writer(batches, output_path, serializer, compression, compression_level, compression_threads, store)
+    if output_type == 'csv':
+        return writer(batches, output_path, compression, compression_level, compression_threads, store)
+    if output_type in ('sqlite', 'duckdb'):
+        if store is not None:
+            raise ValueError(f"{output_type} output cannot be written to an object store")
+        table = table or os.path.splitext(os.path.basename(output_path))[0]
+        return writer(batches, output_path, table, column_types, if_exists)
+    return writer(batches, output_path, compression, compression_level, column_types, store)
@@ -0,0 +1,162 @@
+# parallel_generation.py
+# Sharded multi-process generation with deterministic per-shard seeds.
+# --num-records is split into shards of --batch-size records; shards run in a process pool and
+# come back in shard order, so the combined output only depends on --seed and --batch-size.
+import random
+from collections import deque
+from multiprocessing import Pool
+
+import aws_service_mappings
+import reference_data
+import samples_run
+from continuity_state import ContinuityState
+
+STITCH_PARAMETERS = ('upward_drift', 'spike_prob', 'spike_min', 'spike_max', 'spend_multiplier')
+# Reference pool files, loaded once per worker process
+worker_reference_pools = {}
+
+
+def shard_seed(seed, shard_index):
+    # Stable across runs and platforms (str seeds are hashed with SHA-512, not hash())
+    return random.Random(f"{seed}:{shard_index}").getrandbits(64)
+
+
+def shard_sizes(num_records, shard_size):
+    sizes = []
+    remaining = num_records
+    while remaining > 0:
+        sizes.append(min(shard_size, remaining))
+        remaining -= sizes[-1]
+    return sizes
+
+
+def load_unique_rows(config, seed):
+    # Row permutations of unique reference groups, shuffled once in the parent (with the run seed) so
+    # rows are handed out exactly once across shards
+    pools = {}
+    rng = random.Random(seed)
+    for field in reference_data.reference_fields(config['fields']):
+        if field.get('unique', False):
+            reference_data.unique_rows(field, pools, rng)
+    return {key: rows for key, rows in pools.items() if isinstance(key, tuple)}
+
+
+def iter_shard_tasks(config, num_records, shard_size, seed, engine, generator_kwargs):
+    unique_rows = load_unique_rows(config, seed)
+    start = 0
+    for index, size in enumerate(shard_sizes(num_records, shard_size)):
+        # The serial generator pops from the end of each unique permutation; shard k gets the slice
+        # it would have popped, in the same order
+        pool_slices = {}
+        for key, rows in unique_rows.items():
+            end = max(len(rows) - start, 0)
+            pool_slices[key] = rows[max(end - size, 0):end]
+        yield (config, size, shard_seed(seed, index), engine, generator_kwargs, pool_slices)
+        start += size
+
+
+def init_worker(config, rate_card=None):
+    if rate_card:
+        aws_service_mappings.use_rate_card(rate_card)
+    worker_reference_pools.clear()
+    reference_data.preload_pools(config['fields'], worker_reference_pools)
+
+
+def generate_shard(task):
+    config, size, seed, engine, generator_kwargs, pool_slices = task
+    reference_pools = dict(worker_reference_pools)
+    reference_pools.update(pool_slices)
+    py_rng = random.Random(seed)
+    faker = samples_run.make_faker(seed)
+    # Each shard starts with empty continuity state; the parent stitches series across shards
+    if engine == "columnar":
+        import numpy as np
+        import columnar_engine
+        return columnar_engine.generate_columns_from_config(
+            config, num_records=size, batch_size=size, rng=np.random.default_rng(seed),
+            py_rng=py_rng, faker=faker, reference_pools=reference_pools, **generator_kwargs
+        )
+    return samples_run.generate_records_from_config(
+        config, num_records=size, reference_pools=reference_pools, rng=py_rng, faker=faker, **generator_kwargs
+    )
+
+
+def stitch_continuity(keys, values, continuity_state, rng, upward_drift=0.005, spike_prob=0.02, spike_min=2.0, spike_max=10.0, spend_multiplier=1.0):
+    """Continue drift/spike series across shard boundaries.
+
+    A shard restarts every (account_id, service, resource_id) series from a fresh value. For series
+    already seen in earlier shards, the first value is replaced by a drift step from the last
+    value seen, and later values in the shard are rescaled by the same factor (drift and spikes
+    are proportional to the previous value, so this matches a serial run). values maps field
+    name to a list and is updated in place.
+    """
+    factors = {}
+    slots = continuity_state.slots_for(keys)
+    for i, key in enumerate(keys):
+        slot = slots[i]
+        if key not in factors:
+            factors[key] = {}
+            for fname, column in values.items():
+                last = continuity_state.last(slot, fname)
+                local = column[i]
+                if last is None or local is None:
+                    continue
+                new_val = samples_run.continue_series(fname, last, upward_drift, spike_prob, spike_min, spike_max, spend_multiplier, rng)
+                factors[key][fname] = new_val / local if local else None
+                column[i] = new_val
+        else:
+            for fname, factor in factors[key].items():
+                column = values[fname]
+                if factor is not None and column[i] is not None:
+                    column[i] = round(column[i] * factor, 2) if fname == 'cost' else column[i] * factor
+        for fname, column in values.items():
+            continuity_state.update(slot, fname, column[i])
+    continuity_state.trim()
+
+
+def stitch_batch(batch, continuity_state, rng, generator_kwargs):
+    columnar = isinstance(batch, dict)
+    names = list(batch) if columnar else list(batch[0]) if batch else []
+    fields = [f for f in samples_run.CONTINUITY_VALUE_FIELDS if f in names]
+    if not fields:
+        return batch
+    stitch_kwargs = {k: v for k, v in generator_kwargs.items() if k in STITCH_PARAMETERS}
+    if columnar:
+        import numpy as np
+        import columnar_engine
+        n = len(batch[fields[0]])
+        keys = list(zip(*(
+            batch[k].tolist() if k in batch else [None] * n
+            for k in samples_run.CONTINUITY_KEY_FIELDS
+        )))
+        values = {f: batch[f].tolist() for f in fields}
+        stitch_continuity(keys, values, continuity_state, rng, **stitch_kwargs)
+        for f, column in values.items():
+            batch[f] = columnar_engine.object_array(column) if any(v is None for v in column) else np.array(column)
+        return batch
+    keys = [tuple(rec.get(k) for k in samples_run.CONTINUITY_KEY_FIELDS) for rec in batch]
+    values = {f: [rec.get(f) for rec in batch] for f in fields}
+    stitch_continuity(keys, values, continuity_state, rng, **stitch_kwargs)
+    for f, column in values.items():
+        for rec, value in zip(batch, column):
+            rec[f] = value
+    return batch
+
+
+def iter_sharded_batches(config, num_records=10000, workers=2, seed=None, engine="row", batch_size=samples_run.DEFAULT_BATCH_SIZE, rate_card=None, continuity_state=None, **generator_kwargs):
+    """Yield one batch per shard, in shard order, generated by a pool of worker processes."""
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    stitch_rng = random.Random(f"{seed}:stitch")
+    if continuity_state is None:
+        continuity_state = ContinuityState(samples_run.CONTINUITY_VALUE_FIELDS)
+    tasks = iter_shard_tasks(config, num_records, batch_size, seed, engine, generator_kwargs)
+    with Pool(processes=workers, initializer=init_worker, initargs=(config, rate_card)) as pool:
+        # Keep a bounded number of shards in flight so a slow writer does not buffer the whole run
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(generate_shard, (task,)))
+            if len(pending) >= workers * 2:
+                yield stitch_batch(pending.popleft().get(), continuity_state, stitch_rng, generator_kwargs)
+        while pending:
+            yield stitch_batch(pending.popleft().get(), continuity_state, stitch_rng, generator_kwargs)
@@ -0,0 +1,187 @@
+# reference_data.py
+# Reference pools: rows of an external file (JSON, JSONL, CSV or Parquet) that reference fields draw from.
+# Text pools may be gzip/zstd compressed (.json.gz, .csv.zst, ...), as generate_company_pool writes them.
+# Each file is loaded once per run, keeping only the columns fields actually use, and numeric columns
+# are stored as typed arrays, so a multi-million-row pool costs a few bytes per value instead of a dict
+# per row (and a copy of the list per field). CSV cells stay strings unless the field declares a
+# numeric reference_type, so codes such as "00123" keep their leading zeros.
+import csv
+import gzip
+import json
+import os
+from array import array
+
+import output_writers
+
+
+class ReferencePool:
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.columns = {}
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name):
+        return self.columns[name]
+
+
+def pool_format(path):
+    # Format from the extension before any .gz/.zst suffix
+    ext = os.path.splitext(output_writers.split_compression(path)[0])[1].lower()
+    return {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv', '.parquet': 'parquet'}.get(ext, 'json')
+
+
+def open_text(path):
+    # Text stream of a JSON/JSONL/CSV pool file, decompressed on the fly
+    _, compression = output_writers.split_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd-compressed pools require the zstandard package. Run 'pip install zstandard'.")
+        return zstandard.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def compact(values):
+    # Typed array for all-int or all-float columns, else the list itself
+    if isinstance(values, array):
+        return values
+    if values and all(type(v) is int for v in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            return values
+    if values and all(type(v) is float for v in values):
+        return array('d', values)
+    return values
+
+
+# reference_type values: the type CSV cells of a field's column are parsed as
+REFERENCE_TYPES = {'int': int, 'float': float, 'string': str}
+
+
+def parse_csv_column(values, value_type=None):
+    # CSV cells are strings; a column is only parsed as numbers when its field declares the type
+    cast = REFERENCE_TYPES.get(value_type)
+    if cast is None or cast is str:
+        return values
+    return [cast(v) if v not in (None, '') else None for v in values]
+
+
+def column_types(field):
+    # {column: reference_type} declared by a reference field
+    value_type = field.get('reference_type')
+    return {field['reference_field']: value_type} if value_type else {}
+
+
+def read_columns(path, names, types=None):
+    """({name: values}, row count) for the given columns of a pool file.
+
+    JSONL and CSV files are streamed, so only the kept columns are ever held in memory. Parquet files
+    only have the requested columns read. types ({name: reference_type}) parses CSV columns.
+    """
+    fmt = pool_format(path)
+    types = types or {}
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if output_writers.split_compression(path)[1]:
+            raise ValueError(f"Parquet pools are compressed per column; drop the .gz/.zst suffix of {path}")
+        table = pq.read_table(path, columns=list(names))
+        columns = {}
+        for name in names:
+            column = table.column(name)
+            if column.null_count == 0 and pa.types.is_integer(column.type):
+                columns[name] = array('q', column.cast(pa.int64()).to_numpy().tobytes())
+            elif column.null_count == 0 and pa.types.is_floating(column.type):
+                columns[name] = array('d', column.cast(pa.float64()).to_numpy().tobytes())
+            else:
+                columns[name] = column.to_pylist()
+        return columns, table.num_rows
+    columns = {name: [] for name in names}
+    appends = [(name, columns[name].append) for name in names]
+    if fmt == 'json':
+        with open_text(path) as f:
+            rows = json.load(f)
+    elif fmt == 'jsonl':
+        f = open_text(path)
+        rows = (json.loads(line) for line in f if line.strip())
+    else:
+        f = open_text(path)
+        rows = csv.DictReader(f)
+    count = 0
+    for row in rows:
+        for name, append in appends:
+            append(row.get(name))
+        count += 1
+    if fmt != 'json':
+        f.close()
+    if fmt == 'csv':
+        columns = {name: parse_csv_column(values, types.get(name)) for name, values in columns.items()}
+    return columns, count
+
+
+def load_pool(path, names, reference_pools, types=None):
+    """The ReferencePool for path, cached in reference_pools, holding at least the named columns.
+
+    types ({name: reference_type}) applies to columns read from a CSV file.
+    """
+    pool = reference_pools.get(path)
+    if pool is None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Reference file not found: {path}")
+        pool = reference_pools[path] = ReferencePool(path)
+    missing = [name for name in dict.fromkeys(names) if name not in pool.columns]
+    if missing:
+        columns, pool.size = read_columns(path, missing, types)
+        for name, values in columns.items():
+            pool.columns[name] = compact(values)
+    return pool
+
+
+def reference_fields(fields):
+    # Reference field definitions, including those nested in pattern components
+    for field in fields:
+        if field.get('type') == 'reference':
+            yield field
+        components = field.get('components')
+        if isinstance(components, dict):
+            yield from reference_fields(components.values())
+
+
+def preload_pools(fields, reference_pools):
+    # Read each pool file once with every column the config's fields take from it
+    names = {}
+    types = {}
+    for field in reference_fields(fields):
+        names.setdefault(field['reference_file'], []).append(field['reference_field'])
+        for name, value_type in column_types(field).items():
+            types.setdefault(field['reference_file'], {}).setdefault(name, value_type)
+    for path, columns in names.items():
+        load_pool(path, columns, reference_pools, types.get(path))
+
+
+def group_key(field):
+    # Fields with the same file, reference_group and uniqueness take their values from the same row
+    return (field['reference_file'], field.get('reference_group'), bool(field.get('unique', False)))
+
+
+def unique_rows(field, reference_pools, rng):
+    """Shuffled row indices not yet handed out to the field's (unique) group.
+
+    Rows are popped from the end; the list is shared by every field of the group, and parallel runs
+    slice it across shards.
+    """
+    key = ('rows',) + group_key(field)
+    rows = reference_pools.get(key)
+    if rows is None:
+        pool = load_pool(field['reference_file'], [field['reference_field']], reference_pools, column_types(field))
+        rows = array('q', range(len(pool)))
+        rng.shuffle(rows)
+        reference_pools[key] = rows
+    return rows
@@ -1,407 +1,1103 @@
+import ast
+import heapq
 import json
 import random
 import yaml
+from collections import ChainMap
 from datetime import datetime, timedelta
 import os
+import dataset_cache
+import object_store
+import output_writers
+import reference_data
+from continuity_state import ContinuityState
 from saas_service_mappings import (
     PLAN_REVENUE_MULTIPLIER,
     PLAN_USAGE_MULTIPLIER,
     INDUSTRY_REVENUE_MULTIPLIER
 )
-from aws_service_mappings import SERVICE_USAGE_MULTIPLIER
+import aws_service_mappings
 from aws_service_mappings import (
-    SERVICE_REGION_MAP,
-    RESOURCE_ID_PATTERNS,
-    USAGE_TYPE_MAP,
-    get_rate_for_service
+    DEFAULT_RATE,
+    RESOURCE_ID_FORMATS,
+    generate_resource_ids,
+    resource_fleet
 )
 
 try:
     from faker import Faker
     fake = Faker()
 except ImportError:
+    Faker = None
     fake = None
 
 
+def make_faker(seed=None):
+    # A Faker instance of its own for one run, so seeding it does not touch the shared one
+    if Faker is None:
+        return None
+    faker = Faker()
+    if seed is not None:
+        faker.seed_instance(seed)
+    return faker
+
+
 def load_config(config_path):
     with open(config_path, 'r') as f:
         return yaml.safe_load(f)
 
 
-def get_field_value(field, context, prev_record=None, reference_pools=None):
+def end_of_current_month():
+    # Last second of the current month, used for 'dynamic' date/datetime bounds
+    today = datetime.today()
+    if today.month == 12:
+        next_month = datetime(today.year + 1, 1, 1)
+    else:
+        next_month = datetime(today.year, today.month + 1, 1)
+    return next_month - timedelta(seconds=1)
+
+
+def is_dynamic_bound(val):
+    return not val or (isinstance(val, str) and (val == 'dynamic' or val.startswith('dynamic:')))
+
+
+def parse_datetime_bounds(field):
+    min_str = field.get('min', "2024-01-01T00:00:00")
+    max_str = field.get('max', None)
+    if is_dynamic_bound(max_str):
+        max_str = end_of_current_month().strftime("%Y-%m-%dT%H:%M:%S")
+    try:
+        min_dt = datetime.strptime(min_str, "%Y-%m-%dT%H:%M:%S")
+    except Exception:
+        min_dt = datetime.strptime(min_str[:19], "%Y-%m-%dT%H:%M:%S")
+    try:
+        max_dt = datetime.strptime(max_str, "%Y-%m-%dT%H:%M:%S")
+    except Exception:
+        max_dt = datetime.strptime(max_str[:19], "%Y-%m-%dT%H:%M:%S")
+    return min_dt, max_dt
+
+
+def to_datetime(val):
+    if isinstance(val, datetime):
+        return val
+    if hasattr(val, 'year') and hasattr(val, 'month') and hasattr(val, 'day'):
+        return datetime(val.year, val.month, val.day)
+    return datetime.strptime(str(val), "%Y-%m-%d")
+
+
+def parse_date_bounds(field):
+    start = to_datetime(field['start'])
+    end_val = field.get('end')
+    if is_dynamic_bound(end_val):
+        end = end_of_current_month().replace(hour=0, minute=0, second=0)
+    else:
+        end = to_datetime(end_val)
+    return start, end
+
+
+def resolved_date_bounds(fields):
+    # {field: [start, end]} of every date/datetime field, with 'dynamic' bounds resolved for today
+    bounds = {}
+    for field in fields:
+        if field.get('type') == 'datetime':
+            bounds[field['name']] = [b.isoformat() for b in parse_datetime_bounds(field)]
+        elif field.get('type') == 'date':
+            bounds[field['name']] = [b.isoformat() for b in parse_date_bounds(field)]
+    return bounds
+
+
+def cumulative_weights(weights):
+    cum_weights = []
+    total = 0.0
+    for w in weights:
+        total += w
+        cum_weights.append(total)
+    return cum_weights
+
+
+def conditional_overrides(field):
+    """(parent field, {parent value: overrides}) from a field's by_<parent> mapping, or None.
+
+    Any other field can be the parent (by_service, by_sensor_type, by_company, ...); only the first
+    by_ key counts. values_by_company is the older spelling of by_company with values lists.
+    """
+    for key, table in field.items():
+        if key.startswith('by_') and isinstance(table, dict):
+            return key[3:], table
+    if field.get('values_by_company') is not None:
+        return 'company', {company: {'values': values} for company, values in field['values_by_company'].items()}
+    return None
+
+
+def conditional_ranges(field, context, min_v, max_v):
+    """(parent, {parent value: (min, max, multiplier)}, default) for an int/float field, or None.
+
+    Entries come from by_<parent> min/max (and optional multiplier) overrides, plus the SaaS plan/industry
+    multipliers and the catalog's usage multipliers for usage_quantity. Parent values missing from the
+    table, and records without the parent, use default.
+    """
+    fname = field.get('name')
+    default = (min_v, max_v, 1.0)
+    topic = context.get('topic') if context else None
+    if topic and 'saas' in topic:
+        multiplier_source = {
+            'monthly_fee': ('plan', PLAN_REVENUE_MULTIPLIER),
+            'usage_events': ('plan', PLAN_USAGE_MULTIPLIER),
+            'annual_revenue_musd': ('industry', INDUSTRY_REVENUE_MULTIPLIER),
+        }.get(fname)
+        if multiplier_source:
+            parent, multipliers = multiplier_source
+            return parent, {value: (min_v, max_v, m) for value, m in multipliers.items()}, default
+    conditional = conditional_overrides(field)
+    if conditional is None:
+        return None
+    parent, overrides = conditional
+    table = {}
+    for value, override in overrides.items():
+        override = override or {}
+        table[value] = (override.get('min', min_v), override.get('max', max_v), override.get('multiplier', 1.0))
+    if parent == 'service' and fname == 'usage_quantity':
+        for service, multiplier in aws_service_mappings.SERVICE_CATALOG['usage_multipliers'].items():
+            lo, hi, _ = table.get(service, default)
+            table[service] = (lo, hi, multiplier)
+    return parent, table, default
+
+
+def conditional_choices(field):
+    """(parent, {parent value: (values, cum_weights)}, fallback, default) for a choice field, or None.
+
+    by_<parent> entries override values and/or weights (a bare list is a values override); region and
+    usage_type follow the service catalog. Parent values missing from the table use fallback, and
+    records without the parent use default (the field's own values/weights, or fallback if it has
+    no values).
+    """
+    values = field.get('values')
+    weights = field.get('weights')
+    default = (values, cumulative_weights(weights) if weights else None)
+    conditional = conditional_overrides(field)
+    if conditional is None:
+        catalog = aws_service_mappings.SERVICE_CATALOG
+        service_map = {
+            'region': (catalog['regions'], ['us-east-1']),
+            'usage_type': (catalog['usage_type_map'], ['BoxUsage']),
+        }.get(field.get('name'))
+        if service_map is None:
+            return None
+        mapping, missing = service_map
+        fallback = (missing, None)
+        return 'service', {service: (list(v), None) for service, v in mapping.items()}, fallback, default if values else fallback
+    parent, overrides = conditional
+    table = {}
+    for value, override in overrides.items():
+        if isinstance(override, list):
+            override = {'values': override}
+        override = override or {}
+        # New values without their own weights are drawn uniformly
+        entry_weights = override.get('weights', None if 'values' in override else weights)
+        table[value] = (override.get('values', values), cumulative_weights(entry_weights) if entry_weights else None)
+    return parent, table, default, default
+
+
+def multi_choice_bounds(field):
+    # (min, max) subset size for a multi_choice field, clamped to the number of values
+    count = len(field['values'])
+    hi = min(field.get('max_choices', count), count)
+    return min(max(field.get('min_choices', 0), 0), hi), hi
+
+
+def load_reference_pool(field, reference_pools):
+    # The field's pool file (loaded once per run, see reference_data)
+    return reference_data.load_pool(field['reference_file'], [field['reference_field']], reference_pools, reference_data.column_types(field))
+
+
+def compile_reference_rows(field, reference_pools, rng):
+    """Callable(record) -> index of the pool row the field takes its value from.
+
+    One callable is shared by all reference fields of a group (same file, reference_group and
+    uniqueness), and it draws a single row per record, so e.g. company_id and company_name stay paired.
+    Unique groups hand out the rows of a shuffled permutation, each row once.
+    """
+    key = ('sampler',) + reference_data.group_key(field)
+    if key in reference_pools:
+        return reference_pools[key]
+    ref_file = field['reference_file']
+    if field.get('unique', False):
+        rows = reference_data.unique_rows(field, reference_pools, rng)
+
+        def next_row():
+            if not rows:
+                raise ValueError(f"No more unique values available in {ref_file} for {field['reference_field']}")
+            return rows.pop()
+    else:
+        size = len(load_reference_pool(field, reference_pools))
+        randrange = rng.randrange
+
+        def next_row():
+            return randrange(size)
+    last = [None, None]
+
+    def row_for(record):
+        if record is None:
+            return next_row()
+        if record is not last[0]:
+            last[0], last[1] = record, next_row()
+        return last[1]
+    reference_pools[key] = row_for
+    return row_for
+
+
+def faker_pool(method, size, seed=0, locale=None, cache_dir=None):
+    """Up to size distinct values of a Faker method, the same for every run, shard and engine.
+
+    The pool is drawn from a Faker seeded with (seed, locale, method), so it only depends on those
+    and size. With cache_dir, string pools are kept on disk as JSON and reused by later runs.
+    """
+    key = (method, size, seed, locale)
+    pool = faker_pools.get(key)
+    if pool is not None:
+        return pool
+    path = None
+    if cache_dir:
+        import faker as faker_package
+        path = os.path.join(cache_dir, f"{locale or 'default'}-{seed}-{method}-{size}-{faker_package.VERSION}.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                pool = json.load(f)
+            # Recently used, for the dataset cache's eviction
+            os.utime(path)
+    if pool is None:
+        generator = Faker(locale) if locale else Faker()
+        generator.seed_instance(f"{seed}:{locale}:{method}")
+        draw = getattr(generator, method)
+        pool = list(dict.fromkeys(draw() for _ in range(size)))
+        if path and all(isinstance(v, str) for v in pool):
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(pool, f)
+            os.replace(tmp, path)
+    faker_pools[key] = pool
+    return pool
+
+
+def faker_field_pool(field):
+    # Value pool for a faker field with pool_size, or None to call Faker per record
+    size = field.get('pool_size')
+    if not size:
+        return None
+    return faker_pool(field['faker_method'], size, field.get('pool_seed', 0), field.get('locale'), field.get('pool_cache'))
+
+
+def compile_field(field, context, reference_pools=None, date_fields=None, rng=None, faker=None):
+    """Compile a field definition into a generator callable taking the record built so far.
+
+    All config lookups, bound parsing and weight normalization happen here once, so the
+    returned callable only does the per-record random draw. rng (a random.Random) and faker
+    default to the random module and the module-level Faker.
+    """
+    if reference_pools is None:
+        reference_pools = {}
+    if rng is None:
+        rng = random
+    if faker is None:
+        faker = fake
+    ftype = field['type']
+    fname = field.get('name')
     # Handle type: datetime
-    if field['type'] == 'datetime':
+    if ftype == 'datetime':
         # Use min/max from field, but set max to end of current month if not already dynamic
-        min_str = field.get('min', "2024-01-01T00:00:00")
-        max_str = field.get('max', None)
-        if not max_str or max_str == 'dynamic' or (isinstance(max_str, str) and max_str.startswith('dynamic:')):
-            # Compute end of current month
-            today = datetime.today()
-            if today.month == 12:
-                next_month = datetime(today.year + 1, 1, 1)
-            else:
-                next_month = datetime(today.year, today.month + 1, 1)
-            end_of_month = next_month - timedelta(seconds=1)
-            max_str = end_of_month.strftime("%Y-%m-%dT%H:%M:%S")
-        try:
-            min_dt = datetime.strptime(min_str, "%Y-%m-%dT%H:%M:%S")
-        except Exception:
-            min_dt = datetime.strptime(min_str[:19], "%Y-%m-%dT%H:%M:%S")
-        try:
-            max_dt = datetime.strptime(max_str, "%Y-%m-%dT%H:%M:%S")
-        except Exception:
-            max_dt = datetime.strptime(max_str[:19], "%Y-%m-%dT%H:%M:%S")
-        delta = max_dt - min_dt
-        rand_seconds = random.randint(0, int(delta.total_seconds()))
-        dt = min_dt + timedelta(seconds=rand_seconds)
-        return dt.strftime("%Y-%m-%dT%H:%M:%S")
+        min_dt, max_dt = parse_datetime_bounds(field)
+        span = int((max_dt - min_dt).total_seconds())
+        randint = rng.randint
+
+        def gen_datetime(record):
+            dt = min_dt + timedelta(seconds=randint(0, span))
+            return dt.strftime("%Y-%m-%dT%H:%M:%S")
+        return gen_datetime
     # Handle type: reference (external value pool)
-    if field['type'] == 'reference':
-        if reference_pools is None:
-            reference_pools = {}
-        ref_file = field['reference_file']
-        ref_field = field['reference_field']
-        unique = field.get('unique', False)
-        pool_key = f"{ref_file}:{ref_field}:unique" if unique else ref_file
-        if pool_key not in reference_pools:
-            # Load the pool from file
-            if not os.path.exists(ref_file):
-                raise FileNotFoundError(f"Reference file not found: {ref_file}")
-            with open(ref_file, 'r') as f:
-                pool = json.load(f)
-            if unique:
-                # Shuffle for unique assignment
-                random.shuffle(pool)
-            reference_pools[pool_key] = pool.copy()
-        pool = reference_pools[pool_key]
-        if unique:
-            if not pool:
-                raise ValueError(f"No more unique values available in {ref_file} for {ref_field}")
-            entry = pool.pop()
-        else:
-            entry = random.choice(pool)
-        return entry[ref_field]
+    if ftype == 'reference':
+        column = load_reference_pool(field, reference_pools).column(field['reference_field'])
+        row_for = compile_reference_rows(field, reference_pools, rng)
+        return lambda record: column[row_for(record)]
     # Handle type: faker
-    if field['type'] == 'faker':
-        if fake is None:
+    if ftype == 'faker':
+        if faker is None:
             raise ImportError("Faker library is not installed. Run 'pip install faker'.")
         faker_method = field.get('faker_method')
-        if not faker_method or not hasattr(fake, faker_method):
+        if not faker_method or not hasattr(faker, faker_method):
             raise ValueError(f"Invalid or missing faker_method: {faker_method}")
-        return getattr(fake, faker_method)()
+        pool = faker_field_pool(field)
+        if pool is not None:
+            # Sample from a fixed pool of values instead of calling Faker per record
+            choice = rng.choice
+            return lambda record: choice(pool)
+        method = getattr(faker, faker_method)
+        return lambda record: method()
     # Handle type: string with pattern and components
-    if field['type'] == 'string' and 'pattern' in field and 'components' in field:
-        components = {}
-        for cname, cdef in field['components'].items():
-            # Recursively call get_field_value for each component
-            comp_val = get_field_value(cdef, context, prev_record)
-            components[cname] = comp_val
-        try:
-            return field['pattern'].format(**components)
-        except Exception:
-            return None
+    if ftype == 'string' and 'pattern' in field and 'components' in field:
+        pattern = field['pattern']
+        components = [
+            (cname, compile_field(cdef, context, reference_pools, date_fields, rng, faker))
+            for cname, cdef in field['components'].items()
+        ]
+
+        def gen_pattern(record):
+            try:
+                return pattern.format(**{cname: gen(record) for cname, gen in components})
+            except Exception:
+                return None
+        return gen_pattern
     # Handle type: choice (with optional weights)
-    if field['type'] == 'choice':
+    if ftype == 'choice':
+        choice = rng.choice
         # Multi-field consistency for key fields
-        if field['name'] == 'service':
+        if fname == 'service':
             # Pick a service at random from those with mappings
-            return random.choice(list(SERVICE_REGION_MAP.keys()))
-        if field['name'] == 'region' and prev_record and 'service' in prev_record:
-            service = prev_record['service']
-            return random.choice(SERVICE_REGION_MAP.get(service, ['us-east-1']))
-        if field['name'] == 'usage_type' and prev_record and 'service' in prev_record:
-            service = prev_record['service']
-            return random.choice(USAGE_TYPE_MAP.get(service, ['BoxUsage']))
-        if field['name'] == 'resource_id' and prev_record and 'service' in prev_record:
-            service = prev_record['service']
-            pattern_func = RESOURCE_ID_PATTERNS.get(service)
-            if pattern_func:
-                return pattern_func()
-        # Default: original logic
-        if 'values_by_company' in field and prev_record:
-            company = prev_record.get('company')
-            return random.choice(field['values_by_company'][company])
-        values = field['values']
+            services = list(aws_service_mappings.SERVICE_CATALOG['regions'])
+            return lambda record: choice(services)
+        values = field.get('values')
         weights = field.get('weights')
+        choices = rng.choices
+
+        def pick_from(entry):
+            entry_values, cum_weights = entry
+            if cum_weights:
+                return choices(entry_values, cum_weights=cum_weights, k=1)[0]
+            return choice(entry_values)
+        default = (values, cumulative_weights(weights) if weights else None)
+        conditional = conditional_choices(field)
+        if conditional:
+            # Values/weights looked up by the parent field's value
+            parent, table, fallback, default = conditional
+            get = table.get
+
+            def pick_conditional(record):
+                if record and parent in record:
+                    return pick_from(get(record[parent], fallback))
+                return pick_from(default)
+            return pick_conditional
         if weights:
-            return random.choices(values, weights=weights, k=1)[0]
-        return random.choice(values)
-    # Handle type: int/float with optional by_service and usage multiplier
-    if field['type'] in ['int', 'float']:
+            cum_weights = default[1]
+
+            def pick(record):
+                return choices(values, cum_weights=cum_weights, k=1)[0]
+        else:
+            def pick(record):
+                return choice(values)
+        if fname == 'resource_id':
+            fleet_size = field.get('fleet_size')
+            if fleet_size:
+                # Bounded population: each (account, service) draws from a fixed fleet of ids
+                fleet_seed = field.get('fleet_seed', 0)
+                fleets = {}
+
+                def pick_fleet_id(record):
+                    if record and record.get('service') in RESOURCE_ID_FORMATS:
+                        key = (record.get('account_id'), record['service'])
+                        fleet = fleets.get(key)
+                        if fleet is None:
+                            fleet = fleets[key] = resource_fleet(key[0], key[1], fleet_size, fleet_seed)
+                        return choice(fleet)
+                    return pick(record)
+                return pick_fleet_id
+            # Fresh ids are generated RESOURCE_ID_CHUNK at a time per service
+            buffers = {}
+
+            def pick_resource_id(record):
+                if record and record.get('service') in RESOURCE_ID_FORMATS:
+                    buffer = buffers.get(record['service'])
+                    if not buffer:
+                        buffer = buffers[record['service']] = generate_resource_ids(record['service'], RESOURCE_ID_CHUNK, rng)
+                    return buffer.pop()
+                return pick(record)
+            return pick_resource_id
+        return pick
+    # Handle type: multi_choice (a random subset of values, kept in values order)
+    if ftype == 'multi_choice':
+        values = field['values']
+        lo, hi = multi_choice_bounds(field)
+        randint = rng.randint
+        sample = rng.sample
+        indices = range(len(values))
+
+        def gen_multi_choice(record):
+            return [values[i] for i in sorted(sample(indices, randint(lo, hi)))]
+        return gen_multi_choice
+    # Handle type: int/float with optional by_<field> ranges and multipliers
+    if ftype in ['int', 'float']:
         min_v = field.get('min', 0)
         max_v = field.get('max', 100)
-        multiplier = 1.0
-        topic = context.get('topic') if context else None
-        # SaaS: plan-based multipliers
-        if topic and 'saas' in topic:
-            if field['name'] == 'monthly_fee' and prev_record and 'plan' in prev_record:
-                plan = prev_record['plan']
-                multiplier = PLAN_REVENUE_MULTIPLIER.get(plan, 1.0)
-            if field['name'] == 'usage_events' and prev_record and 'plan' in prev_record:
-                plan = prev_record['plan']
-                multiplier = PLAN_USAGE_MULTIPLIER.get(plan, 1.0)
-            if field['name'] == 'annual_revenue_musd' and prev_record and 'industry' in prev_record:
-                industry = prev_record['industry']
-                multiplier = INDUSTRY_REVENUE_MULTIPLIER.get(industry, 1.0)
-        # AWS: service-based multipliers
-        elif 'by_service' in field and prev_record:
-            service = prev_record.get('service')
-            svc_cfg = field['by_service'].get(service)
-            if svc_cfg:
-                min_v = svc_cfg.get('min', min_v)
-                max_v = svc_cfg.get('max', max_v)
-            if field['name'] == 'usage_quantity' and service in SERVICE_USAGE_MULTIPLIER:
-                multiplier = SERVICE_USAGE_MULTIPLIER[service]
-        if field['type'] == 'int':
-            return int(random.randint(min_v, max_v) * multiplier)
+        if ftype == 'int':
+            randint = rng.randint
+
+            def draw(lo, hi, multiplier):
+                return int(randint(lo, hi) * multiplier)
         else:
-            return round(random.uniform(min_v, max_v) * multiplier, 2)
+            uniform = rng.uniform
+
+            def draw(lo, hi, multiplier):
+                return round(uniform(lo, hi) * multiplier, 2)
+        conditional = conditional_ranges(field, context, min_v, max_v)
+        if conditional:
+            # (min, max, multiplier) looked up by the parent field's value
+            parent, table, default = conditional
+            get = table.get
+
+            def gen_conditional(record):
+                lo, hi, multiplier = get(record.get(parent), default) if record else default
+                return draw(lo, hi, multiplier)
+            return gen_conditional
+        return lambda record: draw(min_v, max_v, 1.0)
     # Handle type: date
-    if field['type'] == 'date':
-        def to_datetime(val):
-            if isinstance(val, datetime):
-                return val
-            if hasattr(val, 'year') and hasattr(val, 'month') and hasattr(val, 'day'):
-                return datetime(val.year, val.month, val.day)
-            return datetime.strptime(str(val), "%Y-%m-%d")
-        start = to_datetime(field['start'])
-        end_val = field.get('end')
-        if (
-            not end_val
-            or (isinstance(end_val, str) and (end_val == 'dynamic' or end_val.startswith('dynamic:')))
-        ):
-            # Compute end of current month
-            today = datetime.today()
-            if today.month == 12:
-                next_month = datetime(today.year + 1, 1, 1)
-            else:
-                next_month = datetime(today.year, today.month + 1, 1)
-            end = next_month - timedelta(days=1)
-        else:
-            end = to_datetime(end_val)
+    if ftype == 'date':
+        start, end = parse_date_bounds(field)
         delta = (end - start).days
-        date = start + timedelta(days=random.randint(0, delta))
+        randint = rng.randint
         # If time_format is specified, add random time and use that format
         if 'time_format' in field:
-            hour = random.randint(0, 23)
-            minute = random.randint(0, 59)
-            second = random.randint(0, 59)
-            date = date.replace(hour=hour, minute=minute, second=second)
-            return date.strftime(field['time_format'])
-        return date.strftime("%Y-%m-%d")
+            time_format = field['time_format']
+
+            def gen_date_time(record):
+                date = start + timedelta(days=randint(0, delta), seconds=randint(0, 86399))
+                return date.strftime(time_format)
+            return gen_date_time
+        return lambda record: (start + timedelta(days=randint(0, delta))).strftime("%Y-%m-%d")
     # Handle type: formula (supports referencing previous fields, date math, and output formatting)
-    if field['type'] == 'formula' and prev_record:
+    if ftype == 'formula':
+        return compile_formula(field, date_fields, rng)
+    # Default fallback
+    return lambda record: None
+
+
+# Names available to formulas besides the record's own fields
+FORMULA_NAMESPACE = {
+    "__builtins__": None,
+    'timedelta': timedelta,
+    'random': random,
+    'int': int,
+    'float': float,
+    'round': round,
+    'min': min,
+    'max': max,
+    'abs': abs,
+}
+ISO_DATE_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+
+def compile_expression(expression):
+    # Parse once into a code object; assignments and private/dunder attribute access are rejected up front
+    tree = ast.parse(expression.strip(), mode='eval')
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr.startswith('_'):
+            raise ValueError(f"Attribute '{node.attr}' is not allowed in formula: {expression}")
+        if isinstance(node, ast.NamedExpr):
+            raise ValueError(f"Assignment is not allowed in formula: {expression}")
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    return compile(tree, '<formula>', 'eval'), names
+
+
+def formula_date_fields(fields):
+    # {field name: output format} for fields whose values are formatted dates/datetimes
+    date_fields = {}
+    for field in fields:
+        ftype = field.get('type')
+        if ftype == 'datetime':
+            date_fields[field['name']] = '%Y-%m-%dT%H:%M:%S'
+        elif ftype == 'date':
+            date_fields[field['name']] = field.get('time_format', '%Y-%m-%d')
+        elif ftype == 'formula' and (field.get('output_format') or field.get('time_format')):
+            date_fields[field['name']] = field.get('output_format') or field.get('time_format')
+    return date_fields
+
+
+# Distinct values remembered per partition field before its segment cache is reset
+PARTITION_CACHE_SIZE = 100000
+
+
+def partition_segment(fname, fmt):
+    """Path segment for one partition field: year=/month=/day= for dates, else '<field>=<value>'.
+
+    Fields typed as ISO datetime/date in the schema are split by slicing the date prefix, with
+    no parsing. Other fields keep the old sniffing for ISO date strings. Segments are cached
+    per distinct value.
+    """
+    cache = {}
+    if fmt in ISO_DATE_FORMATS:
+        def segment(value):
+            if value is None:
+                return None
+            if not isinstance(value, str):
+                return f"{fname}={value}"
+            day = value[:10]
+            seg = cache.get(day)
+            if seg is None:
+                seg = cache[day] = f"year={day[:4]}/month={day[5:7]}/day={day[8:10]}"
+            return seg
+        return segment
+
+    def sniffed_segment(value):
+        if value is None:
+            return None
+        if not isinstance(value, str):
+            return f"{fname}={value}"
+        seg = cache.get(value)
+        if seg is None:
+            try:
+                date_obj = sniff_datetime(value)
+                seg = f"year={date_obj.year}/month={date_obj.month:02d}/day={date_obj.day:02d}"
+            except ValueError:
+                seg = f"{fname}={value}"
+            if len(cache) >= PARTITION_CACHE_SIZE:
+                cache.clear()
+            cache[value] = seg
+        return seg
+    return sniffed_segment
+
+
+def compile_partition_path(s3_partition_fields, fields):
+    # record -> 's3_path'; whole paths are interned per distinct combination of segments
+    date_fields = formula_date_fields(fields)
+    segments = [(pf, partition_segment(pf, date_fields.get(pf))) for pf in s3_partition_fields]
+    paths = {}
+
+    def partition_path(record):
+        key = tuple(segment(record.get(pf)) for pf, segment in segments)
+        path = paths.get(key)
+        if path is None:
+            parts = [seg for seg in key if seg is not None]
+            path = "/".join(parts) + "/" if parts else ""
+            if len(paths) >= PARTITION_CACHE_SIZE:
+                paths.clear()
+            paths[key] = path
+        return path
+    return partition_path
+
+
+def date_parser(fmt):
+    if fmt in ISO_DATE_FORMATS:
+        return datetime.fromisoformat
+    return lambda value: datetime.strptime(value, fmt)
+
+
+def sniff_datetime(value):
+    # Schema-less fallback: any ISO datetime or date string
+    for fmt in ISO_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except Exception:
+            continue
+    raise ValueError(value)
+
+
+def compile_formula(field, date_fields=None, rng=None):
+    """Compile a formula field once into a generator callable.
+
+    The formula is parsed into code objects up front, and only the inputs that are dates
+    (known from date_fields, the schema's {name: format}) are converted per record. Without
+    date_fields, referenced string values are sniffed for ISO dates as a fallback. rng replaces
+    the random module formulas see.
+    """
+    namespace = FORMULA_NAMESPACE if rng is None else dict(FORMULA_NAMESPACE, random=rng)
+    fname = field.get('name')
+    formula = field.get('formula', '')
+    by_service = field.get('by_service')
+    datetime_format = field.get('output_format') or field.get('time_format') or '%Y-%m-%dT%H:%M:%S'
+    precision = 4 if fname == 'variance_pct' else 2
+    rates = aws_service_mappings.SERVICE_CATALOG['rates']
+    # Two-part sums are evaluated side by side and added with add_dt for date math
+    try:
+        split = formula.split('+') if '+' in formula else []
+        if len(split) == 2:
+            left_code, left_names = compile_expression(split[0])
+            right_code, right_names = compile_expression(split[1])
+            codes = (left_code, right_code)
+            names = left_names | right_names
+        else:
+            codes = compile_expression(formula)
+            names = codes[1]
+            codes = (codes[0],)
+    except (SyntaxError, ValueError):
+        # Invalid formulas evaluate to None, as they always have
+        codes = None
+        names = set()
+    if date_fields is None:
+        date_inputs = [(name, sniff_datetime) for name in sorted(names)]
+    else:
+        date_inputs = [(name, date_parser(date_fields[name])) for name in sorted(names) if name in date_fields]
+
+    def add_dt(a, b):
+        if isinstance(a, datetime) and isinstance(b, int):
+            return a + timedelta(days=b)
+        if isinstance(b, datetime) and isinstance(a, int):
+            return b + timedelta(days=a)
+        return a + b
+
+    def gen_formula(prev_record):
+        if not prev_record:
+            return None
         # Multi-field consistency: enforce cost = usage_quantity * rate for cost field
-        if field['name'] == 'cost' and 'usage_quantity' in prev_record and 'service' in prev_record and 'usage_type' in prev_record:
-            rate = get_rate_for_service(prev_record['service'], prev_record['usage_type'])
+        if fname == 'cost' and 'usage_quantity' in prev_record and 'service' in prev_record and 'usage_type' in prev_record:
+            rate = rates.get((prev_record['service'], prev_record['usage_type']), DEFAULT_RATE)
             prev_record['rate'] = rate
             cost = prev_record['usage_quantity'] * rate
             return round(cost, 2)
-        formula = field.get('formula', '')
+        if codes is None:
+            return None
         # Inject rate/base_fee from by_service if present and not already in prev_record
-        if 'by_service' in field:
-            service = prev_record.get('service')
-            svc_cfg = field['by_service'].get(service)
+        if by_service:
+            svc_cfg = by_service.get(prev_record.get('service'))
             if svc_cfg:
                 if 'rate' in svc_cfg:
                     prev_record['rate'] = svc_cfg['rate']
                 if 'base_fee' in svc_cfg:
                     prev_record['base_fee'] = svc_cfg['base_fee']
-        local_vars = prev_record.copy()
-        # Always parse any date/datetime string fields to datetime objects for formula evaluation
-        for k, v in local_vars.items():
-            if isinstance(v, str):
-                # Try to parse as datetime (ISO format or date only)
-                try:
-                    local_vars[k] = datetime.strptime(v, '%Y-%m-%dT%H:%M:%S')
-                except Exception:
+        local_vars = prev_record
+        if date_inputs:
+            # Parse only the date inputs, layered over the record instead of copying it
+            parsed = {}
+            for name, parse in date_inputs:
+                value = prev_record.get(name)
+                if isinstance(value, str):
                     try:
-                        local_vars[k] = datetime.strptime(v, '%Y-%m-%d')
+                        parsed[name] = parse(value)
                     except Exception:
                         pass
+            if parsed:
+                local_vars = ChainMap(parsed, prev_record)
         try:
-            # Patch: support datetime + int (days) in formula by replacing '+' with a helper
-            def add_dt(a, b):
-                if isinstance(a, datetime) and isinstance(b, int):
-                    return a + timedelta(days=b)
-                if isinstance(b, datetime) and isinstance(a, int):
-                    return b + timedelta(days=a)
-                return a + b
-            # Replace '+' with add_dt for date math
-            # Only patch if formula contains '+'
-            if '+' in formula:
-                # Split formula on '+' and evaluate each side, then add with add_dt
-                parts = formula.split('+')
-                if len(parts) == 2:
-                    left = eval(parts[0].strip(), {"__builtins__": None}, local_vars)
-                    right = eval(parts[1].strip(), {"__builtins__": None}, local_vars)
-                    result = add_dt(left, right)
-                else:
-                    # Fallback to normal eval for more complex formulas
-                    result = eval(formula, {"__builtins__": None}, local_vars)
+            if len(codes) == 2:
+                result = add_dt(eval(codes[0], namespace, local_vars), eval(codes[1], namespace, local_vars))
             else:
-                result = eval(formula, {"__builtins__": None}, local_vars)
+                result = eval(codes[0], namespace, local_vars)
             if isinstance(result, datetime):
-                fmt = field.get('output_format') or field.get('time_format') or '%Y-%m-%dT%H:%M:%S'
-                return result.strftime(fmt)
-            if field['name'] == 'variance_pct':
-                return round(result, 4)
+                return result.strftime(datetime_format)
             if isinstance(result, float):
-                return round(result, 2)
+                return round(result, precision)
+            if fname == 'variance_pct':
+                return round(result, 4)
             return result
         except Exception:
             return None
-    # Default fallback
-    return None
+    return gen_formula
+
+
+def formula_inputs(formula):
+    # Names a formula reads; formulas split on '+' for date math are parsed part by part
+    for parts in ([formula], formula.split('+')):
+        try:
+            return set().union(*(compile_expression(part)[1] for part in parts))
+        except (SyntaxError, ValueError):
+            continue
+    return set()
+
+
+def field_dependencies(field, context=None):
+    """Names of the other fields a field's generator reads from the record.
+
+    Covers formula names, pattern components, by_<parent> conditions (values_by_company reads
+    company), the SaaS plan/industry multipliers, the catalog-driven region/usage_type, resource_id
+    and the cost rate lookup. Names that are not fields (formula builtins, ...) are left for the
+    caller to drop.
+    """
+    ftype = field.get('type')
+    fname = field.get('name')
+    deps = set()
+    if ftype == 'formula':
+        deps |= formula_inputs(field.get('formula', ''))
+        if fname == 'cost':
+            deps |= {'usage_quantity', 'service', 'usage_type'}
+        if field.get('by_service'):
+            deps.add('service')
+    elif ftype == 'string' and 'pattern' in field and isinstance(field.get('components'), dict):
+        for cdef in field['components'].values():
+            deps |= field_dependencies(cdef, context)
+    elif ftype == 'choice':
+        conditional = conditional_choices(field)
+        if conditional:
+            deps.add(conditional[0])
+        if fname == 'resource_id':
+            deps |= {'service', 'account_id'}
+    elif ftype in ('int', 'float'):
+        conditional = conditional_ranges(field, context, field.get('min', 0), field.get('max', 100))
+        if conditional:
+            deps.add(conditional[0])
+    deps.discard(fname)
+    return deps
+
+
+def field_order(fields, context=None, keep=()):
+    """Field definitions in evaluation order, without helper fields nothing reads.
+
+    Each field is evaluated after the fields it depends on (see field_dependencies) and otherwise
+    keeps its config position, except that the series key fields (and whatever they read) come
+    first. *_faker helpers that no output field (or keep, e.g. partition fields) reads are dropped,
+    so their Faker calls are never made. Raises ValueError on circular dependencies.
+    """
+    index = {f['name']: i for i, f in enumerate(fields)}
+    deps = {f['name']: field_dependencies(f, context) & index.keys() for f in fields}
+
+    def closure(names):
+        seen = set()
+        stack = [name for name in names if name in index]
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                stack.extend(deps[name])
+        return seen
+    needed = closure([f['name'] for f in fields if not f['name'].endswith('_faker')] + list(keep))
+    keys = closure(CONTINUITY_KEY_FIELDS)
+    waiting = {name: len(deps[name]) for name in needed}
+    readers = {}
+    for name in needed:
+        for dep in deps[name]:
+            readers.setdefault(dep, []).append(name)
+    ready = [(name not in keys, index[name], name) for name, count in waiting.items() if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, _, name = heapq.heappop(ready)
+        order.append(fields[index[name]])
+        for reader in readers.get(name, ()):
+            waiting[reader] -= 1
+            if waiting[reader] == 0:
+                heapq.heappush(ready, (reader not in keys, index[reader], reader))
+    if len(order) < len(needed):
+        cycle = sorted((name for name, count in waiting.items() if count), key=index.get)
+        raise ValueError(f"Circular field dependencies between: {', '.join(cycle)}")
+    return order
+
+
+def output_field_names(fields):
+    # Output columns: series key fields first, then the rest in config order, without *_faker helpers
+    names = list(dict.fromkeys(f['name'] for f in fields if not f['name'].endswith('_faker')))
+    return [n for n in names if n in CONTINUITY_KEY_FIELDS] + [n for n in names if n not in CONTINUITY_KEY_FIELDS]
+
+
+def compile_fields(config, reference_pools=None, rng=None, faker=None, keep=()):
+    # Compiled plan: [(field_name, generator)] in dependency order (see field_order)
+    context = config.get('context', {})
+    if reference_pools is None:
+        reference_pools = {}
+    date_fields = formula_date_fields(config['fields'])
+    fields = field_order(config['fields'], context, keep)
+    reference_data.preload_pools(fields, reference_pools)
+    return [(field['name'], compile_field(field, context, reference_pools, date_fields, rng, faker)) for field in fields]
+
+
+def split_key_plan(plan):
+    # (series key fields and the fields they read, the rest); compile_fields puts the former first
+    end = max((i + 1 for i, (fname, _) in enumerate(plan) if fname in CONTINUITY_KEY_FIELDS), default=0)
+    return plan[:end], plan[end:]
+
+
+def get_field_value(field, context, prev_record=None, reference_pools=None, rng=None, faker=None):
+    # Uncompiled single-value entry point; hot loops should use compile_fields()
+    return compile_field(field, context, reference_pools, rng=rng, faker=faker)(prev_record)
+
+
+# Fields carrying drift/spike series
+CONTINUITY_VALUE_FIELDS = ('usage_quantity', 'cost')
+# Records per batch for streaming writers and the columnar engine
+DEFAULT_BATCH_SIZE = 100000
+# Fields identifying a drift/spike series; generated first so continuity can be looked up
+CONTINUITY_KEY_FIELDS = ('account_id', 'service', 'resource_id')
+# Resource ids generated per service in one batched draw by the row engine
+RESOURCE_ID_CHUNK = 1024
+# CLI options left out of the dataset cache key: they do not change the generated data, or (config,
+# rate card) the file is hashed by content instead of by path
+CACHE_IGNORED_ARGS = ('config', 'rate_card', 'output', 'workers', 'partition_threads', 'no_cache', 'cache_dir', 'cache_size_mb')
+# Faker value pools built in this process, by (method, size, seed, locale)
+faker_pools = {}
+# Tick spacing for time-ordered (--time-series) runs
+CADENCES = {'hourly': timedelta(hours=1), 'daily': timedelta(days=1)}
+
+
+def time_series_ticks(config, cadence, time_field=None):
+    """(time_field, its output format, tick datetimes) for a time-ordered run.
+
+    Ticks step through the time field's range at the cadence, aligned to whole hours/days.
+    time_field defaults to the first datetime/date field.
+    """
+    fields = [f for f in config['fields'] if f.get('type') in ('datetime', 'date')]
+    field = next((f for f in fields if time_field is None or f['name'] == time_field), None)
+    if field is None:
+        raise ValueError(f"No datetime/date field {time_field!r} to order series by" if time_field else "No datetime/date field to order series by")
+    step = CADENCES[cadence]
+    if field['type'] == 'datetime':
+        start, end = parse_datetime_bounds(field)
+    else:
+        start, end = parse_date_bounds(field)
+    start = start.replace(minute=0, second=0) if step < timedelta(days=1) else start.replace(hour=0, minute=0, second=0)
+    n_ticks = int((end - start) / step) + 1
+    return field['name'], formula_date_fields([field])[field['name']], [start + step * i for i in range(n_ticks)]
+
+
+def series_tick_window(ticks, num_records, series_count):
+    # Most recent ticks needed to emit num_records rows across series_count series
+    needed = -(-num_records // series_count)
+    return ticks[max(len(ticks) - needed, 0):]
+
+
+def check_series_rows(num_records, series_count, tick_count):
+    # A time-ordered run emits one row per series and tick; fail instead of returning fewer rows
+    if series_count * tick_count < num_records:
+        raise ValueError(
+            f"Time-ordered run has {series_count} distinct series over {tick_count} ticks, so at most "
+            f"{series_count * tick_count} of {num_records} records; raise --series (or the resource fleet "
+            f"size), widen the time field's range or use a finer cadence"
+        )
+
+
+def continue_series(fname, last, upward_drift, spike_prob, spike_min, spike_max, spend_multiplier, rng=random):
+    # Next value of a usage_quantity/cost series given its last value
+    # Upward drift
+    drift = upward_drift * last
+    sigma = 0.05 * last if last else 1.0
+    new_val = max(0, last + rng.normalvariate(drift, sigma))
+    # Occasionally inject a sharp spike
+    if rng.random() < spike_prob:
+        new_val = last * rng.uniform(spike_min, spike_max)
+    # For cost, round to 2 decimals and apply spend multiplier
+    if fname == 'cost':
+        new_val = round(new_val * spend_multiplier, 2)
+    return new_val
+
+
+def generate_records_from_config(config, num_records=10000, upward_drift=0.005, spike_prob=0.02, spike_min=2.0, spike_max=10.0, spend_multiplier=1.0, s3_partition_fields=None, reference_pools=None, continuity_state=None, cadence=None, series_count=None, time_field=None, rng=None, faker=None):
+    return list(iter_records_from_config(
+        config,
+        num_records=num_records,
+        upward_drift=upward_drift,
+        spike_prob=spike_prob,
+        spike_min=spike_min,
+        spike_max=spike_max,
+        spend_multiplier=spend_multiplier,
+        s3_partition_fields=s3_partition_fields,
+        reference_pools=reference_pools,
+        continuity_state=continuity_state,
+        cadence=cadence,
+        series_count=series_count,
+        time_field=time_field,
+        rng=rng,
+        faker=faker
+    ))
+
+
+def iter_record_batches(config, batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+    # Fixed-size lists of records; memory is bounded by batch_size, not num_records
+    batch = []
+    for record in iter_records_from_config(config, **kwargs):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 
+def iter_random_keys(key_plan, num_records):
+    # Key fields drawn fresh for every record
+    for _ in range(num_records):
+        record = {}
+        for fname, gen in key_plan:
+            record[fname] = gen(record)
+        yield record
+
+
+def time_ordered_keys(config, key_plan, num_records, cadence, series_count=None, time_field=None):
+    """Key records for a time-ordered run, plus the time field name and a getter for the current tick.
+
+    Each series' key fields (account_id, service, resource_id) are drawn once; records are then
+    emitted tick by tick for every series, so the output is already sorted by time. Topics without
+    key fields get series_count anonymous series. Raises ValueError if the distinct series and ticks
+    cannot cover num_records.
+    """
+    time_field, time_format, ticks = time_series_ticks(config, cadence, time_field)
+    if not series_count:
+        series_count = -(-num_records // len(ticks))
+    if key_plan:
+        series = {}
+        # Redraw duplicate keys (e.g. small resource fleets) a bounded number of times
+        for _ in range(series_count * 10):
+            if len(series) >= series_count:
+                break
+            key_record = {}
+            for fname, gen in key_plan:
+                key_record[fname] = gen(key_record)
+            series.setdefault(tuple(key_record.get(k) for k in CONTINUITY_KEY_FIELDS), key_record)
+        key_records = list(series.values())
+    else:
+        key_records = [{} for _ in range(series_count)]
+    window = series_tick_window(ticks, num_records, len(key_records))
+    check_series_rows(num_records, len(key_records), len(window))
+    current = [None]
+
+    def iter_keys():
+        count = 0
+        for tick in window:
+            current[0] = tick.strftime(time_format)
+            for key_record in key_records:
+                if count >= num_records:
+                    return
+                count += 1
+                yield dict(key_record)
+    return iter_keys(), time_field, lambda record: current[0]
 
-def generate_records_from_config(config, num_records=10000, upward_drift=0.005, spike_prob=0.02, spike_min=2.0, spike_max=10.0, spend_multiplier=1.0, s3_partition_fields=None):
-    records = []
+
+def iter_records_from_config(config, num_records=10000, upward_drift=0.005, spike_prob=0.02, spike_min=2.0, spike_max=10.0, spend_multiplier=1.0, s3_partition_fields=None, reference_pools=None, continuity_state=None, cadence=None, series_count=None, time_field=None, rng=None, faker=None):
+    # rng/faker: dedicated random.Random and Faker for a reproducible run (default: shared ones)
+    if rng is None:
+        rng = random
     fields = config['fields']
-    output_fields = [f['name'] for f in fields if not f['name'].endswith('_faker')]
+    output_fields = output_field_names(fields)
     if s3_partition_fields is None:
         s3_partition_fields = config.get('s3_partition_fields', [])
-    # Pre-load all reference pools
-    reference_pools = {}
-    for field in fields:
-        if field.get('type') == 'reference':
-            ref_file = field['reference_file']
-            ref_field = field['reference_field']
-            unique = field.get('unique', False)
-            pool_key = f"{ref_file}:{ref_field}:unique" if unique else ref_file
-            if pool_key not in reference_pools:
-                if not os.path.exists(ref_file):
-                    raise FileNotFoundError(f"Reference file not found: {ref_file}")
-                with open(ref_file, 'r') as f:
-                    pool = json.load(f)
-                if unique:
-                    random.shuffle(pool)
-                reference_pools[pool_key] = pool.copy()
-    # State for continuity: {(account_id, service, resource_id): {field: last_value}}
-    continuity_state = {}
-    for _ in range(num_records):
-        record = {}
-        key_fields = {}
-        # Pre-populate key fields for continuity
-        for field in fields:
-            if field['name'] in ('account_id', 'service', 'resource_id'):
-                value = get_field_value(field, config.get('context', {}), record, reference_pools)
-                record[field['name']] = value
-                key_fields[field['name']] = value
-        state_key = (key_fields.get('account_id'), key_fields.get('service'), key_fields.get('resource_id'))
-        last_vals = continuity_state.get(state_key, {})
+    # Compile the field plan once, in dependency order (also pre-loads all reference pools not passed in)
+    plan = compile_fields(config, reference_pools, rng, faker, s3_partition_fields)
+    key_plan, value_plan = split_key_plan(plan)
+    continuity_fields = [fname for fname, _ in value_plan if fname in CONTINUITY_VALUE_FIELDS]
+    partition_path = compile_partition_path(s3_partition_fields, fields) if s3_partition_fields else None
+    # Last usage_quantity/cost per (account_id, service, resource_id); pass one in to resume series
+    if continuity_state is None:
+        continuity_state = ContinuityState(CONTINUITY_VALUE_FIELDS)
+    if cadence:
+        # Time-ordered: fixed series keys, and the time field takes the current tick
+        key_records, time_field, gen_tick = time_ordered_keys(config, key_plan, num_records, cadence, series_count, time_field)
+        value_plan = [(fname, gen_tick if fname == time_field else gen) for fname, gen in value_plan]
+    else:
+        key_records = iter_random_keys(key_plan, num_records)
+    for record in key_records:
+        slot = None
+        if continuity_fields:
+            slot = continuity_state.slot((record.get('account_id'), record.get('service'), record.get('resource_id')))
         # Generate other fields, using continuity for usage_quantity and cost
-        for field in fields:
-            fname = field['name']
-            if fname in ('account_id', 'service', 'resource_id'):
-                continue
-            if fname in ('usage_quantity', 'cost') and last_vals.get(fname) is not None:
-                # Upward drift
-                drift = upward_drift * last_vals[fname]
-                sigma = 0.05 * last_vals[fname] if last_vals[fname] else 1.0
-                new_val = max(0, last_vals[fname] + random.normalvariate(drift, sigma))
-                # Occasionally inject a sharp spike
-                if random.random() < spike_prob:
-                    spike = random.uniform(spike_min, spike_max)
-                    new_val = last_vals[fname] * spike
-                # For cost, round to 2 decimals and apply spend multiplier
-                if fname == 'cost':
-                    new_val = round(new_val * spend_multiplier, 2)
-                record[fname] = new_val
+        for fname, gen in value_plan:
+            last = continuity_state.last(slot, fname) if slot is not None and fname in continuity_fields else None
+            if last is not None:
+                record[fname] = continue_series(fname, last, upward_drift, spike_prob, spike_min, spike_max, spend_multiplier, rng)
             else:
-                value = get_field_value(field, config.get('context', {}), record, reference_pools)
+                value = gen(record)
                 # Apply spend multiplier to cost field
                 if fname == 'cost' and value is not None:
                     value = round(value * spend_multiplier, 2)
                 record[fname] = value
         # Update continuity state
-        if state_key not in continuity_state:
-            continuity_state[state_key] = {}
-        for fname in ('usage_quantity', 'cost'):
-            if fname in record:
-                continuity_state[state_key][fname] = record[fname]
+        if slot is not None:
+            for fname in continuity_fields:
+                continuity_state.update(slot, fname, record[fname])
+            continuity_state.trim()
         # S3-style partition path
-        if s3_partition_fields:
-            parts = []
-            for pf in s3_partition_fields:
-                val = record.get(pf)
-                if val is None:
-                    continue
-                # Try to parse as date or datetime, but only use date part for partitioning
-                date_obj = None
-                if isinstance(val, str):
-                    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
-                        try:
-                            date_obj = datetime.strptime(val, fmt)
-                            break
-                        except Exception:
-                            continue
-                if date_obj:
-                    parts.append(f"year={date_obj.year}")
-                    parts.append(f"month={date_obj.month:02d}")
-                    parts.append(f"day={date_obj.day:02d}")
-                else:
-                    parts.append(f"{pf}={val}")
-            record['s3_path'] = "/".join(parts) + "/" if parts else ""
+        if partition_path is not None:
+            record['s3_path'] = partition_path(record)
         # Only include output fields (exclude *_faker fields)
-        output_record = {k: v for k, v in record.items() if k in output_fields}
+        output_record = {k: record[k] for k in output_fields}
         if s3_partition_fields:
             output_record['s3_path'] = record.get('s3_path', "")
-        records.append(output_record)
-    return records
+        yield output_record
 
 
 def main():
     import argparse
-    import pandas as pd
     parser = argparse.ArgumentParser(description="Generate dummy data from topic config.")
     parser.add_argument("--config", type=str, required=True, help="Path to topic YAML config file")
     parser.add_argument("--num-records", type=int, default=10000, help="Number of records to generate")
     parser.add_argument("--output", type=str, required=False, help="Output file path (json, csv, or parquet). Defaults to ~/Desktop/<topic>.json")
-    parser.add_argument("--output-type", type=str, choices=["json", "csv", "parquet", "jsonl"], default=None, help="Output file type (json, csv, parquet, jsonl). If not set, inferred from file extension.")
+    parser.add_argument("--output-type", type=str, choices=["json", "csv", "parquet", "jsonl", "sqlite", "duckdb"], default=None, help="Output file type (json, csv, parquet, jsonl, sqlite, duckdb). If not set, inferred from file extension (.db/.sqlite/.sqlite3 for sqlite, .duckdb).")
+    parser.add_argument("--table", type=str, default=None, help="Table loaded by sqlite/duckdb output (default: the topic name)")
+    parser.add_argument("--if-exists", type=str, choices=list(output_writers.IF_EXISTS), default="replace", help="What sqlite/duckdb output does with an existing table of the same name (default: replace)")
     parser.add_argument("--s3-partition-fields", type=str, default=None, help="Comma-separated list of fields to use for S3-style partition path (e.g. shipped_date,region)")
     parser.add_argument("--upward-drift", type=float, default=0.005, help="Upward drift per step (default: 0.005, or 0.5%)")
     parser.add_argument("--spike-prob", type=float, default=0.02, help="Probability of a spike per record (default: 0.02, or 2%)")
     parser.add_argument("--spike-min", type=float, default=2.0, help="Minimum spike multiplier (default: 2.0)")
     parser.add_argument("--spike-max", type=float, default=10.0, help="Maximum spike multiplier (default: 10.0)")
     parser.add_argument("--spend-multiplier", type=float, default=1.0, help="Global spend multiplier for all costs (default: 1.0, lower for smaller demo spend, e.g. 0.15 for $100M max)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Records generated and written per batch (default: {DEFAULT_BATCH_SIZE}); bounds memory use")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes; >1 splits --num-records into --batch-size shards generated in parallel (default: 1)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible output (with --workers, each shard gets a seed derived from it)")
+    parser.add_argument("--engine", type=str, choices=["row", "columnar"], default="row", help="Generation engine: row-at-a-time (default) or vectorized NumPy columns (requires numpy)")
+    parser.add_argument("--rate-card", type=str, default=None, help="YAML/JSON/CSV rate card overriding the built-in AWS rates, regions, usage types and usage multipliers")
+    parser.add_argument("--resource-fleet-size", type=int, default=None, help="Draw resource_id from a fixed fleet of this many ids per account/service instead of a fresh id per record")
+    parser.add_argument("--faker-pool-size", type=int, default=None, help="Sample faker fields from a pre-generated pool of up to N distinct values each instead of calling Faker per record (cached under --cache-dir)")
+    parser.add_argument("--continuity-state", type=str, default=None, help="File holding each drift/spike series' last values; loaded if it exists and saved after the run, so incremental runs continue the series (.gz to compress)")
+    parser.add_argument("--max-series", type=int, default=None, help="Cap on drift/spike series kept in memory; least recently used series are dropped beyond it")
+    parser.add_argument("--time-series", type=str, choices=sorted(CADENCES), default=None, help="Generate each account/service/resource series in timestamp order at this cadence; output is already sorted by time")
+    parser.add_argument("--series", type=int, default=None, help="Number of series for --time-series (default: enough to cover --num-records)")
+    parser.add_argument("--time-field", type=str, default=None, help="datetime/date field carrying the --time-series tick (default: the first one)")
+    parser.add_argument("--partition-threads", type=int, default=None, help="Threads writing partitions in parallel with --s3-partition-fields (default: Python's thread pool default)")
+    parser.add_argument("--max-rows-per-file", type=int, default=None, help="Roll partitioned csv/parquet output over to a new file every N rows (<base>-1.<ext>, ...)")
+    parser.add_argument("--row-group-size", type=int, default=None, help="Buffer partitioned output until N rows per partition, written as one Parquet row group")
+    parser.add_argument("--json-serializer", type=str, choices=list(output_writers.JSON_SERIALIZERS), default=None, help="JSON/JSONL encoder (default: the first installed of orjson, msgspec, json)")
+    parser.add_argument("--json-indent", type=int, default=None, help="Indent JSON output by N spaces (default: compact, one record per line)")
+    parser.add_argument("--compression", type=str, choices=sorted(set(output_writers.COMPRESSION_SUFFIXES) | set(output_writers.PARQUET_CODECS)), default=None, help="gzip/zstd for json, jsonl and csv (default: from a .gz/.zst --output suffix); Parquet codec snappy, zstd, gzip, brotli, lz4 or none (default: snappy)")
+    parser.add_argument("--compression-level", type=int, default=None, help="Compression level (default: 6 for gzip, 3 for zstd, the codec's default for Parquet)")
+    parser.add_argument("--compression-threads", type=int, default=None, help="Threads compressing json/jsonl/csv output (default: one per CPU)")
+    parser.add_argument("--parquet-schema", type=str, choices=["typed", "inferred"], default="typed", help="Parquet column types from the topic's field definitions (timestamps, dictionary-encoded choices, int32), or inferred from the values (default: typed)")
+    parser.add_argument("--object-store", type=str, default=None, help="Upload output to s3://bucket/prefix (or file:///dir, a local stand-in) while it is written; --output is then the object key (default: <topic>.<ext>)")
+    parser.add_argument("--object-store-endpoint", type=str, default=None, help="Endpoint URL of an S3-compatible store such as MinIO (default: AWS S3)")
+    parser.add_argument("--upload-part-size-mb", type=int, default=object_store.DEFAULT_PART_SIZE >> 20, help=f"Multipart upload part size in MiB, at least {object_store.MIN_PART_SIZE >> 20} (default: {object_store.DEFAULT_PART_SIZE >> 20})")
+    parser.add_argument("--upload-connections", type=int, default=object_store.DEFAULT_CONNECTIONS, help=f"Parts uploaded concurrently over pooled connections with --object-store (default: {object_store.DEFAULT_CONNECTIONS})")
+    parser.add_argument("--no-cache", action="store_true", help="Always generate, without reading or writing the dataset cache")
+    parser.add_argument("--cache-dir", type=str, default=dataset_cache.DEFAULT_CACHE_DIR, help=f"Dataset cache directory for seeded runs (default: {dataset_cache.DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-size-mb", type=int, default=dataset_cache.DEFAULT_CACHE_SIZE_MB, help=f"Evict least recently used cached datasets beyond this size (default: {dataset_cache.DEFAULT_CACHE_SIZE_MB})")
     args = parser.parse_args()
+    if args.time_series and args.workers > 1:
+        parser.error("--time-series generates series in order in a single process; drop --workers")
     config = load_config(args.config)
+    if args.resource_fleet_size:
+        for field in config['fields']:
+            if field.get('name') == 'resource_id':
+                field['fleet_size'] = args.resource_fleet_size
+    if args.faker_pool_size:
+        for field in config['fields']:
+            if field.get('type') == 'faker':
+                field.setdefault('pool_size', args.faker_pool_size)
+                if args.seed is not None:
+                    field.setdefault('pool_seed', args.seed)
+                if not args.no_cache:
+                    field.setdefault('pool_cache', os.path.join(args.cache_dir, 'faker_pools'))
+    if args.rate_card:
+        aws_service_mappings.use_rate_card(args.rate_card)
     s3_partition_fields = None
     if args.s3_partition_fields:
         s3_partition_fields = [f.strip() for f in args.s3_partition_fields.split(",") if f.strip()]
-    records = generate_records_from_config(
-        config,
-        num_records=args.num_records,
-        upward_drift=args.upward_drift,
-        spike_prob=args.spike_prob,
-        spike_min=args.spike_min,
-        spike_max=args.spike_max,
-        spend_multiplier=args.spend_multiplier,
-        s3_partition_fields=s3_partition_fields
-    )
-
-    # Debug: print first 5 records to check partition field values
-    print("Sample generated records (first 5):")
-    for rec in records[:5]:
-        print(rec)
-
     # Determine output path and type
     topic = config.get('topic', 'output')
     # Determine output type first
     output_type = args.output_type
     output_path = args.output if args.output else None
+    # A .gz/.zst suffix compresses the output; the type comes from the extension before it
+    base_path, compression = output_writers.split_compression(output_path) if output_path else (None, None)
     if output_type is None:
-        if output_path and output_path.endswith(".jsonl"):
+        if base_path and base_path.endswith(".jsonl"):
             output_type = "jsonl"
-        elif output_path and output_path.endswith(".json"):
+        elif base_path and base_path.endswith(".json"):
             output_type = "json"
-        elif output_path and output_path.endswith(".csv"):
+        elif base_path and base_path.endswith(".csv"):
             output_type = "csv"
-        elif output_path and output_path.endswith(".parquet"):
+        elif base_path and base_path.endswith(".parquet"):
             output_type = "parquet"
+        elif base_path and os.path.splitext(base_path)[1] in output_writers.DATABASE_EXTENSIONS:
+            output_type = output_writers.DATABASE_EXTENSIONS[os.path.splitext(base_path)[1]]
         else:
             output_type = "json"
+    if output_type in ("sqlite", "duckdb"):
+        if args.object_store:
+            parser.error(f"{output_type} output is a database file and cannot be written to an object store")
+        if compression or args.compression:
+            parser.error(f"{output_type} output is a database file and is not compressed")
+    elif output_type == "parquet":
+        if compression:
+            parser.error("Parquet output is compressed per column; use --compression instead of a .gz/.zst suffix")
+        compression = args.compression
+        if compression and compression not in output_writers.PARQUET_CODECS:
+            parser.error(f"--compression {compression} is not a Parquet codec ({', '.join(output_writers.PARQUET_CODECS)})")
+    else:
+        compression = args.compression or compression
+        if compression == "none":
+            compression = None
+        if compression and compression not in output_writers.COMPRESSION_SUFFIXES:
+            parser.error(f"--compression {compression} only applies to Parquet; use gzip or zstd for {output_type}")
     # Set default output path based on type if not provided
     if not output_path:
         ext = output_type
@@ -413,58 +1109,122 @@ def main():
             ext = "csv"
         elif ext == "parquet":
             ext = "parquet"
+        elif ext == "sqlite":
+            ext = "db"
+        elif ext == "duckdb":
+            ext = "duckdb"
         else:
             ext = "json"
-        output_path = os.path.expanduser(f"~/Desktop/{topic}.{ext}")
-
-    if s3_partition_fields and output_type in ("csv", "parquet"):
-        from collections import defaultdict
-        partitioned_records = defaultdict(list)
-        for rec in records:
-            s3_path = rec.get('s3_path', '')
-            partitioned_records[s3_path].append(rec)
-        # Debug: print partition paths and record counts
-        print("Partition summary:")
-        for s3_path, recs in list(partitioned_records.items())[:10]:
-            print(f"{s3_path}: {len(recs)} records")
-        print(f"Total partitions: {len(partitioned_records)}")
-        base_dir, base_file = os.path.split(output_path)
+        # With an object store the path is the object key under its prefix
+        output_path = f"{topic}.{ext}" if args.object_store else os.path.expanduser(f"~/Desktop/{topic}.{ext}")
+        if compression and output_type in ("json", "jsonl", "csv"):
+            output_path += output_writers.COMPRESSION_SUFFIXES[compression]
+
+    partitioned = bool(s3_partition_fields) and output_type in ("csv", "parquet")
+    # Seeded single-file runs are deterministic, so identical runs can reuse a cached file (not
+    # databases, which may hold other tables, or uploaded objects)
+    database = output_type in ("sqlite", "duckdb")
+    cache_key = None
+    if args.seed is not None and not args.no_cache and not args.continuity_state and not partitioned and not database and not args.object_store:
+        params = {k: v for k, v in vars(args).items() if k not in CACHE_IGNORED_ARGS}
+        # Dynamic date bounds move with the current month, so the cache key holds the resolved ones
+        params.update(output_type=output_type, sharded=args.workers > 1, compression=compression, date_bounds=resolved_date_bounds(config['fields']))
+        cache_key = dataset_cache.cache_key(args.config, config, params, [args.rate_card] if args.rate_card else [])
+        if dataset_cache.fetch(args.cache_dir, cache_key, output_type, output_path):
+            print(f"Reused cached output for topic '{topic}' in {output_path} (type: {output_type}, key: {cache_key[:12]})")
+            return
+    if database and args.if_exists == "fail" and output_writers.table_exists(output_path, args.table or topic, output_type):
+        parser.error(f"Table {args.table or topic} already exists in {output_path} (--if-exists fail)")
+    store = None
+    if args.object_store:
+        try:
+            store = object_store.open_store(
+                args.object_store, args.object_store_endpoint, args.upload_part_size_mb << 20, args.upload_connections
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    generator_kwargs = dict(
+        num_records=args.num_records,
+        upward_drift=args.upward_drift,
+        spike_prob=args.spike_prob,
+        spike_min=args.spike_min,
+        spike_max=args.spike_max,
+        spend_multiplier=args.spend_multiplier,
+        s3_partition_fields=s3_partition_fields,
+        cadence=args.time_series,
+        series_count=args.series,
+        time_field=args.time_field
+    )
+    if args.continuity_state:
+        continuity_state = ContinuityState.load(args.continuity_state, CONTINUITY_VALUE_FIELDS, args.max_series)
+    else:
+        continuity_state = ContinuityState(CONTINUITY_VALUE_FIELDS, args.max_series)
+    if args.workers > 1:
+        import parallel_generation
+        # One shard per batch with a seed derived from --seed; output is independent of --workers
+        batches = parallel_generation.iter_sharded_batches(
+            config, workers=args.workers, seed=args.seed, engine=args.engine, batch_size=args.batch_size,
+            rate_card=args.rate_card, continuity_state=continuity_state, **generator_kwargs
+        )
+    elif args.engine == "columnar":
+        import numpy as np
+        import columnar_engine
+        # Column arrays go straight into DataFrames; records are only built for JSON output
+        batches = columnar_engine.iter_column_batches(
+            config, batch_size=args.batch_size, rng=np.random.default_rng(args.seed),
+            py_rng=random.Random(args.seed), faker=make_faker(args.seed),
+            continuity_state=continuity_state, **generator_kwargs
+        )
+    else:
+        batches = iter_record_batches(
+            config, batch_size=args.batch_size, rng=random.Random(args.seed), faker=make_faker(args.seed),
+            continuity_state=continuity_state, **generator_kwargs
+        )
+
+    column_types = None
+    if (output_type == "parquet" and args.parquet_schema == "typed") or database:
+        import arrow_schema
+        column_types = arrow_schema.column_types(config['fields'], config.get('context', {}))
+
+    # Debug: print first 5 records to check partition field values
+    sample_records, batches = output_writers.peek_records(batches, 5)
+    print("Sample generated records (first 5):")
+    for rec in sample_records:
+        print(rec)
+
+    if partitioned:
+        base_dir, base_file = os.path.split(output_writers.split_compression(output_path)[0])
         base_file_noext = os.path.splitext(base_file)[0]
-        ext = output_type
         topic_dir = os.path.join(base_dir, topic)
-        if topic_dir:
-            os.makedirs(topic_dir, exist_ok=True)
-        for s3_path, recs in partitioned_records.items():
-            # Remove s3_path from records for output
-            for r in recs:
-                if 's3_path' in r:
-                    r.pop('s3_path')
-            part_dir = os.path.join(topic_dir, s3_path)
-            os.makedirs(part_dir, exist_ok=True)
-            part_file = os.path.join(part_dir, f"{base_file_noext}.{ext}")
-            df = pd.DataFrame(recs)
-            if output_type == "csv":
-                df.to_csv(part_file, index=False)
-            elif output_type == "parquet":
-                df.to_parquet(part_file, index=False)
-        print(f"Wrote {len(partitioned_records)} partitioned files under {topic_dir or '.'}")
+        # Streams batches into topic_dir/<s3_path>/<base>.<ext>, partitions written in parallel
+        partition_rows = output_writers.write_partitioned(
+            batches, output_type, topic_dir, base_file_noext, threads=args.partition_threads,
+            max_rows_per_file=args.max_rows_per_file, row_group_size=args.row_group_size,
+            compression=compression, compression_level=args.compression_level, column_types=column_types,
+            store=store
+        )
+        # Debug: print partition paths and record counts
+        print("Partition summary:")
+        for s3_path, rows in list(partition_rows.items())[:10]:
+            print(f"{s3_path}: {rows} records")
+        print(f"Total partitions: {len(partition_rows)}")
+        print(f"Wrote {len(partition_rows)} partitioned files under {store.url(topic_dir) if store else topic_dir or '.'}")
     else:
-        if output_type == "json":
-            with open(output_path, "w") as f:
-                json.dump(records, f, indent=2)
-        elif output_type == "jsonl":
-            with open(output_path, "w") as f:
-                for rec in records:
-                    f.write(json.dumps(rec) + "\n")
-        elif output_type == "csv":
-            df = pd.DataFrame(records)
-            df.to_csv(output_path, index=False)
-        elif output_type == "parquet":
-            df = pd.DataFrame(records)
-            df.to_parquet(output_path, index=False)
-        else:
-            raise ValueError(f"Unsupported output type: {output_type}")
-        print(f"Generated {len(records)} records for topic '{topic}' in {output_path} (type: {output_type})")
+        if store is None:
+            dataset_cache.unlink_shared(output_path)
+        num_generated = output_writers.write_batches(
+            batches, output_type, output_path, args.json_serializer, args.json_indent,
+            compression, args.compression_level, args.compression_threads, column_types,
+            table=args.table or topic, if_exists=args.if_exists, store=store
+        )
+        print(f"Generated {num_generated} records for topic '{topic}' in {store.url(output_path) if store else output_path} (type: {output_type})")
+        if cache_key is not None:
+            dataset_cache.store(args.cache_dir, cache_key, output_type, output_path, args.cache_size_mb * 1024 * 1024)
+    if store is not None:
+        store.close()
+    if args.continuity_state:
+        continuity_state.save(args.continuity_state)
+        print(f"Saved {len(continuity_state)} series to {args.continuity_state}")
 
 
 if __name__ == "__main__":
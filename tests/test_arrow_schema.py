@@ -0,0 +1,63 @@
+import os
+import random
+
+import pytest
+
+import output_writers
+import samples_run
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+arrow_schema = pytest.importorskip('arrow_schema')
+
+AWS_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'configs/topics/aws_cost.yaml')
+
+
+def test_rounded_floats_read_back_unchanged(tmp_path):
+    fields = [{'name': 'amount', 'type': 'float', 'min': 0, 'max': 1000}]
+    types = arrow_schema.column_types(fields)
+    assert types['amount'][0] == pa.float64()
+    records = [{'amount': v} for v in (382.87, 0.1, 999.99)]
+    path = str(tmp_path / 'out.parquet')
+    output_writers.write_batches(iter([records]), 'parquet', path, column_types=types)
+    assert pq.read_table(path).column('amount').to_pylist() == [382.87, 0.1, 999.99]
+
+
+@pytest.mark.parametrize('schema', ['typed', 'inferred'])
+def test_nested_choices_with_one_record_batches(tmp_path, schema):
+    # The first batches can only hold related_resources: [] (list<null>) or no parent_resource_id
+    np = pytest.importorskip('numpy')
+    import columnar_engine
+    config = samples_run.load_config(AWS_CONFIG)
+    types = arrow_schema.column_types(config['fields'], config.get('context', {})) if schema == 'typed' else None
+    if types:
+        assert types['related_resources'][0] == pa.list_(pa.string())
+        assert pa.types.is_struct(types['tags'][0])
+    batches = columnar_engine.iter_column_batches(
+        config, num_records=200, batch_size=1, rng=np.random.default_rng(3), py_rng=random.Random(3), faker=samples_run.make_faker(3)
+    )
+    path = str(tmp_path / 'out.parquet')
+    assert output_writers.write_batches(batches, 'parquet', path, column_types=types) == 200
+    table = pq.read_table(path)
+    assert table.schema.field('related_resources').type == pa.list_(pa.string())
+    assert any(table.column('related_resources').to_pylist())
+
+
+@pytest.mark.parametrize('engine', ['row', 'columnar'])
+def test_multi_choice_sizes_and_parquet_type(tmp_path, engine):
+    field = {'name': 'features', 'type': 'multi_choice', 'values': ['sso', 'api', 'audit', 'sla', 'export'], 'min_choices': 1, 'max_choices': 3}
+    config = {'fields': [field]}
+    if engine == 'columnar':
+        np = pytest.importorskip('numpy')
+        import columnar_engine
+        batches = list(columnar_engine.iter_column_batches(config, num_records=500, rng=np.random.default_rng(1), py_rng=random.Random(1), faker=samples_run.make_faker(1)))
+    else:
+        batches = list(samples_run.iter_record_batches(config, num_records=500, rng=random.Random(1), faker=samples_run.make_faker(1)))
+    values = [r['features'] for batch in batches for r in output_writers.batch_records(batch)]
+    assert {len(v) for v in values} == {1, 2, 3}
+    assert all(len(set(v)) == len(v) and set(v) <= set(field['values']) for v in values)
+    path = str(tmp_path / 'out.parquet')
+    output_writers.write_batches(iter(batches), 'parquet', path, column_types=arrow_schema.column_types(config['fields']))
+    table = pq.read_table(path)
+    assert table.schema.field('features').type == pa.list_(pa.string())
+    assert table.column('features').to_pylist() == values
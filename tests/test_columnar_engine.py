@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+import samples_run
+
+np = pytest.importorskip('numpy')
+columnar_engine = pytest.importorskip('columnar_engine')
+
+
+def column_batches(config, num_records, seed=1, **kwargs):
+    return list(columnar_engine.iter_column_batches(
+        config, num_records=num_records, rng=np.random.default_rng(seed), py_rng=random.Random(seed),
+        faker=samples_run.make_faker(seed), **kwargs
+    ))
+
+
+def test_conditional_choice_without_parent_column_uses_fallback():
+    # region follows the service catalog, but there is no service field and no values of its own
+    config = {'fields': [{'name': 'region', 'type': 'choice'}, {'name': 'tier', 'type': 'choice', 'values': ['a', 'b'], 'by_plan': {'x': ['c']}}]}
+    batch, = column_batches(config, 50)
+    assert set(batch['region']) == {'us-east-1'}
+    assert set(batch['tier']) <= {'a', 'b'}
+    records = samples_run.generate_records_from_config(config, num_records=50, rng=random.Random(1), faker=samples_run.make_faker(1))
+    assert {r['region'] for r in records} == {'us-east-1'}
+
+
+def conditional_config():
+    # The child is listed before its parent; the plan orders them
+    return {'fields': [
+        {'name': 'reading', 'type': 'int', 'min': 0, 'max': 10, 'by_sensor': {'temp': {'min': 100, 'max': 110}, 'flow': {'min': 5, 'max': 6, 'multiplier': 10}}},
+        {'name': 'grade', 'type': 'choice', 'values': ['a', 'b'], 'by_sensor': {'temp': ['hot'], 'flow': {'values': ['x', 'y'], 'weights': [0, 1]}}},
+        {'name': 'sensor', 'type': 'choice', 'values': ['temp', 'flow', 'other']},
+    ]}
+
+
+def check_conditional_records(records):
+    expected = {'temp': (range(100, 111), {'hot'}), 'flow': ({50, 60}, {'y'}), 'other': (range(0, 11), {'a', 'b'})}
+    assert {r['sensor'] for r in records} == set(expected)
+    for r in records:
+        readings, grades = expected[r['sensor']]
+        assert r['reading'] in readings
+        assert r['grade'] in grades
+
+
+def test_by_field_tables_apply_per_parent_value():
+    records = samples_run.generate_records_from_config(conditional_config(), num_records=300, rng=random.Random(1), faker=samples_run.make_faker(1))
+    check_conditional_records(records)
+    batch, = column_batches(conditional_config(), 300)
+    check_conditional_records([dict(zip(batch, values)) for values in zip(*batch.values())])
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+import output_writers
+
+pytest.importorskip('pyarrow')
+
+
+def test_failed_sqlite_batch_rolls_back(tmp_path):
+    path = str(tmp_path / 'out.db')
+    output_writers.write_batches(iter([[{'id': 1}, {'id': 2}]]), 'sqlite', path, table='items')
+
+    def batches():
+        # sqlite3 cannot bind an object, so the replacing load fails inside its first transaction
+        yield [{'id': 3}, {'id': object()}]
+    with pytest.raises(Exception):
+        output_writers.write_batches(batches(), 'sqlite', path, table='items')
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT id FROM items ORDER BY id").fetchall() == [(1,), (2,)]
+        assert conn.execute("PRAGMA integrity_check").fetchone() == ('ok',)
+
+
+def test_sqlite_schema_uses_declared_types(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'out.db')
+    records = [{'name': 'a', 'score': None, 'rank': None}] * 2000 + [{'name': 'b', 'score': 7, 'rank': 3}]
+    output_writers.write_batches(iter([records]), 'sqlite', path, table='t', column_types={'score': (pa.int32(), None, False)})
+    with sqlite3.connect(path) as conn:
+        types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(t)")}
+    assert types['score'] == 'INTEGER'
+    # Undeclared, but typed from the whole first batch rather than its all-null head
+    assert types['rank'] != 'TEXT'
+    assert output_writers.table_exists(path, 't', 'sqlite')
+    assert not output_writers.table_exists(path, 'other', 'sqlite')
+
+
+def test_sqlite_journal_mode_restored(tmp_path):
+    path = str(tmp_path / 'out.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE other (x INTEGER)")
+    output_writers.write_batches(iter([[{'id': 1}]]), 'sqlite', path, table='items')
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ('delete',)
+
+
+@pytest.mark.parametrize('dialect', ['sqlite', 'duckdb'])
+def test_replace_with_no_batches_leaves_empty_declared_table(tmp_path, dialect):
+    pa = pytest.importorskip('pyarrow')
+    if dialect == 'duckdb':
+        connect = pytest.importorskip('duckdb').connect
+    else:
+        connect = sqlite3.connect
+    path = str(tmp_path / ('out.db' if dialect == 'sqlite' else 'out.duckdb'))
+    output_writers.write_batches(iter([[{'id': 1, 'old': 'x'}]]), dialect, path, table='items')
+    types = {'id': (pa.int32(), None, False), 'name': (pa.string(), None, False)}
+    assert output_writers.write_batches(iter([]), dialect, path, table='items', column_types=types) == 0
+    conn = connect(path)
+    try:
+        assert conn.execute("SELECT count(*) FROM items").fetchone() == (0,)
+        assert [d[0] for d in conn.execute("SELECT * FROM items").description] == ['id', 'name']
+    finally:
+        conn.close()
@@ -0,0 +1,39 @@
+import os
+from datetime import datetime
+
+import dataset_cache
+import samples_run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AWS_CONFIG = os.path.join(ROOT, 'configs/topics/aws_cost.yaml')
+
+
+def run_key(config):
+    params = {'seed': 1, 'date_bounds': samples_run.resolved_date_bounds(config['fields'])}
+    return dataset_cache.cache_key(AWS_CONFIG, config, params)
+
+
+def test_dynamic_date_bounds_change_the_key(monkeypatch):
+    config = samples_run.load_config(AWS_CONFIG)
+    monkeypatch.setattr(samples_run, 'end_of_current_month', lambda: datetime(2030, 1, 31, 23, 59, 59))
+    january = run_key(config)
+    assert run_key(config) == january
+    monkeypatch.setattr(samples_run, 'end_of_current_month', lambda: datetime(2030, 2, 28, 23, 59, 59))
+    assert run_key(config) != january
+
+
+def test_library_versions_change_the_key(monkeypatch):
+    config = samples_run.load_config(AWS_CONFIG)
+    before = run_key(config)
+    monkeypatch.setattr(dataset_cache, 'library_versions', lambda: {'faker': '0.0.0'})
+    assert run_key(config) != before
+
+
+def test_evict_includes_faker_pools(tmp_path):
+    pools = tmp_path / 'faker_pools'
+    pools.mkdir()
+    for i, path in enumerate([pools / 'old.json', tmp_path / 'entry.jsonl', pools / 'new.json']):
+        path.write_bytes(b'x' * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+    assert dataset_cache.evict(str(tmp_path), 200) == 200
+    assert sorted(p.name for p in tmp_path.rglob('*') if p.is_file()) == ['entry.jsonl', 'new.json']
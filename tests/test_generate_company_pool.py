@@ -0,0 +1,22 @@
+import json
+import sys
+
+import generate_company_pool
+
+
+def run(monkeypatch, tmp_path, name, *args):
+    path = tmp_path / name
+    monkeypatch.setattr(sys, 'argv', ['generate_company_pool.py', '--output', str(path), *args])
+    generate_company_pool.main()
+    return path.read_bytes()
+
+
+def test_count_and_seed_give_a_reproducible_pool(monkeypatch, tmp_path):
+    # Written in several batches
+    args = ('--count', '250', '--seed', '7', '--batch-size', '40', '--attributes', 'industry')
+    first = run(monkeypatch, tmp_path, 'a.json', *args)
+    assert run(monkeypatch, tmp_path, 'b.json', *args) == first
+    companies = json.loads(first)
+    assert [c['company_id'] for c in companies] == list(range(generate_company_pool.ID_START, generate_company_pool.ID_START + 250))
+    assert all(c['company_name'] and c['industry'] for c in companies)
+    assert run(monkeypatch, tmp_path, 'c.json', '--count', '250', '--seed', '8', '--batch-size', '40', '--attributes', 'industry') != first
@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+import output_writers
+
+RECORDS = [
+    {'id': i, 'name': f"Zoë {i}", 'cost': i * 1.25, 'active': i % 2 == 0, 'note': None, 'tags': {'team': 'ml', 'env': ['dev', 'prod']}, 'related': []}
+    for i in range(5)
+]
+
+
+@pytest.mark.parametrize('serializer', ['json', 'orjson', 'msgspec'])
+@pytest.mark.parametrize('indent', [None, 2, 4])
+def test_json_output_matches_json_dump(tmp_path, serializer, indent):
+    if serializer != 'json':
+        pytest.importorskip(serializer)
+    path = tmp_path / 'out.json'
+    output_writers.write_batches(iter([RECORDS[:2], RECORDS[2:]]), 'json', str(path), serializer=serializer, indent=indent)
+    assert json.loads(path.read_bytes()) == RECORDS
+    if indent:
+        # The file ends with a newline, as compact output does
+        assert path.read_text(encoding='utf-8') == json.dumps(RECORDS, indent=indent, ensure_ascii=False) + '\n'
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import object_store
+import output_writers
+
+
+def failing_batches(batches, fail_after):
+    for i, batch in enumerate(batches):
+        if i == fail_after:
+            raise RuntimeError("generation failed")
+        yield batch
+
+
+def record_batches(count, size):
+    for start in range(0, count, size):
+        yield [{'id': i, 'name': f"row {i}", 'pad': 'x' * 200} for i in range(start, min(start + size, count))]
+
+
+def stored_files(root):
+    return sorted(
+        os.path.relpath(os.path.join(d, name), root)
+        for d, _, names in os.walk(root) for name in names
+    )
+
+
+@pytest.mark.parametrize('output_type,key', [('jsonl', 'out.jsonl'), ('json', 'out.json.gz'), ('csv', 'out.csv.zst')])
+def test_failed_text_output_publishes_no_object(tmp_path, output_type, key):
+    compression = output_writers.split_compression(key)[1]
+    with object_store.open_store(f"file://{tmp_path}") as store:
+        # 150 rows of 3 batches then a failure: small objects use a single put
+        with pytest.raises(RuntimeError):
+            output_writers.write_batches(failing_batches(record_batches(150, 50), 2), output_type, key, compression=compression, store=store)
+        # A multipart upload (~25 MB of jsonl over 5 MiB parts) fails after its first parts are sent
+        with pytest.raises(RuntimeError):
+            output_writers.write_batches(failing_batches(record_batches(200000, 50000), 2), 'jsonl', 'big.jsonl', store=store)
+    assert stored_files(tmp_path) == []
+
+
+def test_failed_parquet_output_publishes_no_object(tmp_path):
+    pytest.importorskip('pyarrow')
+    with object_store.open_store(f"file://{tmp_path}") as store:
+        with pytest.raises(RuntimeError):
+            output_writers.write_batches(failing_batches(record_batches(150, 50), 2), 'parquet', 'out.parquet', store=store)
+    assert stored_files(tmp_path) == []
+
+
+def test_failed_partitioned_output_publishes_no_object(tmp_path):
+    pd = pytest.importorskip('pandas')
+    batches = (
+        pd.DataFrame({'s3_path': [f"p={i % 3}/" for i in range(start, start + 50)], 'v': range(start, start + 50)})
+        for start in range(0, 500, 50)
+    )
+    with object_store.open_store(f"file://{tmp_path}") as store:
+        with pytest.raises(RuntimeError):
+            output_writers.write_partitioned(failing_batches(batches, 5), 'parquet', 'topic', 'x', row_group_size=10, store=store)
+    assert stored_files(tmp_path) == []
+
+
+def test_completed_output_is_published(tmp_path):
+    with object_store.open_store(f"file://{tmp_path}") as store:
+        count = output_writers.write_batches(record_batches(150, 50), 'jsonl', 'out.jsonl', store=store)
+    assert count == 150
+    assert stored_files(tmp_path) == ['out.jsonl']
+    with open(tmp_path / 'out.jsonl') as f:
+        assert len(f.readlines()) == 150
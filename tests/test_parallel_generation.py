@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import generate_company_pool
+import output_writers
+import parallel_generation
+import samples_run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AWS_CONFIG = os.path.join(ROOT, 'configs/topics/aws_cost.yaml')
+
+
+def write_jsonl(batches, path):
+    output_writers.write_batches(batches, 'jsonl', str(path))
+    return path.read_bytes()
+
+
+def company_config(tmp_path, count):
+    pool = str(tmp_path / 'companies.json')
+    output_writers.write_batches(generate_company_pool.iter_company_batches(count, seed=1), 'json', pool)
+    fields = [
+        {'name': 'company_id', 'type': 'reference', 'reference_file': pool, 'reference_field': 'company_id', 'unique': True},
+        {'name': 'company_name', 'type': 'reference', 'reference_file': pool, 'reference_field': 'company_name', 'unique': True},
+    ]
+    companies = [r for batch in generate_company_pool.iter_company_batches(count, seed=1) for r in output_writers.batch_records(batch)]
+    return {'fields': fields}, {c['company_id']: c['company_name'] for c in companies}
+
+
+@pytest.mark.parametrize('engine', ['row', 'columnar'])
+def test_sharded_output_independent_of_worker_count(tmp_path, engine):
+    if engine == 'columnar':
+        pytest.importorskip('numpy')
+    config = samples_run.load_config(AWS_CONFIG)
+    outputs = [
+        write_jsonl(parallel_generation.iter_sharded_batches(config, num_records=600, workers=workers, seed=7, engine=engine, batch_size=200), tmp_path / f"{workers}.jsonl")
+        for workers in (2, 3)
+    ]
+    assert outputs[0] == outputs[1]
+    assert outputs[0].count(b'\n') == 600
+
+
+@pytest.mark.parametrize('engine', ['row', 'columnar'])
+def test_unique_reference_rows_handed_out_once_across_shards(tmp_path, engine):
+    if engine == 'columnar':
+        pytest.importorskip('numpy')
+    config, names = company_config(tmp_path, 50)
+    batches = parallel_generation.iter_sharded_batches(config, num_records=50, workers=2, seed=3, engine=engine, batch_size=15)
+    records = [r for batch in batches for r in output_writers.batch_records(batch)]
+    assert sorted(r['company_id'] for r in records) == sorted(names)
+    assert all(names[r['company_id']] == r['company_name'] for r in records)
+
+
+def test_unique_reference_pool_overflow_raises(tmp_path):
+    config, _ = company_config(tmp_path, 20)
+    with pytest.raises(ValueError, match="No more unique values"):
+        list(parallel_generation.iter_sharded_batches(config, num_records=21, workers=2, seed=3, batch_size=15))
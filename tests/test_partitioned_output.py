@@ -0,0 +1,46 @@
+import glob
+import random
+
+import pytest
+
+import output_writers
+
+pd = pytest.importorskip('pandas')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def partition_batches(partitions, batches, batch_size, seed=0):
+    rng = random.Random(seed)
+    for b in range(batches):
+        start = b * batch_size
+        yield pd.DataFrame({
+            's3_path': [f"p={rng.randrange(partitions)}/" for _ in range(batch_size)],
+            'v': range(start, start + batch_size),
+        })
+
+
+def test_buffered_rows_capped_with_more_partitions_than_open_files(tmp_path, monkeypatch):
+    # 40 partitions of ~1000 rows through 4 open files and a 2000-row buffer: the largest buffers
+    # are written early, as extra row groups and rolling files, so no more than 2000 rows are held
+    partitions = []
+    peak = [0]
+    add = output_writers.PartitionFile.add
+
+    def tracked_add(self, frame):
+        if self not in partitions:
+            partitions.append(self)
+        add(self, frame)
+        peak[0] = max(peak[0], sum(p.pending_rows for p in partitions))
+
+    monkeypatch.setattr(output_writers.PartitionFile, 'add', tracked_add)
+    rows = output_writers.write_partitioned(
+        partition_batches(40, 40, 1000), 'parquet', str(tmp_path), 'x', max_open_files=4, max_buffered_rows=2000
+    )
+    files = glob.glob(str(tmp_path / '*' / '*.parquet'))
+    assert 0 < peak[0] <= 2000
+    assert len(rows) == 40
+    assert sum(pq.read_metadata(f).num_rows for f in files) == 40000
+    for directory in tmp_path.iterdir():
+        paths = sorted(directory.glob('*.parquet'), key=lambda p: (len(p.name), p.name))
+        values = pd.concat([pd.read_parquet(p) for p in paths])['v'].tolist()
+        assert values == sorted(values)
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import aws_service_mappings
+
+
+@pytest.fixture(autouse=True)
+def default_catalog():
+    yield
+    aws_service_mappings.use_rate_card(None)
+
+
+def check_layered(catalog):
+    # Overridden and new entries from the card, everything else from the defaults
+    assert catalog['rates'][('EC2', 'BoxUsage')] == 0.5
+    assert catalog['rates'][('Acme', 'Widgets')] == 2.0
+    assert catalog['rates'][('EC2', 'CPUCredits')] == aws_service_mappings.SERVICE_RATES[('EC2', 'CPUCredits')]
+    services, usage_types = catalog['service_ids'], catalog['usage_type_ids']
+    assert catalog['rate_matrix'][services['EC2']][usage_types['BoxUsage']] == 0.5
+    assert catalog['rate_matrix'][services['Acme']][usage_types['Widgets']] == 2.0
+    assert aws_service_mappings.get_rate_for_service('Acme', 'Widgets') == 2.0
+    assert aws_service_mappings.get_rate_for_service('Acme', 'Unknown') == aws_service_mappings.DEFAULT_RATE
+
+
+@pytest.mark.parametrize('suffix', ['.yaml', '.json'])
+def test_structured_rate_card_layers_over_defaults(tmp_path, suffix):
+    card = {
+        'rates': {'EC2': {'BoxUsage': 0.5}, 'Acme': {'Widgets': 2}},
+        'regions': {'EC2': ['ap-south-1']},
+        'usage_multipliers': {'S3': 1},
+    }
+    path = tmp_path / f"card{suffix}"
+    path.write_text(json.dumps(card))
+    catalog = aws_service_mappings.use_rate_card(str(path))
+    check_layered(catalog)
+    assert catalog['regions']['EC2'] == ('ap-south-1',)
+    assert catalog['regions']['S3'] == tuple(aws_service_mappings.SERVICE_REGION_MAP['S3'])
+    assert catalog['usage_multipliers']['S3'] == 1
+    assert catalog['usage_multipliers']['EC2'] == aws_service_mappings.SERVICE_USAGE_MULTIPLIER['EC2']
+
+
+def test_csv_rate_card_layers_over_defaults(tmp_path):
+    path = tmp_path / 'card.csv'
+    path.write_text("service,usage_type,rate\nEC2,BoxUsage,0.5\nAcme,Widgets,2\n")
+    catalog = aws_service_mappings.use_rate_card(str(path))
+    check_layered(catalog)
+    assert catalog['regions'] == aws_service_mappings.build_service_catalog(
+        aws_service_mappings.SERVICE_RATES, aws_service_mappings.SERVICE_REGION_MAP,
+        aws_service_mappings.USAGE_TYPE_MAP, aws_service_mappings.SERVICE_USAGE_MULTIPLIER
+    )['regions']
+
+
+def test_missing_rate_card_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        aws_service_mappings.use_rate_card(str(tmp_path / 'missing.yaml'))
@@ -0,0 +1,58 @@
+import reference_data
+
+
+def write_csv(path):
+    path.write_text("zip,company_id\n00123,10000\n04567,10001\n")
+    return str(path)
+
+
+def test_csv_columns_stay_strings(tmp_path):
+    columns, count = reference_data.read_columns(write_csv(tmp_path / 'pool.csv'), ['zip', 'company_id'])
+    assert count == 2
+    assert columns['zip'] == ['00123', '04567']
+    assert columns['company_id'] == ['10000', '10001']
+
+
+def test_csv_columns_parsed_with_reference_type(tmp_path):
+    path = write_csv(tmp_path / 'pool.csv')
+    field = {'name': 'company_id', 'type': 'reference', 'reference_file': path, 'reference_field': 'company_id', 'reference_type': 'int'}
+    pool = reference_data.load_pool(path, ['company_id', 'zip'], {}, reference_data.column_types(field))
+    assert list(pool.column('company_id')) == [10000, 10001]
+    assert pool.column('zip') == ['00123', '04567']
+
+
+def test_compressed_pools_load(tmp_path):
+    import generate_company_pool
+    import output_writers
+    for name in ('pool.json.gz', 'pool.jsonl.zst', 'pool.csv.gz'):
+        path = str(tmp_path / name)
+        output_type, compression = generate_company_pool.output_type_for(path)
+        batches = generate_company_pool.iter_company_batches(50, seed=1)
+        output_writers.write_batches(batches, output_type, path, compression=compression)
+        field = {'reference_field': 'company_id', 'reference_type': 'int'}
+        pool = reference_data.load_pool(path, ['company_id', 'company_name'], {}, reference_data.column_types(field))
+        assert len(pool) == 50
+        assert list(pool.column('company_id')) == list(range(10000, 10050))
+
+
+def test_reference_group_fields_stay_paired(tmp_path):
+    import random
+    import pytest
+    import generate_company_pool
+    import output_writers
+    import samples_run
+    path = str(tmp_path / 'companies.csv')
+    output_writers.write_batches(generate_company_pool.iter_company_batches(200, seed=1), 'csv', path)
+    companies = {c['company_id']: c['company_name'] for b in generate_company_pool.iter_company_batches(200, seed=1) for c in output_writers.batch_records(b)}
+    fields = [
+        {'name': name, 'type': 'reference', 'reference_file': path, 'reference_field': column, 'reference_type': 'int' if column == 'company_id' else 'string', 'reference_group': group}
+        for name, column, group in [('company_id', 'company_id', 'buyer'), ('company_name', 'company_name', 'buyer'), ('partner_name', 'company_name', 'partner')]
+    ]
+    records = samples_run.generate_records_from_config({'fields': fields}, num_records=300, rng=random.Random(1), faker=samples_run.make_faker(1))
+    np = pytest.importorskip('numpy')
+    import columnar_engine
+    batch, = columnar_engine.iter_column_batches({'fields': fields}, num_records=300, rng=np.random.default_rng(1), py_rng=random.Random(1), faker=samples_run.make_faker(1))
+    for rows in (records, output_writers.batch_records(batch)):
+        assert all(companies[r['company_id']] == r['company_name'] for r in rows)
+        # Another group draws its own rows
+        assert any(r['partner_name'] != r['company_name'] for r in rows)
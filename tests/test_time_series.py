@@ -0,0 +1,37 @@
+import os
+import random
+
+import pytest
+
+import samples_run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HR_CONFIG = os.path.join(ROOT, 'configs/topics/hr_workforce.yaml')
+AWS_CONFIG = os.path.join(ROOT, 'configs/topics/aws_cost.yaml')
+
+
+def test_topic_without_key_fields_emits_every_record():
+    config = samples_run.load_config(HR_CONFIG)
+    records = samples_run.generate_records_from_config(
+        config, num_records=5000, cadence='daily', rng=random.Random(1), faker=samples_run.make_faker(1)
+    )
+    assert len(records) == 5000
+
+
+def test_topic_without_key_fields_columnar_emits_every_record():
+    np = pytest.importorskip('numpy')
+    import columnar_engine
+    config = samples_run.load_config(HR_CONFIG)
+    batches = columnar_engine.iter_column_batches(
+        config, num_records=5000, cadence='daily', rng=np.random.default_rng(1),
+        py_rng=random.Random(1), faker=samples_run.make_faker(1)
+    )
+    assert sum(len(next(iter(batch.values()))) for batch in batches) == 5000
+
+
+def test_too_few_series_raises():
+    config = samples_run.load_config(AWS_CONFIG)
+    with pytest.raises(ValueError, match="distinct series"):
+        samples_run.generate_records_from_config(
+            config, num_records=5000, cadence='daily', series_count=2, rng=random.Random(1), faker=samples_run.make_faker(1)
+        )
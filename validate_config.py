@@ -2,7 +2,9 @@
 import yaml
 import sys
 import os
-import json
+
+import reference_data
+from samples_run import CONTINUITY_KEY_FIELDS, field_order
 
 
 def validate_yaml_config(config_path):
@@ -19,6 +21,7 @@ def validate_yaml_config(config_path):
         return errors
 
     field_names = set()
+    by_parents = []
     for i, field in enumerate(config['fields']):
         if 'name' not in field:
             errors.append(f"Field {i} missing 'name'.")
@@ -35,6 +38,14 @@ def validate_yaml_config(config_path):
                 errors.append(f"Field {field['name']} of type 'choice' missing 'values' list.")
             if 'weights' in field and len(field['weights']) != len(field['values']):
                 errors.append(f"Field {field['name']} weights length does not match values length.")
+        for key, table in field.items():
+            if key.startswith('by_') and isinstance(table, dict):
+                by_parents.append((field['name'], key))
+        if t == 'multi_choice':
+            if 'values' not in field or not isinstance(field['values'], list):
+                errors.append(f"Field {field['name']} of type 'multi_choice' missing 'values' list.")
+            elif field.get('min_choices', 0) > field.get('max_choices', len(field['values'])):
+                errors.append(f"Field {field['name']} min_choices is greater than max_choices.")
         if t == 'faker' and 'faker_method' not in field:
             errors.append(f"Field {field['name']} of type 'faker' missing 'faker_method'.")
         if t == 'reference':
@@ -44,10 +55,11 @@ def validate_yaml_config(config_path):
                 if not os.path.exists(field['reference_file']):
                     errors.append(f"Reference file not found: {field['reference_file']} for field {field['name']}")
                 else:
+                    if field.get('reference_type', 'string') not in reference_data.REFERENCE_TYPES:
+                        errors.append(f"Field {field['name']} reference_type must be one of: {', '.join(reference_data.REFERENCE_TYPES)}.")
                     try:
-                        with open(field['reference_file'], 'r') as rf:
-                            pool = json.load(rf)
-                        if not pool or field['reference_field'] not in pool[0]:
+                        columns, count = reference_data.read_columns(field['reference_file'], [field['reference_field']], reference_data.column_types(field))
+                        if not count or all(v is None for v in columns[field['reference_field']]):
                             errors.append(f"reference_field {field['reference_field']} not found in {field['reference_file']} for field {field['name']}")
                     except Exception as e:
                         errors.append(f"Error reading reference file {field['reference_file']}: {e}")
@@ -55,6 +67,13 @@ def validate_yaml_config(config_path):
             errors.append(f"Field {field['name']} has pattern but no components.")
         if t == 'formula' and 'formula' not in field:
             errors.append(f"Field {field['name']} of type 'formula' missing 'formula' property.")
+    for name, key in by_parents:
+        if key[3:] not in field_names | set(CONTINUITY_KEY_FIELDS):
+            errors.append(f"Field {name} {key} refers to {key[3:]}, which is not a field.")
+    try:
+        field_order([f for f in config['fields'] if 'name' in f and 'type' in f], config.get('context', {}))
+    except ValueError as e:
+        errors.append(str(e))
     return errors
 
 